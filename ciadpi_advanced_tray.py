@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import gi
-import re
 import subprocess
 import threading
 import time
@@ -58,6 +57,22 @@ if not os.environ.get('XAUTHORITY'):
         os.environ['XAUTHORITY'] = str(xauth_path)
         log_debug(f"Restored XAUTHORITY: {os.environ['XAUTHORITY']}")
 
+# Грамматика параметров ciadpi (общая с генератором параметров)
+try:
+    from ciadpi_params import check_params, with_instance_options
+    PARAMS_GRAMMAR_AVAILABLE = True
+except ImportError as e:
+    print(f"Модуль разбора параметров не доступен: {e}")
+    PARAMS_GRAMMAR_AVAILABLE = False
+
+# Управление systemd сервисом (общее с консольным интерфейсом)
+try:
+    from ciadpi_service import apply_service_params, service_params
+    SERVICE_AVAILABLE = True
+except ImportError as e:
+    print(f"❌ Модуль управления сервисом не доступен: {e}")
+    SERVICE_AVAILABLE = False
+
 # Попытка импорта модуля автопоиска
 try:
     import sys
@@ -69,6 +84,23 @@ except ImportError as e:
     AUTOSEARCH_AVAILABLE = False
     CIAutoSearch = None
 
+# Контроль качества работающего сервиса
+try:
+    from ciadpi_monitor import HealthMonitor
+    MONITOR_AVAILABLE = True
+except ImportError as e:
+    print(f"Модуль мониторинга не доступен: {e}")
+    MONITOR_AVAILABLE = False
+    HealthMonitor = None
+
+# Параметры для каждой сети и переключение при смене сети
+try:
+    from ciadpi_network import NetworkParamsCache, NetworkWatcher, describe_network
+    NETWORK_AVAILABLE = True
+except ImportError as e:
+    print(f"Модуль отслеживания сети не доступен: {e}")
+    NETWORK_AVAILABLE = False
+
 class AdvancedTrayIndicator:
     def __init__(self):
         log_debug("Initializing AdvancedTrayIndicator...")
@@ -92,15 +124,15 @@ class AdvancedTrayIndicator:
         # ОДИН таймер для проверки прокси
         GLib.timeout_add(5000, self.check_current_proxy)
 
+        # Один поисковик на автопоиск из меню и повторный поиск монитора:
+        # монитор не запускает восстановление, пока идет поиск
         self.autosearcher = None
         self.is_searching = False
-
-        # Инициализация автопоиска
-        # if AUTOSEARCH_AVAILABLE:
-        #     self.autosearcher = CIAutoSearch()
-        #     self.is_searching = False
-        # else:
-        #     self.autosearcher = None
+        if AUTOSEARCH_AVAILABLE:
+            try:
+                self.autosearcher = CIAutoSearch()
+            except Exception as e:
+                print(f"⚠️ Автопоиск не доступен: {e}")
         
         # Отложенная инициализация индикатора
 
@@ -116,6 +148,17 @@ class AdvancedTrayIndicator:
         # применяем настройки прокси из конфига при запуске
         GLib.timeout_add(3000, self.apply_proxy_from_config)        
         
+        # Фоновый контроль качества обхода
+        self.health_monitor = None
+        if self.current_params.get("health_monitor", True):
+            self.start_health_monitor()
+        
+        # Переключение на сохраненные параметры при смене сети
+        self.network_cache = NetworkParamsCache() if NETWORK_AVAILABLE else None
+        self.network_watcher = None
+        if self.current_params.get("network_switch", True):
+            self.start_network_watcher()
+        
         log_debug("AdvancedTrayIndicator initialization completed")            
 
     def initialize_indicator(self):
@@ -189,7 +232,9 @@ class AdvancedTrayIndicator:
             "proxy_port": "1080",
             "current_params": self.default_params,
             "auto_disable_proxy": False,
-            "we_changed_proxy": False
+            "we_changed_proxy": False,
+            "health_monitor": True,
+            "network_switch": True
         }
         
         try:
@@ -246,6 +291,97 @@ class AdvancedTrayIndicator:
         
         return False            
 
+    def start_health_monitor(self):
+        """Запуск фонового контроля качества с повторным поиском при ухудшении"""
+        if not MONITOR_AVAILABLE:
+            return
+        if not self.health_monitor:
+            self.health_monitor = HealthMonitor(
+                self.get_current_service_params, self.apply_researched_params, self.autosearcher,
+                notify=self.show_notification
+            )
+        self.health_monitor.start()
+        print("🩺 Контроль качества запущен")
+
+    def stop_health_monitor(self):
+        """Остановка фонового контроля качества"""
+        if self.health_monitor:
+            self.health_monitor.stop()
+            print("🩺 Контроль качества остановлен")
+
+    def on_health_monitor_toggled(self, item):
+        """Включение и выключение контроля качества из меню"""
+        enabled = item.get_active()
+        self.current_params["health_monitor"] = enabled
+        self.save_config()
+        if enabled:
+            self.start_health_monitor()
+        else:
+            self.stop_health_monitor()
+
+    def apply_researched_params(self, params):
+        """Применение параметров повторного поиска с запоминанием для текущей сети"""
+        params = self.with_service_options(params)
+        applied = self.update_service_params(params)
+        if applied:
+            self.remember_network_params(params)
+        return applied
+
+    def start_network_watcher(self):
+        """Запуск отслеживания смены сети"""
+        if not NETWORK_AVAILABLE:
+            return
+        if not self.network_watcher:
+            self.network_watcher = NetworkWatcher(self.on_network_changed)
+        self.network_watcher.start()
+        print(f"🌐 Сеть: {describe_network(self.network_watcher.info)}")
+
+    def stop_network_watcher(self):
+        """Остановка отслеживания смены сети"""
+        if self.network_watcher:
+            self.network_watcher.stop()
+            self.network_watcher = None
+
+    def on_network_switch_toggled(self, item):
+        """Включение и выключение переключения параметров по сети из меню"""
+        enabled = item.get_active()
+        self.current_params["network_switch"] = enabled
+        self.save_config()
+        if enabled:
+            self.start_network_watcher()
+        else:
+            self.stop_network_watcher()
+
+    def remember_network_params(self, params, speed=None, network=None):
+        """Сохранение проверенных параметров для сети
+
+        network - (описание, ключ) сети, в которой параметры проверялись;
+        по умолчанию текущая.
+        """
+        if not self.network_cache or not self.network_watcher:
+            return
+        info, key = network or (self.network_watcher.info, self.network_watcher.key)
+        self.network_cache.remember(key, info, params, speed)
+
+    def on_network_changed(self, info, key):
+        """Смена сети: сразу применяем сохраненные для нее параметры"""
+        print(f"🌐 Сеть сменилась: {describe_network(info)}")
+        if self.health_monitor:
+            # Окна качества относятся к прошлой сети
+            self.health_monitor.reset()
+        cached = self.network_cache.get(key)
+        if not cached:
+            if key:
+                self.show_notification("Новая сеть", f"{describe_network(info)}: сохраненных параметров нет, "
+                                       "запустите автопоиск")
+            return
+        current = self.get_current_service_params()
+        params = self.with_service_options(cached["params"], current)
+        if params == current:
+            return
+        if self.update_service_params(params):
+            self.show_notification("Сеть сменилась", f"{describe_network(info)}: применены параметры {params}")
+
     def update_tooltip(self):
         """Обновление всплывающей подсказки"""
         if hasattr(self, 'indicator') and self.indicator:
@@ -255,142 +391,27 @@ class AdvancedTrayIndicator:
 
     def get_current_service_params(self):
         """Получение текущих параметров из systemd сервиса"""
-        try:
-            result = subprocess.run(
-                ['systemctl', 'show', 'ciadpi.service', '--property=ExecStart', '--no-pager'],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode == 0:
-                output = result.stdout.strip()
-                if 'argv[]=' in output:
-                    parts = output.split('argv[]=')
-                    if len(parts) > 1:
-                        args = parts[1].split(';')[0].split()
-                        if len(args) > 1:
-                            return ' '.join(args[1:])
-            return self.default_params
-        except:
-            return self.default_params
+        return service_params(self.default_params) if SERVICE_AVAILABLE else self.default_params
+
+    def with_service_options(self, params, current=None):
+        """Найденные параметры с адресом прослушивания и режимом запуска работающего сервиса"""
+        if not PARAMS_GRAMMAR_AVAILABLE:
+            return params
+        return with_instance_options(params, current or self.get_current_service_params())
 
     def update_service_params(self, new_params):
         """Обновление параметров в systemd сервисе - УНИВЕРСАЛЬНАЯ ВЕРСИЯ"""
-        try:
-            print(f"🔄 Обновление параметров: {new_params}")
-            
-            # Получаем данные пользователя динамически
-            username = os.environ.get('USER')
-            home_dir = Path.home()
-            byedpi_dir = home_dir / 'byedpi'
-            ciadpi_binary = byedpi_dir / 'ciadpi'
-            
-            # Проверяем что бинарник существует
-            if not ciadpi_binary.exists():
-                error_msg = f"Бинарник ciadpi не найден: {ciadpi_binary}"
-                print(f"❌ {error_msg}")
-                self.show_notification("Ошибка", error_msg)
-                return False
-            
-            # Останавливаем сервис
-            print("⏹️ Останавливаем сервис...")
-            stop_result = subprocess.run(
-                ['sudo', 'systemctl', 'stop', 'ciadpi.service'], 
-                capture_output=True, text=True, timeout=10
-            )
-            
-            if stop_result.returncode != 0:
-                print(f"⚠️ Предупреждение при остановке: {stop_result.stderr}")
-            
-            time.sleep(2)
-            
-            # Удаляем override директорию если есть (избегаем конфликтов)
-            override_dir = Path('/etc/systemd/system/ciadpi.service.d')
-            if override_dir.exists():
-                subprocess.run(['sudo', 'rm', '-rf', str(override_dir)], check=False)
-                print("🗑️ Удалена override директория")
-            
-            # Создаем service файл с динамическими путями
-            service_content = f"""[Unit]
-    Description=CIADPI DPI Bypass Service
-    After=network.target
-    Wants=network.target
-
-    [Service]
-    Type=simple
-    User={username}
-    WorkingDirectory={byedpi_dir}
-    ExecStart={ciadpi_binary} {new_params}
-    Restart=on-failure
-    RestartSec=5
-    TimeoutStartSec=30
-
-    [Install]
-    WantedBy=multi-user.target
-    """
-            
-            # Записываем временный файл
-            temp_file = Path('/tmp/ciadpi_temp.service')
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                f.write(service_content)
-            
-            # Копируем с правами root
-            print("📝 Обновляем service файл...")
-            copy_result = subprocess.run(
-                ['sudo', 'cp', str(temp_file), '/etc/systemd/system/ciadpi.service'],
-                capture_output=True, text=True, check=True
-            )
-            
-            subprocess.run(['sudo', 'systemctl', 'daemon-reload'], check=True)
-            
+        if not SERVICE_AVAILABLE:
+            self.show_notification("Ошибка", "Модуль управления сервисом не установлен")
+            return False
+        success, message = apply_service_params(new_params)
+        if success:
             # Обновляем конфиг
             self.current_params["current_params"] = new_params
             self.current_params["params"] = new_params
             self.save_config()
-            
-            # Запускаем сервис
-            print("▶️ Запускаем сервис...")
-            start_result = subprocess.run(
-                ['sudo', 'systemctl', 'start', 'ciadpi.service'],
-                capture_output=True, text=True, check=True
-            )
-            
-            # Проверяем статус
-            time.sleep(3)
-            status_result = subprocess.run(
-                ['systemctl', 'is-active', 'ciadpi.service'],
-                capture_output=True, text=True
-            )
-            
-            if status_result.stdout.strip() == 'active':
-                print("✅ Параметры успешно обновлены")
-                self.show_notification("Успех", "Параметры обновлены и сервис запущен")
-                return True
-            else:
-                # Если сервис не запустился, показываем ошибку
-                error_msg = "Сервис не запустился после обновления параметров"
-                print(f"❌ {error_msg}")
-                
-                # Получаем последние логи для диагностики
-                log_result = subprocess.run(
-                    ['journalctl', '-u', 'ciadpi.service', '-n', '10', '--no-pager'],
-                    capture_output=True, text=True
-                )
-                print("Последние логи сервиса:")
-                print(log_result.stdout)
-                
-                self.show_notification("Ошибка", f"{error_msg}\nПроверьте логи")
-                return False
-            
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Ошибка выполнения команды: {e}\nStderr: {e.stderr}"
-            print(f"❌ {error_msg}")
-            self.show_notification("Ошибка", "Не удалось выполнить системную команду")
-            return False
-            
-        except Exception as e:
-            error_msg = f"Общая ошибка: {e}"
-            print(f"❌ {error_msg}")
-            self.show_notification("Ошибка", f"Не удалось обновить параметры: {e}")
-            return False
+        self.show_notification("Успех" if success else "Ошибка", message)
+        return success
         
     # Методы для работы с белым списком:
     def load_whitelist(self):
@@ -696,6 +717,22 @@ class AdvancedTrayIndicator:
             
             menu.append(Gtk.SeparatorMenuItem())
         
+        # Контроль качества обхода
+        if MONITOR_AVAILABLE:
+            monitor_item = Gtk.CheckMenuItem(label="🩺 Следить за качеством обхода")
+            monitor_item.set_active(self.current_params.get("health_monitor", True))
+            monitor_item.connect("toggled", self.on_health_monitor_toggled)
+            menu.append(monitor_item)
+        
+        if NETWORK_AVAILABLE:
+            network_item = Gtk.CheckMenuItem(label="🌐 Свои параметры для каждой сети")
+            network_item.set_active(self.current_params.get("network_switch", True))
+            network_item.connect("toggled", self.on_network_switch_toggled)
+            menu.append(network_item)
+        
+        if MONITOR_AVAILABLE or NETWORK_AVAILABLE:
+            menu.append(Gtk.SeparatorMenuItem())
+        
         # Логи
         logs_item = Gtk.MenuItem(label="📋 Показать логи")
         logs_item.connect("activate", self.show_logs)
@@ -736,7 +773,7 @@ class AdvancedTrayIndicator:
             if hasattr(self, 'indicator') and self.indicator:
                 if status == 'active':
                     self.indicator.set_icon_full("network-transmit-receive-symbolic", "CIADPI запущен")
-                    self.status_item.set_label(f"✅ CIADPI {status_text}")
+                    self.status_item.set_label(f"✅ CIADPI {status_text}{self.health_summary()}")
                 else:
                     self.indicator.set_icon_full("network-offline-symbolic", "CIADPI остановлен")
                     self.status_item.set_label(f"❌ CIADPI {status_text}")
@@ -758,6 +795,22 @@ class AdvancedTrayIndicator:
             
         return True
     
+    def health_summary(self):
+        """Краткие показатели качества для строки статуса"""
+        if getattr(self, 'search_best', ""):
+            return self.search_best
+        if not self.health_monitor or not self.health_monitor.running:
+            return ""
+        health = self.health_monitor.health()
+        if not health["samples"]:
+            return ""
+        if self.health_monitor.researching:
+            return " · повторный поиск..."
+        summary = f" · {health['success_rate']:.0%}"
+        if health["p50"] is not None:
+            summary += f", {health['p50']:.2f} сек"
+        return summary
+
     def sync_proxy_settings(self):
         """Синхронизация настроек прокси с системой"""
         try:
@@ -1377,69 +1430,9 @@ class AdvancedTrayIndicator:
 
     def validate_params(self, params: str) -> Tuple[bool, str]:
         """Проверка параметров ciadpi с детальными сообщениями об ошибках"""
-        if not params.strip():
+        if not PARAMS_GRAMMAR_AVAILABLE:
             return True, ""
-        
-        # Все допустимые параметры из документации
-        valid_params = {
-            # Основные
-            '-i', '-p', '-D', '-w', '-E', '-c', '-I', '-b', '-g', '-N', '-U', '-F',
-            # Автоматический режим  
-            '-A', '-L', '-u', '-y', '-T',
-            # Протоколы
-            '-K',
-            # Ограничители
-            '-H', '-j', '-V', '-R',
-            # Методы обхода
-            '-s', '-d', '-o', '-q', '-f', '-r',
-            # Модификации
-            '-t', '-S', '-O', '-l', '-e', '-n', '-Q', '-M', '-a', '-Y'
-        }
-        
-        # Методы обхода (-o1 до -o25)
-        obfuscation_methods = {f'-o{i}' for i in range(1, 26)}
-        valid_params.update(obfuscation_methods)
-        
-        parts = params.split()
-        unknown_params = []
-        
-        i = 0
-        while i < len(parts):
-            part = parts[i]
-            
-            # Проверяем основные параметры
-            if part in valid_params:
-                i += 1
-                continue
-                
-            # Проверяем методы обхода с суффиксами (-o1+s, -o25+m и т.д.)
-            if re.match(r'^-o\d+[\+sme]*$', part):
-                i += 1
-                continue
-                
-            # Проверяем специальные форматы (1+s, 2+s, o--tlsrec)
-            if part in ['1+s', '2+s', '3+s', '-At', 'o--tlsrec']:
-                i += 1
-                continue
-                
-            # Параметры со значениями (пропускаем следующую часть)
-            if part in ['-i', '-p', '-w', '-c', '-I', '-b', '-g', '-u', '-T', 
-                    '-A', '-L', '-K', '-H', '-j', '-V', '-R', '-s', '-d', 
-                    '-o', '-q', '-f', '-r', '-t', '-O', '-l', '-e', '-n', '-a']:
-                if i + 1 < len(parts):
-                    i += 2  # Пропускаем параметр и его значение
-                    continue
-            
-            # Если дошли сюда - параметр неизвестен
-            unknown_params.append(part)
-            i += 1
-        
-        if unknown_params:
-            error_msg = f"Неизвестные параметры: {', '.join(unknown_params)}\n"
-            error_msg += "Используйте только параметры из документации ciadpi"
-            return False, error_msg
-        
-        return True, ""
+        return check_params(params)
 
     def show_settings(self, widget=None):
         ###
@@ -1486,7 +1479,7 @@ class AdvancedTrayIndicator:
             # Список примеров
             examples = [
                 "-o1 -o25+s -T3 -At o--tlsrec 1+s",
-                "-o2 -o15+s -T2 -At o--tlsrec", 
+                "-o2 -o15+s -T2 -At", 
                 "-o1 -o5+s -T1 -At",
                 "-o3 -o20+s -T3 -At o--tlsrec 2+s",
                 "-o4 -o10+m -T5 -A torst -L 1"
@@ -1544,7 +1537,10 @@ class AdvancedTrayIndicator:
                 print("DEBUG: OK clicked")
                 new_params = entry.get_text().strip()
                 print(f"DEBUG: New params: {new_params}")
-                if new_params and new_params != current_params:
+                is_valid, error_msg = self.validate_params(new_params)
+                if not is_valid:
+                    self.show_notification("Неверные параметры", error_msg)
+                elif new_params and new_params != current_params:
                     print("DEBUG: Calling update_service_params")
                     threading.Thread(
                         self.show_notification("Перезапуск...", "Перезапуск сервиса, подождите"),
@@ -1605,29 +1601,92 @@ class AdvancedTrayIndicator:
         box.pack_start(label, False, False, 0)
         box.pack_start(spin, False, False, 0)
         
+        # Количество одновременно запускаемых экземпляров ciadpi
+        concurrency_label = Gtk.Label(label="Параллельных тестов:")
+        concurrency_spin = Gtk.SpinButton.new_with_range(1, 32, 1)
+        concurrency_spin.set_value(self.autosearcher.concurrency)
+        
+        box.pack_start(concurrency_label, False, False, 0)
+        box.pack_start(concurrency_spin, False, False, 0)
+        
+        # Ограничение по времени: лучший результат к сроку
+        budget_label = Gtk.Label(label="Ограничение по времени, мин (0 - без ограничения):")
+        budget_spin = Gtk.SpinButton.new_with_range(0, 240, 1)
+        budget_spin.set_value(0)
+        
+        box.pack_start(budget_label, False, False, 0)
+        box.pack_start(budget_spin, False, False, 0)
+        
+        # Стратегия поиска
+        strategy_label = Gtk.Label(label="Режим поиска:")
+        strategy_combo = Gtk.ComboBoxText()
+        strategy_combo.append("flat", "Полная проверка каждого кандидата")
+        strategy_combo.append("racing", "Отсеивание по раундам (быстрее)")
+        strategy_combo.append("evolution", "Эволюционный поиск по истории")
+        strategy_combo.append("bayes", "Байесовский поиск (мало тестов)")
+        strategy_combo.append("domains", "Своя стратегия для каждой группы сайтов (-H)")
+        strategy_combo.append("space", "Обход всего пространства без повторов")
+        strategy_combo.set_active_id("flat")
+        
+        box.pack_start(strategy_label, False, False, 0)
+        box.pack_start(strategy_combo, False, False, 0)
+        
+        # Продолжение прерванного поиска с теми же настройками
+        resume_check = None
+        checkpoint = self.autosearcher.checkpoint.describe()
+        if checkpoint:
+            resume_check = Gtk.CheckButton(label=f"Продолжить прерванный поиск ({checkpoint})")
+            resume_check.set_active(True)
+            box.pack_start(resume_check, False, False, 0)
+        
         content_area.pack_start(box, True, True, 0)
         content_area.show_all()
         
         response = dialog.run()
         
         if response == Gtk.ResponseType.OK:
-            self.run_simple_autosearch(int(spin.get_value()))
+            self.run_simple_autosearch(int(spin.get_value()), int(concurrency_spin.get_value()),
+                                       strategy_combo.get_active_id(),
+                                       resume=bool(resume_check and resume_check.get_active()),
+                                       time_budget=int(budget_spin.get_value()) * 60 or None)
         
         dialog.destroy()
 
-    def run_simple_autosearch(self, max_tests):
+    def run_simple_autosearch(self, max_tests, concurrency=None, strategy='flat', resume=False, time_budget=None):
         """Простой автопоиск"""
+        if self.autosearcher.is_searching:
+            # Идет повторный поиск монитора качества
+            self.show_notification("Поиск", "Поиск уже выполняется")
+            return
+        # Параметры запоминаются для сети, в которой шел поиск
+        network = (self.network_watcher.info, self.network_watcher.key) if self.network_watcher else None
+        
         def search_thread():
             try:
-                best_params, best_speed = self.autosearcher.find_optimal_params(max_tests, 15)
+                best_params, best_speed = None, None
+                for event in self.autosearcher.iter_search(max_tests, 15, concurrency, strategy, resume=resume,
+                                                           time_budget=time_budget):
+                    if event["type"] == "best":
+                        # Лучший результат на данный момент показывается в строке статуса
+                        self.search_best = f" · поиск: лучший {event['speed']:.2f} сек " \
+                                           f"({event['elapsed'] / 60:.0f} мин)"
+                    elif event["type"] == "finished":
+                        best_params, best_speed = event["params"], event["speed"]
+                    elif event["type"] == "error":
+                        raise RuntimeError(event["message"])
                 if best_params:
                     self.show_notification("Найдены параметры", f"Оптимальные параметры: {best_params}")
-                    self.update_service_params(best_params)
+                    best_params = self.with_service_options(best_params)
+                    if self.update_service_params(best_params):
+                        self.remember_network_params(best_params, best_speed, network)
                 else:
                     self.show_notification("Поиск", "Не найдено рабочих параметров")
             except Exception as e:
                 self.show_notification("Ошибка", str(e))
+            finally:
+                self.search_best = ""
         
+        self.search_best = ""
         threading.Thread(target=search_thread, daemon=True).start()
 
     def stop_autosearch(self):
@@ -1730,7 +1789,7 @@ class AdvancedTrayIndicator:
 
     Примеры рабочих конфигураций:
     • -o1 -o25+s -T3 -At o--tlsrec 1+s
-    • -o2 -o15+s -T2 -At o--tlsrec
+    • -o2 -o15+s -T2 -At
     • -o3 -o20+s -T3 -At o--tlsrec 2+s
 
     🔧 ДОПОЛНИТЕЛЬНЫЕ ФУНКЦИИ:
@@ -1831,6 +1890,8 @@ class AdvancedTrayIndicator:
     def exit_app(self, widget):
         """Выход из приложения с правильным управлением прокси"""
         print("💾 Выход: сохраняем настройки программы...")
+        self.stop_health_monitor()
+        self.stop_network_watcher()
         
         # ⭐ СОХРАНЯЕМ НАСТРОЙКИ ПРОГРАММЫ ПЕРЕД ВЫХОДОМ
         self.current_params["we_changed_proxy"] = self.we_changed_proxy
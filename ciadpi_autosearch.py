@@ -1,16 +1,200 @@
 #!/usr/bin/env python3
 
+import asyncio
+import math
+import os
+import queue
+import random
+import socket
 import subprocess
 import time
 import json
 import threading
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
+
+from ciadpi_checkpoint import SearchCheckpoint, restore_rng, rng_state
+from ciadpi_constraints import CONSTRAINTS
+from ciadpi_history import HistoryStore
+from ciadpi_params import host_group_params, params_fingerprint, render, tokenize, without_instance_options
+from ciadpi_probe import run_probes, run_throughput
+from ciadpi_scoring import compare_stats, fitness, summarize_trials
+from ciadpi_readiness import StderrTail, wait_for_ready
+
+try:
+    from ciadpi_whitelist import WhitelistManager
+except ImportError:
+    WhitelistManager = None
+
+try:
+    from ciadpi_network import network_fingerprint
+except ImportError:
+    network_fingerprint = None
+
+def find_free_port(host='127.0.0.1'):
+    """Получение свободного TCP-порта от ОС"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def build_instance_args(params, port, host='127.0.0.1'):
+    """Аргументы запуска ciadpi на отдельном порту для тестового экземпляра
+
+    Адрес прослушивания и режим запуска из params заменяются на host:port.
+    """
+    args = render(without_instance_options(tokenize(params))).split()
+    return args + ['-i', host, '-p', str(port)]
+
+
+def unique_params(combinations, constraints=None):
+    """Комбинации в минимальной форме без равнозначных повторов, порядок сохраняется
+
+    Недопустимые по ограничениям (см. ciadpi_constraints) отбрасываются.
+    """
+    prune = (constraints or CONSTRAINTS).prune
+    return list(dict.fromkeys(params for params in map(prune, combinations) if params))
+
+
+def merge_results(first, second):
+    """Объединение двух проверок одних и тех же параметров
+
+    Проходы и проверки сайтов складываются, доля успеха, средняя задержка
+    и статистика пересчитываются по всем накопленным повторам.
+    """
+    def pass_speeds(result):
+        return result.get("pass_speeds", [result["speed"]] if result["success"] else [])
+
+    merged = dict(first)
+    merged["passes"] = first.get("passes", 1) + second.get("passes", 1)
+    merged["pass_speeds"] = pass_speeds(first) + pass_speeds(second)
+    merged["targets"] = first.get("targets", []) + second.get("targets", [])
+    merged["success_rate"] = len(merged["pass_speeds"]) / merged["passes"]
+    merged["success"] = len(merged["pass_speeds"]) == merged["passes"]
+    if merged["pass_speeds"]:
+        merged["speed"] = sum(merged["pass_speeds"]) / len(merged["pass_speeds"])
+    merged["stats"] = summarize_trials(merged["targets"])
+    return merged
+
+
+def result_event(result, score=None):
+    """Событие потокового API по результату проверки кандидата"""
+    return {
+        "type": "candidate",
+        "params": result["params"],
+        "success": result["success"],
+        "success_rate": result.get("success_rate"),
+        "speed": result["speed"],
+        "score": (score or fitness)(result),
+        "startup_time": result.get("startup_time"),
+        "targets": result.get("targets", []),
+        "stats": result.get("stats"),
+        "cached": result.get("cached", False),
+    }
+
+
+class ResultCache:
+    """Кэш результатов проверки, ключ - отпечаток параметров
+
+    Равнозначные записи параметров ("-o1 -T3" и "-T3 -o1") дают один
+    ключ. Записи старше ttl секунд считаются устаревшими и удаляются при
+    загрузке и добавлении. Файл записывается раз в batch новых записей и
+    при flush (в конце поиска), а не после каждой проверки.
+    """
+
+    def __init__(self, cache_file, ttl=6 * 3600, batch=20):
+        self.cache_file = Path(cache_file)
+        self.ttl = ttl
+        self.batch = batch
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    def load(self):
+        """Загрузка кэша с отбрасыванием устаревших записей"""
+        try:
+            if self.cache_file.exists():
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+                now = time.time()
+                return {key: entry for key, entry in entries.items()
+                        if now - entry.get("time", 0) < self.ttl}
+        except Exception:
+            pass
+        return {}
+
+    def save(self):
+        """Сохранение кэша"""
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+        except Exception:
+            pass
+
+    @staticmethod
+    def key(params, profile=""):
+        """Ключ записи: отпечаток параметров и профиль проверки"""
+        return f"{params_fingerprint(params)}:{profile}" if profile else params_fingerprint(params)
+
+    def get(self, params, profile=""):
+        """Сохраненный результат или None, если его нет или он устарел"""
+        with self.lock:
+            entry = self.entries.get(self.key(params, profile))
+            if entry and time.time() - entry["time"] < self.ttl:
+                return entry["result"]
+            return None
+
+    def put(self, params, result, profile=""):
+        """Сохранение результата проверки (в файл - пачкой из batch записей)"""
+        with self.lock:
+            now = time.time()
+            self.entries = {key: entry for key, entry in self.entries.items() if now - entry["time"] < self.ttl}
+            self.entries[self.key(params, profile)] = {"time": now, "result": result}
+            self.pending += 1
+            if self.pending >= self.batch:
+                self.save()
+                self.pending = 0
+
+    def flush(self):
+        """Запись в файл еще не сохраненных результатов"""
+        with self.lock:
+            if self.pending:
+                self.save()
+                self.pending = 0
+
+    def clear(self):
+        """Очистка кэша"""
+        with self.lock:
+            self.entries = {}
+            self.pending = 0
+            self.save()
+
 
 class CIAutoSearch:
     def __init__(self):
         self.history_file = Path.home() / '.config' / 'ciadpi' / 'history' / 'test_history.json'
+        self.history_db = self.history_file.parent / 'history.db'
+        self.result_cache = ResultCache(self.history_file.parent / 'result_cache.json')
+        # Состояние незавершенного поиска для продолжения (resume)
+        self.checkpoint = SearchCheckpoint(self.history_file.parent / 'checkpoint.json')
+        self.use_cache = True
+        # Ключ текущей сети входит в профиль кэша: результаты, полученные в
+        # другой сети (у другого провайдера), не используются
+        self.network_key = ""
+        self.network_checked = None
+        self.network_check_interval = 30.0
+        self.warm_start_limit = 5000
+        # Замер скорости скачивания (0 - не измерять)
+        self.throughput_bytes = 0
+        self.throughput_url = "https://speed.cloudflare.com/__down?bytes={bytes}"
+        self.throughput_timeout = 20
+        # Контекст TLS для проверок (например, с сертификатом локального стенда)
+        self.ssl_context = None
         self.ciadpi_path = Path.home() / 'byedpi' / 'ciadpi'
         self.test_urls = [
             "https://www.youtube.com",
@@ -18,12 +202,65 @@ class CIAutoSearch:
             "https://github.com",
             "https://www.wikipedia.org"
         ]
-        self.current_test_url = 0
+        # Группы доменов для поиска отдельной стратегии на каждую (-H);
+        # сайты test_urls вне групп образуют группу по своему имени
+        self.domain_groups = {
+            "youtube": ["youtube.com", "googlevideo.com", "ytimg.com", "youtu.be", "ggpht.com"],
+            "google": ["google.com", "gstatic.com", "googleapis.com"],
+            "github": ["github.com", "githubusercontent.com", "githubassets.com"],
+            "wikipedia": ["wikipedia.org", "wikimedia.org"],
+        }
+        self.hosts_dir = Path.home() / '.config' / 'ciadpi' / 'hosts'
         self.is_searching = False
-        self.current_process = None
-        self.whitelist_manager = WhitelistManager()
+        self.stop_reason = ""
+        # Ограничение поиска по времени: срок (time.monotonic()), средняя
+        # длительность одной проверки и лучший результат на данный момент
+        self.deadline = None
+        self.candidate_cost = None
+        self.search_started = None
+        self.search_score = fitness
+        self.best_so_far = None
+        self.best_callback = None
+        self.search_tests = 0
+        # Генератор случайных чисел поиска, его seed и настройки (см. begin_rng)
+        self.rng = random.Random()
+        self.search_seed = None
+        self.search_settings = {}
+        # Вызывается с результатом каждой проверки (для потокового вывода)
+        self.result_callback = None
+        self.proxy_host = '127.0.0.1'
+        self.concurrency = max(1, min(4, os.cpu_count() or 1))
+        self.startup_timeout = 5
+        self.probe_timeout = 8
+        # Раунды поиска отсеиванием: доля прошедших дальше (keep),
+        # число сайтов (urls, 0 - все), повторы и таймаут проверки
+        self.racing_rungs = [
+            {"urls": 1, "repeats": 1, "timeout": 4},
+            {"keep": 0.25, "urls": 2, "repeats": 1, "timeout": 8},
+            {"keep": 0.25, "urls": 0, "repeats": 3, "timeout": 15},
+        ]
+        # Повторы проверки каждого кандидата и уточнение победителя:
+        # претенденты, чьи доверительные интервалы пересекаются с лидером,
+        # получают race_repeats дополнительных повторов, не более race_rounds раз
+        self.trials = 1
+        self.race_contenders = 3
+        self.race_rounds = 3
+        self.race_repeats = 2
+        # Число экземпляров, запускаемых заранее при последовательной проверке
+        self.pipeline_depth = 1
+        self.active_processes = set()
+        self.reserved_ports = set()
+        self.prelaunched = {}
+        self.lock = threading.Lock()
+        # Ожидание готовности заранее запущенных и остановка отработавших
+        # экземпляров идут в фоне, не задерживая проверки
+        self.background_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ciadpi-background')
+        self.pending_teardowns = set()
+        self.whitelist_manager = WhitelistManager() if WhitelistManager else None
         
         # Настройка логирования
+        log_dir = Path.home() / '.config' / 'ciadpi'
+        log_dir.mkdir(parents=True, exist_ok=True)
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
@@ -34,31 +271,28 @@ class CIAutoSearch:
         )
         self.logger = logging.getLogger('ciadpi_autosearch')
         
-        self.history = self.load_history()
+        self.history_store = self.load_history()
 
     def load_history(self):
-        """Загрузка истории тестирования"""
-        default_history = {"tests": [], "last_tested": None}
-        
+        """Открытие хранилища истории с переносом старого test_history.json"""
+        store = HistoryStore(self.history_db)
         try:
-            self.history_file.parent.mkdir(exist_ok=True)
-            if self.history_file.exists():
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            migrated = store.import_json(self.history_file)
+            if migrated:
+                self.logger.info(f"История перенесена в {self.history_db}: {migrated} записей")
         except Exception as e:
-            self.logger.error(f"Ошибка загрузки истории: {e}")
-            
-        return default_history
+            self.logger.error(f"Ошибка переноса истории: {e}")
+        return store
 
     def save_history(self):
-        """Сохранение истории"""
+        """Сохранение накопленных записей истории"""
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, indent=2, ensure_ascii=False)
+            self.history_store.flush()
         except Exception as e:
             self.logger.error(f"Ошибка сохранения истории: {e}")
 
-    def add_to_history(self, params, success=False, speed=0, notes=""):
+    def add_to_history(self, params, success=False, speed=0, notes="", startup_time=None, targets=None,
+                       extra=None):
         """Добавление теста в историю"""
         test_entry = {
             "params": params,
@@ -67,110 +301,335 @@ class CIAutoSearch:
             "speed": speed,
             "notes": notes
         }
+        if startup_time is not None:
+            test_entry["startup_time"] = round(startup_time, 3)
+        if targets:
+            test_entry["targets"] = targets
+        if extra:
+            test_entry.update(extra)
+        if self.is_searching and self.search_seed is not None:
+            test_entry["seed"] = self.search_seed
         
-        # Добавляем в начало списка
-        self.history["tests"].insert(0, test_entry)
-        
-        # Сохраняем только последние 100 тестов
-        if len(self.history["tests"]) > 100:
-            self.history["tests"] = self.history["tests"][:100]
-            
-        self.history["last_tested"] = datetime.now().isoformat()
+        try:
+            self.history_store.add(test_entry)
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения истории: {e}")
+
+    def finish_search(self):
+        """Завершение поиска: сброс истории и снятие флага"""
+        if not self.is_searching:
+            self.logger.info(self.stop_reason or "Поиск прерван пользователем")
+        self.is_searching = False
+        self.stop_reason = ""
+        self.deadline = None
+        self.wait_teardown()
         self.save_history()
+        self.result_cache.flush()
+
+    def allocate_port(self):
+        """Выделение свободного порта для тестового экземпляра"""
+        while True:
+            port = find_free_port(self.proxy_host)
+            with self.lock:
+                if port not in self.reserved_ports:
+                    self.reserved_ports.add(port)
+                    return port
 
-    def test_connection(self, timeout=10):
-        """Тестирование соединения с YouTube"""
+    def release_port(self, port):
+        """Освобождение порта тестового экземпляра"""
+        with self.lock:
+            self.reserved_ports.discard(port)
+
+    def launch_instance(self, params):
+        """Запуск экземпляра ciadpi на свободном порту без ожидания готовности
+
+        Возвращает словарь с процессом (None при ошибке запуска), портом,
+        хвостом stderr и моментом запуска.
+        """
+        port = self.allocate_port()
+        instance = {"params": params, "port": port, "process": None, "tail": None,
+                    "started": time.monotonic(), "error": ""}
         try:
-            test_url = self.test_urls[self.current_test_url]
-            self.current_test_url = (self.current_test_url + 1) % len(self.test_urls)
-
-            # Пропускаем тестирование если URL в белом списке
-            if hasattr(self, 'whitelist_manager') and self.whitelist_manager.is_whitelisted(test_url):
-                return True, 0.1, test_url  # Быстрый успех для белого списка
-
-            start_time = time.time()
-            result = subprocess.run([
-                'curl', '-s', '-o', '/dev/null', '-w', '%{http_code}',
-                '--connect-timeout', '5', '--max-time', '8',
-                '--retry', '2', '--retry-delay', '1',
-                test_url  # ИСПРАВЛЕНО: было self.test_url
-            ], capture_output=True, text=True, timeout=timeout)
-            
-            speed = time.time() - start_time
-            success = result.returncode == 0 and result.stdout.strip() in ['200', '206', '301', '302']
-            
-            return success, speed, test_url
-            
-        except subprocess.TimeoutExpired:
-            return False, timeout, test_url
+            instance["process"] = subprocess.Popen(
+                [str(self.ciadpi_path)] + build_instance_args(params, port, self.proxy_host),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+            instance["tail"] = StderrTail(instance["process"].stderr)
+            with self.lock:
+                self.active_processes.add(instance["process"])
+        except Exception as e:
+            instance["error"] = str(e)
+        return instance
+
+    def prelaunch(self, params):
+        """Заблаговременный запуск экземпляра для следующей проверки
+
+        Готовность ожидается в фоне, чтобы время запуска не включало
+        время ожидания своей очереди.
+        """
+        instance = self.launch_instance(params)
+        if instance["process"]:
+            instance["ready"] = self.background_pool.submit(
+                wait_for_ready, self.proxy_host, instance["port"], instance["process"], instance["tail"],
+                timeout=self.startup_timeout, started=instance["started"]
+            )
+        with self.lock:
+            self.prelaunched.setdefault(params, []).append(instance)
+
+    def take_prelaunched(self, params):
+        """Заранее запущенный экземпляр для params или None"""
+        with self.lock:
+            instances = self.prelaunched.get(params)
+            if not instances:
+                return None
+            instance = instances.pop(0)
+            if not instances:
+                del self.prelaunched[params]
+            return instance
+
+    def retire_instance(self, instance):
+        """Фоновая остановка экземпляра с освобождением его порта"""
+        def teardown():
+            if instance["process"]:
+                self.stop_process(instance["process"])
+            self.release_port(instance["port"])
+
+        future = self.background_pool.submit(teardown)
+        with self.lock:
+            self.pending_teardowns.add(future)
+        future.add_done_callback(self.forget_teardown)
+
+    def forget_teardown(self, future):
+        with self.lock:
+            self.pending_teardowns.discard(future)
+
+    def wait_teardown(self):
+        """Ожидание остановки всех отработавших экземпляров"""
+        with self.lock:
+            futures = list(self.pending_teardowns)
+        wait(futures)
+
+    def test_connection(self, timeout=10, port=None, urls=None):
+        """Тестирование соединения со всеми тестовыми URL через экземпляр ciadpi
+
+        Возвращает (успех, средняя задержка, результаты по каждому URL).
+        """
+        urls = urls or self.test_urls
+        
+        # Пропускаем тестирование URL из белого списка
+        if self.whitelist_manager:
+            urls = [url for url in urls
+                    if not self.whitelist_manager.is_whitelisted(urlsplit(url).hostname or url)]
+        if not urls:
+            return True, 0.1, []  # Быстрый успех для белого списка
+        
+        try:
+            results = run_probes(urls, self.proxy_host, port, min(timeout, self.probe_timeout), self.ssl_context)
         except Exception as e:
             self.logger.error(f"Ошибка тестирования: {e}")
-            return False, timeout, test_url
+            return False, timeout, []
+        
+        success = all(item["success"] for item in results)
+        speed = sum(item["total"] for item in results) / len(results)
+        return success, speed, results
 
-    def test_params(self, params, test_duration=15):
+    def test_params(self, params, test_duration=15, progress_callback=None):
         """Тестирование конкретных параметров с выводом информации"""
         if self.is_searching:
             self.logger.warning("Поиск уже выполняется")
             return False, test_duration, "Пропуск (уже выполняется)"
-            
-        self.logger.info(f"Тестирование параметров: {params}")
+
+        try:
+            return self.run_candidate(params, test_duration, progress_callback)
+        finally:
+            self.result_cache.flush()
+
+    def run_candidate(self, params, test_duration=15, progress_callback=None):
+        """Запуск экземпляра ciadpi на отдельном порту и проверка через него"""
+        result = self.evaluate_params(params, test_duration, progress_callback)
+        return result["success"], result["speed"], result["message"]
+
+    def effective_duration(self, test_duration):
+        """Длительность проверки: ближе к сроку поиска проверки укорачиваются"""
+        time_left = self.time_left()
+        if time_left is not None:
+            test_duration = max(1, min(test_duration, time_left))
+        return test_duration
+
+    def cache_profile(self, test_duration, urls=None, repeats=None):
+        """Профиль проверки для кэша: сайты, повторы, таймаут проверки и сеть
+
+        Равнозначные параметры, проверенные тем же способом, не проверяются
+        повторно.
+        """
+        probe_timeout = round(min(test_duration, self.probe_timeout), 1)
+        return params_fingerprint(' '.join(urls or self.test_urls) + f" x{repeats or self.trials}"
+                                  f" b{self.throughput_bytes} t{probe_timeout:g} n{self.current_network_key()}")
+
+    def evaluation_task(self, test_duration, urls=None, repeats=None, label="", use_cache=True):
+        """task для run_pool: evaluate_params с заданными настройками
+
+        task.cached(params) - есть ли результат в кэше: такие кандидаты
+        конвейер не запускает заранее.
+        """
+        def task(params):
+            return self.evaluate_params(params, test_duration, urls=urls, repeats=repeats, label=label,
+                                        use_cache=use_cache)
+
+        def cached(params):
+            if not (self.use_cache and use_cache):
+                return False
+            profile = self.cache_profile(self.effective_duration(test_duration), urls, repeats)
+            return self.result_cache.get(params, profile) is not None
+
+        task.cached = cached
+        return task
+
+    def evaluate_params(self, params, test_duration=15, progress_callback=None, urls=None, repeats=None, label="",
+                        use_cache=True):
+        """Проверка параметров с подробным результатом
+
+        Экземпляр запускается один раз, затем repeats раз (по умолчанию
+        self.trials) проверяются urls (по умолчанию все test_urls). Возвращает
+        словарь с долей успешных проверок success_rate, средней задержкой speed,
+        результатами по сайтам и их статистикой stats (p50/p95, интервалы).
+        use_cache=False - обязательная новая проверка (дополнительные повторы).
+        """
+        repeats = repeats or self.trials
+        test_duration = self.effective_duration(test_duration)
+        profile = self.cache_profile(test_duration, urls, repeats)
+        cached = self.result_cache.get(params, profile) if self.use_cache and use_cache else None
+        if cached:
+            instance = self.take_prelaunched(params)
+            if instance:
+                self.retire_instance(instance)
+            self.logger.info(f"Результат из кэша{label}: {params}")
+            result = dict(cached, params=params, cached=True)
+            if progress_callback:
+                progress_callback(0, 0, result["message"])
+            if self.result_callback:
+                self.result_callback(result)
+            return result
+        
+        self.logger.info(f"Тестирование параметров{label}: {params}")
 
         if progress_callback:
-            progress_callback(-1,0, f"Запуск: {params}")
+            progress_callback(-1, 0, f"Запуск: {params}")
         
+        result = {"params": params, "success": False, "success_rate": 0.0,
+                  "speed": test_duration, "startup_time": None, "targets": [], "message": "",
+                  "passes": 1, "pass_speeds": [], "stats": summarize_trials([])}
+        # Экземпляр на собственном порту: запущенный заранее или новый
+        instance = self.take_prelaunched(params) or self.launch_instance(params)
+        port = instance["port"]
         try:
-            # Запускаем ciadpi с параметрами
-            self.current_process = subprocess.Popen(
-                [str(self.ciadpi_path)] + params.split(),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+            if instance["error"]:
+                raise RuntimeError(instance["error"])
             
-            # Даем время на запуск
-            time.sleep(3)
+            # Ждем, пока экземпляр откроет порт (или завершится с ошибкой)
+            if "ready" in instance:
+                ready, startup_time, reason = instance["ready"].result()
+            else:
+                ready, startup_time, reason = wait_for_ready(
+                    self.proxy_host, port, instance["process"], instance["tail"],
+                    timeout=min(self.startup_timeout, test_duration)
+                )
+            result["startup_time"] = startup_time
+            self.logger.info(f"Время запуска: {startup_time:.2f} сек")
+            
+            if not ready:
+                result["message"] = f"Не запустился: {params}\nПричина: {reason}"
+                # Сбой запуска может быть случайным (порт, нагрузка) - в кэш не попадает
+                self.add_to_history(params, False, test_duration, f"Не запустился{label}: {reason}", startup_time)
+                
+                if progress_callback:
+                    progress_callback(0, 0, result["message"])
+                
+                return result
             
-            # Тестируем соединение
-            success, speed = self.test_connection(test_duration - 3)
+            # Тестируем соединение через порт экземпляра
+            timeout = max(test_duration - startup_time, 1)
+            passes = []
+            for _ in range(max(1, repeats)):
+                success, speed, targets = self.test_connection(timeout, port, urls)
+                passes.append((success, speed))
+                result["targets"].extend(targets)
             
-            # Останавливаем процесс
-            self.stop_test()
+            successful = [speed for success, speed in passes if success]
+            result["passes"] = len(passes)
+            result["pass_speeds"] = successful
+            result["success_rate"] = len(successful) / len(passes)
+            result["success"] = len(successful) == len(passes)
+            if successful:
+                result["speed"] = sum(successful) / len(successful)
+            result["stats"] = summarize_trials(result["targets"])
+            passed = sum(1 for item in result["targets"] if item["success"])
+            speed = result["speed"]
+            
+            # Скорость скачивания имеет смысл мерить только у рабочих кандидатов
+            extra = {"stats": result["stats"]}
+            if self.throughput_bytes and result["success"]:
+                download = run_throughput(self.throughput_url.format(bytes=self.throughput_bytes),
+                                          self.proxy_host, port, self.throughput_bytes,
+                                          self.throughput_timeout, ssl_context=self.ssl_context)
+                result["throughput"] = download["bytes_per_sec"]
+                result["stalls"] = download["stalls"]
+                extra.update(throughput=result["throughput"], stalls=result["stalls"])
+                self.logger.info(f"Скорость скачивания: {result['throughput'] / 1e6:.2f} МБ/сек, "
+                                 f"зависаний: {result['stalls']}")
             
             # Добавляем в историю
-            status = "Успешно" if success else "Неудача"
-            message = f"{status}: {params}\nТест: {test_url}\nСкорость: {speed:.2f} сек"
+            status = "Успешно" if result["success"] else "Неудача"
+            result["message"] = f"{status}: {params}\nТест: {passed}/{len(result['targets'])} сайтов\nСкорость: {speed:.2f} сек"
 
             # Добавляем в историю
-            notes = f"{status}, тест: {test_url}\n, скорость: {speed:.2f} сек"
-            self.add_to_history(params, success, speed, notes)
+            notes = f"{status}{label}, тест: {passed}/{len(result['targets'])} сайтов, скорость: {speed:.2f} сек, запуск: {startup_time:.2f} сек"
+            if result["stats"]["p50"] is not None:
+                notes += f", p50/p95: {result['stats']['p50']:.2f}/{result['stats']['p95']:.2f} сек"
+            self.add_to_history(params, result["success"], speed, notes, startup_time, result["targets"], extra)
+            self.result_cache.put(params, result, profile)
             
             if progress_callback:
-                progress_callback(0, 0, message)
+                progress_callback(0, 0, result["message"])
 
-            return success, speed, message
+            return result
             
         except Exception as e:
-            error_msg = f"Ошибка: {params}\nПричина: {str(e)}"
+            result["message"] = f"Ошибка: {params}\nПричина: {str(e)}"
             self.logger.error(f"Ошибка тестирования параметров {params}: {e}")
             self.add_to_history(params, False, test_duration, f"Ошибка: {str(e)}")
 
             if progress_callback:
-                progress_callback(0, 0, error_msg)
+                progress_callback(0, 0, result["message"])
 
-            return False, test_duration, error_msg
+            return result
 
-    def stop_test(self):
-        """Остановка текущего теста"""
-        if self.current_process:
+        finally:
+            # Останавливаем процесс и освобождаем порт в фоне
+            self.retire_instance(instance)
+            if self.result_callback:
+                self.result_callback(result)
+
+    def stop_process(self, process):
+        """Остановка тестового экземпляра ciadpi"""
+        with self.lock:
+            self.active_processes.discard(process)
+        try:
+            process.terminate()
+            process.wait(timeout=5)
+        except:
             try:
-                self.current_process.terminate()
-                self.current_process.wait(timeout=5)
+                process.kill()
             except:
-                try:
-                    self.current_process.kill()
-                except:
-                    pass
-            finally:
-                self.current_process = None
+                pass
+
+    def stop_test(self):
+        """Остановка всех запущенных тестов"""
+        with self.lock:
+            processes = list(self.active_processes)
+        for process in processes:
+            self.stop_process(process)
 
     def stop_search(self):
         """Остановка поиска"""
@@ -181,94 +640,883 @@ class CIAutoSearch:
         """Генерация различных комбинаций параметров"""
         try:           
             from ciadpi_param_generator import AdvancedParamGenerator
-            generator = AdvancedParamGenerator()
+            generator = AdvancedParamGenerator(self.rng)
 
-             # Генерируем новые комбинации
-            new_combinations = generator.generate_comprehensive_params(1000)
-            
-            # Добавляем из истории
-            history_combinations = []
-            for item in self.history["tests"][:50]:
-                if item["params"] not in new_combinations:
-                    history_combinations.append(item["params"])
+            # Генерируем новые комбинации, равнозначные записи отбрасываем
+            new_combinations = unique_params(generator.generate_comprehensive_params(1000))
             
-            return new_combinations + history_combinations[:20]
+            # Добавляем из истории (не больше 20 неравнозначных новым)
+            combinations = unique_params(new_combinations + [item["params"] for item in self.get_history(50)])
+            return combinations[:len(new_combinations) + 20]
 
         except ImportError:
             # Fallback to basic combinations
             base_combinations = [
                 "-o1 -o25+s -T3 -At o--tlsrec 1+s",
-                "-o2 -o15+s -T2 -At o--tlsrec",
+                "-o2 -o15+s -T2 -At",
                 "-o1 -o5+s -T1 -At",
                 "-o3 -o20+s -T3 -At o--tlsrec 2+s",
                 "-o1 -o10+s -T2 -At",
-                "-o4 -o25+s -T3 -At o--tlsrec",
+                "-o4 -o25+s -T3 -At",
                 "-o2 -o8+s -T1 -At",
                 "-o1 -o15+s -T3 -At o--tlsrec 1+s",
                 "-o3 -o12+s -T2 -At",
-                "-o1 -o20+s -T3 -At o--tlsrec"
+                "-o1 -o20+s -T3 -At"
             ]
             return base_combinations
 
-    def find_optimal_params(self, max_tests=5, test_duration=15, progress_callback=None):
-        """Поиск оптимальных параметров"""
+    def current_network_key(self):
+        """Ключ текущей сети (ciadpi_network), не чаще раза в network_check_interval секунд"""
+        if network_fingerprint is None:
+            return ""
+        now = time.monotonic()
+        if self.network_checked is None or now - self.network_checked >= self.network_check_interval:
+            self.network_key = network_fingerprint()[1]
+            self.network_checked = now
+        return self.network_key
+
+    def begin_budget(self, time_budget=None, score=None, best_callback=None):
+        """Начало поиска: срок по времени и сброс лучшего результата"""
+        self.search_started = time.monotonic()
+        self.deadline = self.search_started + time_budget if time_budget else None
+        self.candidate_cost = None
+        self.search_score = score or fitness
+        self.best_so_far = None
+        self.best_callback = best_callback
+        self.search_tests = 0
+
+    def begin_rng(self, seed=None, settings=None):
+        """Генератор случайных чисел поиска с заданным или новым случайным seed
+
+        Все случайные решения поиска (генерация, мутации, оптимизаторы)
+        идут через self.rng, поэтому поиск с тем же seed, настройками,
+        историей и результатами проверок повторяется один в один. seed
+        записывается в каждую запись истории поиска и в запись о поиске.
+        """
+        self.search_seed = random.SystemRandom().randrange(2 ** 32) if seed is None else seed
+        self.search_settings = settings or {}
+        self.rng = random.Random(self.search_seed)
+        self.logger.info(f"seed поиска: {self.search_seed}")
+        return self.search_seed
+
+    def record_run(self, strategy, started, params, speed):
+        """Запись о поиске в историю (см. HistoryStore.runs)"""
+        try:
+            self.history_store.add_run({"started": started, "strategy": strategy, "seed": self.search_seed,
+                                        "settings": self.search_settings, "params": params, "speed": speed,
+                                        "completed": self.search_tests})
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения истории: {e}")
+
+    def time_left(self):
+        """Секунды до срока поиска или None без ограничения"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def can_start(self):
+        """Можно ли начать еще одну проверку
+
+        Новая проверка не начинается, если по средней длительности
+        проверок она не успеет до срока; тогда поиск завершается.
+        """
+        if not self.is_searching:
+            return False
+        time_left = self.time_left()
+        if time_left is not None and time_left <= (self.candidate_cost or 0.0):
+            self.stop_reason = "Время поиска истекло"
+            self.is_searching = False
+            return False
+        return True
+
+    def timed(self, task):
+        """task с учетом длительности проверки (скользящее среднее)"""
+        def run(params):
+            start_time = time.monotonic()
+            result = task(params)
+            elapsed = time.monotonic() - start_time
+            with self.lock:
+                self.search_tests += 1
+                self.candidate_cost = elapsed if self.candidate_cost is None else \
+                    0.7 * self.candidate_cost + 0.3 * elapsed
+            return result
+        return run
+
+    def track_best(self, result):
+        """Учет лучшего результата на данный момент"""
+        if not isinstance(result, dict) or not result.get("success"):
+            return
+        if self.best_so_far and self.search_score(result) <= self.search_score(self.best_so_far):
+            return
+        self.best_so_far = result
+        elapsed = time.monotonic() - (self.search_started or time.monotonic())
+        self.logger.info(f"Лучший на данный момент ({elapsed:.0f} сек): {result['params']} "
+                         f"(скорость: {result['speed']:.2f} сек)")
+        if self.best_callback:
+            self.best_callback(result["params"], result["speed"], elapsed)
+
+    def run_pipeline(self, candidates, task, depth=None):
+        """Последовательное выполнение task(params) с конвейерным запуском
+
+        Пока проверяется текущий кандидат, следующие depth уже запускаются
+        на своих портах (prelaunch), а отработавшие останавливаются в фоне.
+        Кандидаты с результатом в кэше (task.cached) заранее не запускаются.
+        Выдает пары (params, результат).
+        """
+        depth = max(1, depth or self.pipeline_depth)
+        candidates = iter(candidates)
+        upcoming = deque()
+        cached = getattr(task, 'cached', None)
+        task = self.timed(task)
+        
+        def refill():
+            while len(upcoming) < depth and self.can_start():
+                params = next(candidates, None)
+                if params is None:
+                    return
+                # Результат будет взят из кэша - экземпляр не нужен
+                if not (cached and cached(params)):
+                    self.prelaunch(params)
+                upcoming.append(params)
+        
+        try:
+            refill()
+            # После остановки поиска оставшиеся кандидаты не проверяются
+            while upcoming and self.is_searching:
+                params = upcoming.popleft()
+                refill()
+                result = task(params)
+                self.track_best(result)
+                yield params, result
+        finally:
+            # Поиск остановлен - заранее запущенные экземпляры не нужны
+            for params in upcoming:
+                instance = self.take_prelaunched(params)
+                if instance:
+                    self.retire_instance(instance)
+
+    def run_pool(self, candidates, task, concurrency=None):
+        """Выполнение task(params) в пуле потоков, результаты по мере готовности
+
+        Кандидаты подаются в пул по мере освобождения воркеров, чтобы
+        остановка поиска не ждала всю очередь. Выдает пары (params, результат).
+        При одном воркере проверка идет конвейером (см. run_pipeline).
+        """
+        concurrency = max(1, concurrency or self.concurrency)
+        if concurrency == 1 and self.pipeline_depth:
+            yield from self.run_pipeline(candidates, task)
+            return
+        candidates = iter(candidates)
+        task = self.timed(task)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ciadpi-test') as executor:
+            running = {}
+            for params in candidates:
+                if not self.can_start():
+                    break
+                running[executor.submit(task, params)] = params
+                if len(running) >= concurrency:
+                    break
+            
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    params = running.pop(future)
+                    result = future.result()
+                    self.track_best(result)
+                    yield params, result
+                    
+                    if not self.can_start():
+                        continue
+                    params = next(candidates, None)
+                    if params is not None:
+                        running[executor.submit(task, params)] = params
+
+    def confirm_winner(self, results, test_duration=15, concurrency=None, score=None, urls=None):
+        """Выбор победителя по доверительным интервалам
+
+        Лучшие по оценке кандидаты сравниваются с лидером по интервалам доли
+        успеха и задержки (compare_stats). Пока интервалы пересекаются, лидер
+        и неотделенные претенденты получают дополнительные повторы. Если за
+        race_rounds раундов интервалы не разошлись, возвращается лидер по
+        оценке с пометкой confident=False. Возвращает результат или None.
+        """
+        score = score or fitness
+        contenders = sorted((dict(result) for result in results if result["success_rate"] > 0),
+                            key=score, reverse=True)[:max(1, self.race_contenders)]
+        if not contenders:
+            return None
+        for result in contenders:
+            if "stats" not in result:
+                result["stats"] = summarize_trials(result.get("targets", []))
+        
+        for number in range(self.race_rounds + 1):
+            contenders.sort(key=score, reverse=True)
+            leader = contenders[0]
+            unresolved = [result for result in contenders[1:] if compare_stats(leader["stats"], result["stats"]) <= 0]
+            if not unresolved:
+                leader["confident"] = True
+                return leader
+            # Срок поиска истек - новые повторы не начинаются, побеждает текущий лидер
+            if number == self.race_rounds or not self.can_start():
+                break
+            
+            retest = [leader] + unresolved
+            self.logger.info(f"Интервалы пересекаются: {len(retest)} претендентов, "
+                             f"дополнительные повторы ({number + 1}/{self.race_rounds})")
+            label = f" (уточнение {number + 1})"
+            task = self.evaluation_task(test_duration, urls, self.race_repeats, label, use_cache=False)
+            # Пул может остановиться раньше (срок поиска): непроверенные
+            # претенденты остаются с прежними результатами
+            by_params = {result["params"]: result for result in contenders}
+            for params, result in self.run_pool([result["params"] for result in retest], task, concurrency):
+                by_params[params] = merge_results(by_params[params], result)
+            contenders = list(by_params.values())
+        
+        self.logger.warning(f"Победитель статистически не отделен от {len(unresolved)} претендентов, "
+                            f"выбран лидер по оценке")
+        leader["confident"] = False
+        return leader
+
+    def begin_checkpoint(self, strategy, settings, resume=False, seed=None):
+        """Состояние поиска: сохраненное (resume) или новое
+
+        Сохраненное состояние подходит, если совпадают стратегия, настройки
+        и seed (если задан); тогда восстанавливаются seed и состояние
+        генератора self.rng. Новый поиск начинается с seed (см. begin_rng),
+        который тоже сохраняется.
+        """
+        if resume:
+            state = self.checkpoint.load()
+            if state and state.get("strategy") == strategy and state.get("settings") == settings and \
+                    seed in (None, state.get("seed")):
+                self.begin_rng(state["seed"], settings)
+                restore_rng(state["rng"], self.rng)
+                state["resumed"] = True
+                self.logger.info(f"Продолжаем прерванный поиск ({state.get('completed', 0)} уже проверено)")
+                return state
+            self.logger.warning("Сохраненный поиск не найден или начат с другими настройками")
+        
+        seed = self.begin_rng(seed, settings)
+        return {"strategy": strategy, "settings": settings, "seed": seed, "completed": 0, "resumed": False}
+
+    def save_checkpoint(self, state, optimizer=None, force=False):
+        """Сохранение состояния поиска (не чаще checkpoint.min_interval)"""
+        if not force and not self.checkpoint.due():
+            return
+        if optimizer is not None:
+            state["optimizer"] = optimizer.to_state()
+        state["rng"] = rng_state(self.rng)
+        state["updated"] = time.time()
+        try:
+            self.checkpoint.save(state, force=True)
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения состояния поиска: {e}")
+
+    def end_checkpoint(self, state, optimizer=None):
+        """Завершенный поиск удаляет состояние, прерванный - сохраняет его"""
+        if self.is_searching:
+            self.checkpoint.clear()
+        else:
+            self.save_checkpoint(state, optimizer, force=True)
+            self.logger.info("Состояние поиска сохранено, его можно продолжить (resume=True)")
+
+    def find_optimal_params(self, max_tests=5, test_duration=15, progress_callback=None, concurrency=None,
+                            strategy='flat', score=None, resume=False, time_budget=None, best_callback=None,
+                            shard=None, seed=None, offset=0):
+        """Поиск оптимальных параметров
+
+        strategy: 'flat' - полная проверка каждого кандидата (см. find_optimal_params_flat),
+        'racing' - последовательное отсеивание (см. find_optimal_params_racing),
+        'evolution' - эволюционный поиск (см. find_optimal_params_evolution),
+        'bayes' - байесовский поиск (см. find_optimal_params_bayes),
+        'domains' - своя стратегия для каждой группы доменов (см. find_optimal_params_domains),
+        'space' - обход полного пространства без повторов (см. find_optimal_params_space),
+        для него shard и offset задают часть пространства и место начала.
+        score - функция оценки результата (больше - лучше), по умолчанию
+        по задержке; смешанная оценка с пропускной способностью - make_score.
+        resume - продолжить прерванный поиск с теми же настройками
+        (кроме 'domains'), не проверяя уже проверенных кандидатов.
+        time_budget - ограничение по времени в секундах: новые проверки не
+        начинаются, если не успеют до срока, а по его истечении возвращается
+        лучший найденный результат (состояние сохраняется для продолжения).
+        best_callback(params, speed, elapsed) вызывается при каждом новом
+        лучшем результате.
+        seed - seed генератора случайных чисел поиска (см. begin_rng), без
+        него выбирается случайный; он сохраняется в истории (HistoryStore.runs).
+        """
+        if self.is_searching:
+            self.logger.warning("Поиск уже выполняется")
+            return None, None
+        self.begin_budget(time_budget, score, best_callback)
+        if time_budget:
+            self.logger.info(f"Ограничение поиска по времени: {time_budget:.0f} сек")
+        
+        started = time.time()
+        if strategy == 'racing':
+            best = self.find_optimal_params_racing(max_tests, progress_callback=progress_callback,
+                                                   concurrency=concurrency, score=score, resume=resume, seed=seed)
+        elif strategy == 'evolution':
+            best = self.find_optimal_params_evolution(max_tests, test_duration, progress_callback,
+                                                      concurrency=concurrency, score=score, resume=resume, seed=seed)
+        elif strategy == 'bayes':
+            best = self.find_optimal_params_bayes(max_tests, test_duration, progress_callback,
+                                                  concurrency=concurrency, score=score, resume=resume, seed=seed)
+        elif strategy == 'domains':
+            best = self.find_optimal_params_domains(max_tests, test_duration, progress_callback,
+                                                    concurrency=concurrency, score=score, seed=seed)
+        elif strategy == 'space':
+            best = self.find_optimal_params_space(max_tests, test_duration, progress_callback,
+                                                  concurrency=concurrency, score=score, resume=resume,
+                                                  shard=shard, seed=seed, offset=offset)
+        else:
+            best = self.find_optimal_params_flat(max_tests, test_duration, progress_callback,
+                                                 concurrency=concurrency, score=score, resume=resume, seed=seed)
+        self.record_run(strategy, started, *best)
+        return best
+
+    def find_optimal_params_flat(self, max_tests=5, test_duration=15, progress_callback=None, concurrency=None,
+                                 score=None, resume=False, seed=None):
+        """Полная проверка каждого кандидата из generate_param_combinations"""
         if self.is_searching:
             self.logger.warning("Поиск уже выполняется")
             return None, None
             
         self.is_searching = True
-        self.logger.info(f"Начинаем поиск оптимальных параметров (макс. тестов: {max_tests})")
+        concurrency = max(1, concurrency or self.concurrency)
+        state = self.begin_checkpoint('flat', {"max_tests": max_tests, "test_duration": test_duration}, resume,
+                                      seed)
+        if not state["resumed"]:
+            state.update(queue=self.generate_param_combinations()[:max_tests], results=[])
+        results = state["results"]
+        completed = state["completed"]
+        total = completed + len(state["queue"])
+        self.logger.info(f"Начинаем поиск оптимальных параметров "
+                         f"(макс. тестов: {max_tests}, параллельно: {concurrency})")
         
-        combinations = self.generate_param_combinations()
-        best_params = None
-        best_speed = float('inf')
-        successful_params = []
+        task = self.evaluation_task(test_duration)
+        for params, result in self.run_pool(list(state["queue"]), task, concurrency):
+            completed += 1
+            self.logger.info(f"Тест {completed}/{total}: {params}")
+            if progress_callback:
+                progress_callback(completed, total, params)
+            
+            if result["success"]:
+                results.append(result)
+                self.logger.info(f"Успех! Скорость: {result['speed']:.2f} сек")
+            else:
+                self.logger.info("Неудача")
+            
+            state["queue"].remove(params)
+            state["completed"] = completed
+            self.save_checkpoint(state)
         
-        for i, params in enumerate(combinations[:max_tests]):
+        best = self.confirm_winner(results, test_duration, concurrency, score)
+        self.end_checkpoint(state)
+        self.finish_search()
+        return self.report_winner(best)
+
+    def iter_search(self, max_tests=5, test_duration=15, concurrency=None, strategy='flat', score=None,
+                    resume=False, time_budget=None, max_pending=1000, shard=None, seed=None, offset=0):
+        """Поиск как поток событий (генератор)
+
+        Поиск идет в фоновом потоке, события выдаются по мере готовности:
+        candidate (см. result_event: параметры, результаты по сайтам,
+        оценка), best (новый лучший), progress (completed/total) и
+        последним finished (params, speed, seed) или error. Событий в очереди не
+        больше max_pending - при медленном потребителе поиск ждет.
+        Прекращение перебора генератора останавливает поиск.
+        """
+        events = queue.Queue(maxsize=max_pending)
+        score = score or fitness
+
+        def on_progress(completed, total, message):
+            if total > 0:
+                events.put({"type": "progress", "completed": completed, "total": total})
+
+        def on_best(params, speed, elapsed):
+            events.put({"type": "best", "params": params, "speed": speed, "elapsed": elapsed})
+
+        def run():
+            try:
+                best_params, best_speed = self.find_optimal_params(
+                    max_tests, test_duration, on_progress, concurrency=concurrency, strategy=strategy,
+                    score=score, resume=resume, time_budget=time_budget, best_callback=on_best,
+                    shard=shard, seed=seed, offset=offset)
+                events.put({"type": "finished", "params": best_params, "speed": best_speed,
+                            "seed": self.search_seed})
+            except Exception as e:
+                self.logger.error(f"Ошибка поиска: {e}")
+                self.finish_search()
+                events.put({"type": "error", "message": str(e)})
+
+        previous_callback = self.result_callback
+        self.result_callback = lambda result: events.put(result_event(result, score))
+        thread = threading.Thread(target=run, daemon=True, name='ciadpi-search')
+        thread.start()
+        try:
+            while True:
+                event = events.get()
+                final = event["type"] in ("finished", "error")
+                yield event
+                if final:
+                    return
+        finally:
+            if thread.is_alive():
+                self.stop_search()
+                # Разбираем очередь, чтобы потоки поиска не ждали на put
+                while thread.is_alive():
+                    try:
+                        events.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+            thread.join()
+            self.result_callback = previous_callback
+
+    async def aiter_search(self, *args, **kwargs):
+        """Асинхронный вариант iter_search (async for) для asyncio-потребителей"""
+        loop = asyncio.get_running_loop()
+        stream = self.iter_search(*args, **kwargs)
+        done = object()
+        try:
+            while True:
+                event = await loop.run_in_executor(None, next, stream, done)
+                if event is done:
+                    return
+                yield event
+        finally:
+            await loop.run_in_executor(None, stream.close)
+
+    def report_winner(self, best):
+        """Итог поиска: (параметры, скорость) победителя или (None, None)"""
+        if best and best["success"]:
+            stats = best.get("stats") or {}
+            self.logger.info(f"Лучшие параметры: {best['params']} (скорость: {best['speed']:.2f} сек, "
+                             f"p50/p95: {stats.get('p50')}/{stats.get('p95')} сек, "
+                             f"проверок: {stats.get('trials', 0)})")
+            return best["params"], best["speed"]
+        
+        self.logger.warning("Не найдено рабочих параметров")
+        return None, None
+
+    def find_optimal_params_racing(self, max_candidates=200, rungs=None, progress_callback=None, concurrency=None,
+                                   score=None, resume=False, seed=None):
+        """Поиск последовательным отсеиванием (successive halving)
+
+        Первый раунд - дешевая проверка одного сайта для всех кандидатов,
+        следующие раунды получают только лучшую долю keep предыдущего и
+        проверяют больше сайтов с повторами. Бюджет раундов задается rungs.
+        """
+        if self.is_searching:
+            self.logger.warning("Поиск уже выполняется")
+            return None, None
+        
+        self.is_searching = True
+        score = score or fitness
+        rank = lambda item: (-item["success_rate"], -score(item))
+        rungs = rungs or self.racing_rungs
+        state = self.begin_checkpoint('racing', {"max_candidates": max_candidates, "rungs": rungs}, resume, seed)
+        if not state["resumed"]:
+            # pending - еще не проверенные кандидаты текущего раунда,
+            # ranked - его результаты, previous - итог предыдущего раунда
+            state.update(rung=0, pending=self.generate_param_combinations()[:max_candidates], ranked=[], previous=[])
+        self.logger.info(f"Начинаем поиск отсеиванием: {len(state['pending'] or [])} кандидатов, "
+                         f"{len(rungs)} раундов")
+        
+        urls = None
+        for index in range(state["rung"], len(rungs)):
+            rung = rungs[index]
+            number = index + 1
+            if state["pending"] is None:
+                # Дальше проходят только успешные кандидаты из лучшей доли
+                keep = max(1, math.ceil(len(state["previous"]) * rung.get("keep", 0.25)))
+                state["pending"] = [item["params"] for item in state["previous"] if item["success_rate"] > 0][:keep]
+                state["ranked"] = []
+            survivors = list(state["pending"])
+            if not survivors or not self.is_searching:
+                break
+            
+            urls = self.test_urls[:rung["urls"]] if rung.get("urls") else self.test_urls
+            label = f" (раунд {number}/{len(rungs)})"
+            task = self.evaluation_task(rung.get("timeout", 15), urls, rung.get("repeats", 1), label)
+            self.logger.info(f"Раунд {number}: {len(survivors)} кандидатов, сайтов: {len(urls)}, "
+                             f"повторов: {rung.get('repeats', 1)}")
+            
+            for completed, (params, result) in enumerate(self.run_pool(survivors, task, concurrency), 1):
+                state["ranked"].append(result)
+                state["pending"].remove(params)
+                state["completed"] += 1
+                self.save_checkpoint(state)
+                if progress_callback:
+                    progress_callback(completed, len(survivors), f"Раунд {number}: {params}")
             if not self.is_searching:
-                self.logger.info("Поиск прерван пользователем")
                 break
-                
+            
+            # Сначала доля успешных проверок, затем оценка
+            state.update(rung=index + 1, previous=sorted(state["ranked"], key=rank), pending=None, ranked=[])
+            self.save_checkpoint(state)
+        
+        ranked = sorted(state["ranked"], key=rank) if state["ranked"] else state["previous"]
+        winners = [item for item in ranked if item["success"]]
+        best = self.confirm_winner(winners, rungs[-1].get("timeout", 15), concurrency, score, urls=urls)
+        self.end_checkpoint(state)
+        self.finish_search()
+        return self.report_winner(best)
+
+    def find_optimal_params_space(self, max_tests=50, test_duration=15, progress_callback=None, concurrency=None,
+                                  score=None, resume=False, shard=None, seed=None, offset=0):
+        """Обход полного пространства параметров без повторов (см. ciadpi_space)
+
+        Кандидаты берутся по порядку позиций псевдослучайной перестановки
+        пространства, заданной seed поиска (см. begin_rng). shard=(номер, всего) с номером от нуля
+        ограничивает обход своей частью позиций: исполнители с одним seed
+        и разными номерами не проверяют одних кандидатов. offset - позиция
+        внутри части, с которой начинается обход. В состоянии хранятся
+        только позиция и лучшие результаты, поэтому память не зависит от
+        размера пространства.
+        """
+        if self.is_searching:
+            self.logger.warning("Поиск уже выполняется")
+            return None, None
+        
+        from ciadpi_param_generator import AdvancedParamGenerator
+        
+        self.is_searching = True
+        score = score or fitness
+        worker, workers = shard or (0, 1)
+        space = AdvancedParamGenerator().param_space()
+        state = self.begin_checkpoint('space', {"max_tests": max_tests, "test_duration": test_duration,
+                                                "shard": [worker, workers], "offset": offset}, resume, seed)
+        if not state["resumed"]:
+            start, stop = space.shard(worker, workers)
+            # position - первая позиция, проверка которой не завершена;
+            # done - завершенные позиции после нее (параллельные проверки
+            # заканчиваются не по порядку)
+            state.update(start=start, stop=stop, position=min(start + offset, stop), done=[], results=[])
+        done = set(state["done"])
+        results = state["results"]
+        keep = max(1, self.race_contenders)
+        left = max_tests - state["completed"]
+        total = state["completed"] + min(left, state["stop"] - state["position"] - len(done))
+        positions = {}
+        self.logger.info(f"Начинаем обход пространства: {space.size:,} кандидатов, часть {worker + 1}/{workers} "
+                         f"(позиции {state['start']:,}..{state['stop']:,}), seed {state['seed']}")
+        
+        def candidates():
+            issued = 0
+            previous = state["position"]
+            for position, params in space.sample(state["seed"], state["position"], state["stop"]):
+                # Позиции, отброшенные ограничениями (см. ciadpi_constraints), пройдены
+                done.update(range(previous, position))
+                previous = position + 1
+                if issued >= left:
+                    return
+                # Минимальная форма, как у остальных стратегий: история и кэш без дублей
+                params = CONSTRAINTS.prune(params)
+                if position in done or not params or params in positions:
+                    done.add(position)
+                    continue
+                positions[params] = position
+                issued += 1
+                yield params
+        
+        task = self.evaluation_task(test_duration)
+        for params, result in self.run_pool(candidates(), task, concurrency):
+            state["completed"] += 1
             if progress_callback:
-                progress_callback(i+1, max_tests, params)
+                progress_callback(state["completed"], total, params)
+            if result["success"]:
+                # Для выбора победителя нужны только лучшие претенденты
+                results.append(result)
+                results.sort(key=score, reverse=True)
+                del results[keep:]
             
-            self.logger.info(f"Тест {i+1}/{min(max_tests, len(combinations))}: {params}")
+            done.add(positions.pop(params))
+            while state["position"] in done:
+                done.discard(state["position"])
+                state["position"] += 1
+            state["done"] = sorted(done)
+            self.save_checkpoint(state)
+        
+        self.logger.info(f"Обход остановлен на позиции {state['position'] - state['start']:,} части "
+                         f"{worker + 1}/{workers} (offset для продолжения)")
+        best = self.confirm_winner(results, test_duration, concurrency, score)
+        self.end_checkpoint(state)
+        self.finish_search()
+        return self.report_winner(best)
+
+    def find_optimal_params_evolution(self, max_tests=60, test_duration=15, progress_callback=None,
+                                      concurrency=None, population_size=12, score=None, resume=False, seed=None):
+        """Эволюционный поиск на основе истории и мутаций генератора
+
+        Популяция проверяется поколениями; приспособленность берется из
+        измеренных успешности и задержки. max_tests - общий бюджет проверок.
+        """
+        if self.is_searching:
+            self.logger.warning("Поиск уже выполняется")
+            return None, None
+        
+        from ciadpi_optimizers import EvolutionaryOptimizer
+        
+        self.is_searching = True
+        state = self.begin_checkpoint('evolution', {"max_tests": max_tests, "test_duration": test_duration,
+                                                    "population_size": population_size}, resume, seed)
+        optimizer = EvolutionaryOptimizer(population_size=population_size, score=score, rng=self.rng)
+        if state["resumed"]:
+            optimizer.load_state(state["optimizer"])
+        else:
+            state.update(population=optimizer.initial_population(self.history_store.top_successful(population_size)),
+                         results={})
+        results = state["results"]
+        completed = state["completed"]
+        self.logger.info(f"Начинаем эволюционный поиск (бюджет: {max_tests}, популяция: {population_size})")
+        
+        while state["population"] and completed < max_tests and self.is_searching:
+            # population - еще не проверенные кандидаты текущего поколения
+            state["population"] = state["population"][:max_tests - completed]
+            label = f" (поколение {optimizer.generation + 1})"
+            task = self.evaluation_task(test_duration, label=label)
+            for params, result in self.run_pool(list(state["population"]), task, concurrency):
+                completed += 1
+                results[params] = result
+                optimizer.tell(params, result)
+                state["population"].remove(params)
+                state["completed"] = completed
+                self.save_checkpoint(state, optimizer)
+                if progress_callback:
+                    progress_callback(completed, max_tests, params)
+            if not self.is_searching:
+                break
             
-            success, speed = self.test_params(params, test_duration)
+            best_params, best_fitness = optimizer.best()
+            self.logger.info(f"Поколение {optimizer.generation + 1}: лучшая приспособленность "
+                             f"{best_fitness:.3f} ({best_params})")
+            state["population"] = optimizer.next_generation()
+            self.save_checkpoint(state, optimizer)
+        
+        best = self.confirm_winner(results.values(), test_duration, concurrency, score)
+        self.end_checkpoint(state, optimizer)
+        self.finish_search()
+        return self.report_winner(best)
+
+    def find_optimal_params_bayes(self, max_tests=30, test_duration=15, progress_callback=None,
+                                  concurrency=None, acquisition='thompson', score=None, resume=False, seed=None,
+                                  preselect=True):
+        """Байесовский поиск по измерениям параметров с разогревом по истории
+
+        Кандидаты выбираются пачками по числу параллельных тестов;
+        acquisition: 'thompson' (сэмплирование Томпсона) или 'ei' (ожидаемое улучшение).
+        preselect - при установленном NumPy и достаточной истории кандидаты
+        сначала отбираются из большого пула пространства по линейной модели
+        (BanditOptimizer.ask_preselected), acquisition - запасной способ.
+        """
+        if self.is_searching:
+            self.logger.warning("Поиск уже выполняется")
+            return None, None
+        
+        from ciadpi_optimizers import BanditOptimizer
+        
+        self.is_searching = True
+        concurrency = max(1, concurrency or self.concurrency)
+        state = self.begin_checkpoint('bayes', {"max_tests": max_tests, "test_duration": test_duration,
+                                                "acquisition": acquisition, "preselect": preselect}, resume, seed)
+        optimizer = BanditOptimizer(score=score, rng=self.rng)
+        if state["resumed"]:
+            # Модель уже включает разогрев по истории
+            optimizer.load_state(state["optimizer"])
+            history = []
+        else:
+            history = self.get_history(self.warm_start_limit)
+            optimizer.warm_start(history)
+            state.update(batch=[], results={})
+        results = state["results"]
+        completed = state["completed"]
+        self.logger.info(f"Начинаем байесовский поиск (бюджет: {max_tests}, "
+                         f"история: {len(history)} записей)")
+        
+        task = self.evaluation_task(test_duration)
+        while completed < max_tests and self.is_searching:
+            # batch - выбранные, но еще не проверенные кандидаты
+            if not state["batch"]:
+                for _ in range(min(concurrency, max_tests - completed)):
+                    params = (optimizer.ask_preselected() if preselect else None) or optimizer.ask(acquisition)
+                    if params is None:
+                        break
+                    state["batch"].append(params)
+            if not state["batch"]:
+                break
             
-            if success:
-                successful_params.append((params, speed))
-                if speed < best_speed:
-                    best_speed = speed
-                    best_params = params
-                
-                self.logger.info(f"Успех! Скорость: {speed:.2f} сек")
+            for params, result in self.run_pool(list(state["batch"]), task, concurrency):
+                completed += 1
+                results[params] = result
+                optimizer.tell(params, result)
+                state["batch"].remove(params)
+                state["completed"] = completed
+                self.save_checkpoint(state, optimizer)
+                if progress_callback:
+                    progress_callback(completed, max_tests, params)
+        
+        best = self.confirm_winner(results.values(), test_duration, concurrency, score)
+        self.end_checkpoint(state, optimizer)
+        self.finish_search()
+        return self.report_winner(best)
+
+    def research(self, current_params, time_budget=180, top_k=5, mutations=3, test_duration=10,
+                 concurrency=None, score=None, seed=None):
+        """Быстрый повторный поиск после ухудшения работы текущих параметров
+
+        Кандидаты: текущие параметры, top_k лучших из истории и по mutations
+        мутаций каждого из них. Поиск ограничен time_budget секундами: после
+        истечения новые проверки не начинаются. Текущие параметры
+        проверяются наравне с остальными, поэтому если они по-прежнему
+        лучшие, они и возвращаются. Кэш результатов не используется: после
+        ухудшения прежние результаты не отражают текущее состояние сети.
+        Возвращает (параметры, скорость).
+        """
+        if self.is_searching:
+            self.logger.warning("Поиск уже выполняется")
+            return None, None
+        
+        from ciadpi_param_generator import AdvancedParamGenerator
+        
+        started = time.time()
+        self.begin_rng(seed, {"current_params": current_params, "time_budget": time_budget, "top_k": top_k,
+                              "mutations": mutations, "test_duration": test_duration})
+        generator = AdvancedParamGenerator(self.rng)
+        seeds = [current_params] + [item["params"] for item in self.history_store.top_successful(top_k)]
+        candidates = list(seeds)
+        for params in seeds:
+            candidates.extend(generator.mutate_params(params, 0.3) for _ in range(mutations))
+        candidates = unique_params([params for params in candidates if params])
+        
+        self.is_searching = True
+        self.begin_budget(time_budget, score)
+        self.logger.info(f"Повторный поиск: {len(candidates)} кандидатов, не дольше {time_budget} сек")
+        
+        results = []
+        task = self.evaluation_task(test_duration, label=" (повторный поиск)", use_cache=False)
+        for params, result in self.run_pool(candidates, task, concurrency):
+            results.append(result)
+        
+        best = self.confirm_winner(results, test_duration, concurrency, score)
+        self.finish_search()
+        best = self.report_winner(best)
+        self.record_run('research', started, *best)
+        return best
+
+    def target_groups(self):
+        """Группы проверяемых сайтов: имя -> {"urls": [...], "hosts": [...]}"""
+        groups = {}
+        for url in self.test_urls:
+            hostname = (urlsplit(url).hostname or url).lower()
+            for name, domains in self.domain_groups.items():
+                if any(hostname == domain or hostname.endswith('.' + domain) for domain in domains):
+                    break
             else:
-                self.logger.info("Неудача")
-            
-            # Небольшая пауза между тестами
-            time.sleep(2)
+                name, domains = hostname, [hostname]
+            group = groups.setdefault(name, {"urls": [], "hosts": list(domains)})
+            group["urls"].append(url)
+        return groups
+
+    def write_hosts_file(self, name, hosts):
+        """Файл со списком доменов группы для опции -H"""
+        self.hosts_dir.mkdir(parents=True, exist_ok=True)
+        path = self.hosts_dir / f"{name}.txt"
+        path.write_text('\n'.join(hosts) + '\n', encoding='utf-8')
+        return path
+
+    def find_optimal_params_domains(self, max_tests=50, test_duration=15, progress_callback=None,
+                                    concurrency=None, score=None, seed=None):
+        """Поиск отдельной стратегии для каждой группы доменов
+
+        Каждый кандидат (и запуск без параметров обхода) проверяется на всех
+        сайтах один раз; по результатам сайтов группы выбирается ее лучший
+        кандидат. Группам, которые открываются без обхода, обход не
+        назначается. Из победителей собирается одна строка с группами -H
+        (host_group_params); остальные сайты получают лучший общий кандидат.
+        Возвращает (строка параметров, средняя задержка) или (None, None).
+        """
+        if self.is_searching:
+            self.logger.warning("Поиск уже выполняется")
+            return None, None
         
-        self.is_searching = False
+        self.is_searching = True
+        self.begin_rng(seed, {"max_tests": max_tests, "test_duration": test_duration})
+        score = score or fitness
+        groups = self.target_groups()
+        combinations = [""] + [params for params in self.generate_param_combinations()[:max_tests] if params]
+        total = len(combinations)
+        self.logger.info(f"Начинаем поиск по группам доменов: {', '.join(groups)} ({total} кандидатов)")
         
-        if best_params:
-            self.logger.info(f"Лучшие параметры: {best_params} (скорость: {best_speed:.2f} сек)")
-            return best_params, best_speed
-        else:
+        results = []
+        task = self.evaluation_task(test_duration, label=" (группы доменов)")
+        for completed, (params, result) in enumerate(self.run_pool(combinations, task, concurrency), 1):
+            results.append(result)
+            if progress_callback:
+                progress_callback(completed, total, params)
+        
+        # Лучший кандидат для каждой группы по результатам ее сайтов
+        winners = {}
+        for name, group in groups.items():
+            best, best_score = None, 0.0
+            for result in results:
+                targets = [item for item in result["targets"] if item["url"] in group["urls"]]
+                if not targets or not all(item["success"] for item in targets):
+                    continue
+                group_result = {"success": True, "success_rate": 1.0,
+                                "speed": sum(item["total"] for item in targets) / len(targets)}
+                if not result["params"]:
+                    best = group_result, result["params"]
+                    break
+                if score(group_result) > best_score:
+                    best, best_score = (group_result, result["params"]), score(group_result)
+            if best:
+                winners[name] = best
+                self.logger.info(f"Группа {name}: {best[1] or 'без обхода'} (скорость: {best[0]['speed']:.2f} сек)")
+            else:
+                self.logger.warning(f"Группа {name}: рабочих параметров не найдено")
+        
+        if not winners or not self.is_searching:
+            self.finish_search()
             self.logger.warning("Не найдено рабочих параметров")
             return None, None
+        
+        # Группы с одинаковым победителем объединяются в один список доменов
+        by_params = {}
+        for name, (group_result, params) in winners.items():
+            by_params.setdefault(params, []).append(name)
+        overall = self.confirm_winner([result for result in results if result["params"]], test_duration,
+                                      concurrency, score)
+        if overall and not overall["success"]:
+            overall = None
+        default_params = overall["params"] if overall else ""
+        plan = []
+        for params, names in by_params.items():
+            if params == default_params:
+                continue
+            hosts = [host for name in names for host in groups[name]["hosts"]]
+            plan.append((str(self.write_hosts_file('_'.join(names), hosts)), params))
+        combined = host_group_params(plan + [(None, default_params)])
+        
+        # Итоговая строка проверяется целиком перед применением
+        check = self.evaluate_params(combined, test_duration, label=" (итог по группам)")
+        self.finish_search()
+        if not check["success"]:
+            self.logger.warning(f"Общая строка не прошла проверку: {combined}")
+            return (default_params, overall["speed"]) if overall else (None, None)
+        
+        self.logger.info(f"Параметры по группам доменов: {combined} (скорость: {check['speed']:.2f} сек)")
+        return combined, check["speed"]
 
     def get_history(self, limit=50):
         """Получение истории тестирования"""
-        return self.history["tests"][:limit]
+        return self.history_store.recent(limit)
 
     def clear_history(self):
         """Очистка истории"""
-        self.history = {"tests": [], "last_tested": None}
-        self.save_history()
+        self.history_store.clear()
 
 # Тестирование модуля
 if __name__ == "__main__":
     searcher = CIAutoSearch()
     print("Модуль автопоиска загружен успешно")
-    print(f"История содержит {len(searcher.get_history())} записей")
+    print(f"История содержит {searcher.history_store.count()} записей")
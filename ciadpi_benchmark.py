@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Поддельный ciadpi: SOCKS5-прокси, который «обходит» симулятор DPI только
+# при опциях разрезания (первый пакет отправляется двумя сегментами)
+FAKE_CIADPI = r'''#!/usr/bin/env python3
+import json, select, socket, sys, threading, time, zlib
+CONFIG = json.loads(%(config)r)
+args = sys.argv[1:]
+host = args[args.index('-i') + 1] if '-i' in args else '127.0.0.1'
+port = int(args[args.index('-p') + 1]) if '-p' in args else 1080
+time.sleep(CONFIG["startup_delay"])
+if any(option in args for option in CONFIG["crash_options"]):
+    sys.stderr.write("ciadpi: invalid option\n")
+    sys.exit(1)
+split = any(option in args for option in CONFIG["split_options"])
+# Постоянная для набора параметров задержка - у кандидатов разная скорость
+latency = CONFIG["latency"] + (zlib.crc32(' '.join(args).encode()) %% 1000) / 1000 * CONFIG["latency_spread"]
+
+def relay(client, remote):
+    first = True
+    try:
+        while True:
+            ready, _, _ = select.select([client, remote], [], [], 30)
+            if not ready:
+                return
+            for sock in ready:
+                data = sock.recv(65536)
+                if not data:
+                    return
+                if sock is client and first and split and len(data) > 1:
+                    remote.sendall(data[:1])
+                    time.sleep(0.02)
+                    data = data[1:]
+                first = first and sock is not client
+                (remote if sock is client else client).sendall(data)
+    except OSError:
+        pass
+    finally:
+        client.close()
+        remote.close()
+
+def handle(client):
+    try:
+        client.recv(262)
+        client.sendall(b'\x05\x00')
+        header = client.recv(4)
+        if header[3] == 1:
+            address = socket.inet_ntoa(client.recv(4))
+        else:
+            address = client.recv(client.recv(1)[0]).decode()
+        target_port = int.from_bytes(client.recv(2), 'big')
+        time.sleep(latency)
+        remote = socket.create_connection((address, target_port), 5)
+        remote.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client.sendall(b'\x05\x00\x00\x01' + bytes(6))
+        relay(client, remote)
+    except (OSError, IndexError):
+        # Проверка готовности открывает и сразу закрывает соединение
+        client.close()
+
+server = socket.socket()
+server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+server.bind((host, port))
+server.listen(64)
+while True:
+    connection, _ = server.accept()
+    threading.Thread(target=handle, args=(connection,), daemon=True).start()
+'''
+
+# Поведение поддельного ciadpi по умолчанию
+FAKE_DEFAULTS = {
+    "startup_delay": 0.2,
+    "latency": 0.01,
+    "latency_spread": 0.1,
+    "split_options": ["-s", "-d"],
+    "crash_options": ["-Y"],
+}
+
+
+def write_fake_ciadpi(directory, **config):
+    """Создание исполняемого поддельного ciadpi с заданным поведением"""
+    path = Path(directory) / 'ciadpi'
+    path.write_text(FAKE_CIADPI % {"config": json.dumps(dict(FAKE_DEFAULTS, **config))})
+    path.chmod(0o755)
+    return path
+
+
+def peak_rss_kb():
+    """Пиковое потребление памяти (КБ): процесс и завершенные дочерние"""
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def benchmark_generator(count=1000):
+    """Скорость генерации кандидатов AdvancedParamGenerator"""
+    from ciadpi_param_generator import AdvancedParamGenerator
+
+    generator = AdvancedParamGenerator()
+    start_time = time.perf_counter()
+    params = generator.generate_comprehensive_params(count)
+    elapsed = time.perf_counter() - start_time
+    return {"count": len(params), "elapsed": round(elapsed, 4),
+            "per_second": round(len(params) / elapsed, 1) if elapsed else None}
+
+
+def run_strategy(strategy, max_tests=40, concurrency=None, test_duration=10, fake=None, action='reset',
+                 seed=None):
+    """Один прогон поиска против офлайн-стенда (в текущем процессе)
+
+    Запускать в отдельном процессе с временным HOME - см. run_benchmark.
+    С тем же seed прогон проверяет тех же кандидатов (candidates_digest),
+    пока результаты проверок не расходятся.
+    """
+    from ciadpi_autosearch import CIAutoSearch
+    from ciadpi_dpi_sim import OfflineStand
+
+    events = []
+
+    class BenchmarkSearch(CIAutoSearch):
+        def evaluate_params(self, params, *args, **kwargs):
+            result = super().evaluate_params(params, *args, **kwargs)
+            events.append((time.perf_counter(), params, result["success"], result["speed"]))
+            return result
+
+    with OfflineStand(action=action, delay=test_duration) as stand:
+        searcher = BenchmarkSearch()
+        searcher.ciadpi_path = write_fake_ciadpi(tempfile.mkdtemp(prefix='ciadpi_fake_'), **(fake or {}))
+        searcher.test_urls = stand.urls
+        searcher.ssl_context = stand.ssl_context
+        searcher.use_cache = False
+
+        start_time = time.perf_counter()
+        best_params, best_speed = searcher.find_optimal_params(max_tests, test_duration, concurrency=concurrency,
+                                                               strategy=strategy, seed=seed)
+        elapsed = time.perf_counter() - start_time
+        dpi_stats = stand.stats()
+
+    working = [moment for moment, params, success, speed in events if success]
+    best_found = [moment for moment, params, success, speed in events if success and params == best_params]
+    self_rss, children_rss = peak_rss_kb()
+    tested = '\n'.join(sorted({params for moment, params, success, speed in events}))
+    return {
+        "strategy": strategy,
+        "seed": searcher.search_seed,
+        "candidates": len(events),
+        "candidates_digest": hashlib.sha1(tested.encode()).hexdigest()[:16],
+        "working": len(working),
+        "elapsed": round(elapsed, 3),
+        "candidates_per_minute": round(len(events) / elapsed * 60, 1) if elapsed else None,
+        "time_to_first_working": round(working[0] - start_time, 3) if working else None,
+        "time_to_best": round(best_found[0] - start_time, 3) if best_found else None,
+        "best_params": best_params,
+        "best_speed": best_speed,
+        "peak_rss_kb": self_rss,
+        "peak_rss_children_kb": children_rss,
+        "dpi": dpi_stats,
+    }
+
+
+def benchmark_features(count=1 << 20, batch=1 << 16):
+    """Скорость векторного кодирования и проверки ограничений кандидатов пространства
+
+    Кандидаты кодируются пачками по batch, как в ciadpi_features.preselect.
+    Запускать в отдельном процессе (см. run_benchmark), чтобы его пик
+    памяти не попадал в замеры стратегий. Без NumPy возвращает None.
+    """
+    from ciadpi_features import NUMPY_AVAILABLE, FeatureEncoder, SpaceEncoder
+    from ciadpi_param_generator import AdvancedParamGenerator
+
+    if not NUMPY_AVAILABLE:
+        return None
+    encoder = FeatureEncoder()
+    space_encoder = SpaceEncoder(AdvancedParamGenerator(rng=0).param_space(), encoder)
+    start_time = time.perf_counter()
+    accepted = 0
+    for start in range(0, count, batch):
+        features = space_encoder.encode_range(start, min(start + batch, count))
+        accepted += int(encoder.constraint_mask(features).sum())
+    elapsed = time.perf_counter() - start_time
+    return {"count": count, "accepted": accepted, "elapsed": round(elapsed, 4),
+            "per_second": round(count / elapsed, 1) if elapsed else None, "peak_rss_kb": peak_rss_kb()[0]}
+
+
+def run_child(job, verbose=False):
+    """Задание бенчмарка в отдельном процессе с временным HOME
+
+    Возвращает (код завершения, результат из последней строки вывода или None).
+    """
+    with tempfile.TemporaryDirectory(prefix='ciadpi_bench_') as home:
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', json.dumps(job)],
+            env=dict(os.environ, HOME=home), stdout=subprocess.PIPE,
+            stderr=None if verbose else subprocess.DEVNULL, text=True
+        )
+    if process.returncode != 0 or not process.stdout.strip():
+        return process.returncode, None
+    return process.returncode, json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(strategies, max_tests=40, concurrency=None, test_duration=10, fake=None, action='reset',
+                  verbose=False, seed=None):
+    """Прогон стратегий, каждой - в отдельном процессе с временным HOME
+
+    Отдельный процесс дает честный пик памяти и изолирует историю, кэш
+    результатов и журнал от настоящих файлов пользователя.
+    """
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "config": {"max_tests": max_tests, "concurrency": concurrency, "test_duration": test_duration,
+                   "fake": dict(FAKE_DEFAULTS, **(fake or {})), "action": action, "seed": seed},
+        "generator": benchmark_generator(),
+        "features": None,
+        "runs": [],
+    }
+    for strategy in strategies:
+        job = {"strategy": strategy, "max_tests": max_tests, "concurrency": concurrency,
+               "test_duration": test_duration, "fake": fake, "action": action, "seed": seed}
+        returncode, run = run_child(job, verbose)
+        report["runs"].append(run or {"strategy": strategy, "error": f"код завершения {returncode}"})
+    # Кодирование признаков занимает сотни МБ - отдельным процессом после стратегий
+    report["features"] = run_child({"features": {}}, verbose)[1]
+    return report
+
+
+def compare_reports(baseline, report, tolerance=0.2):
+    """Регрессии относительно прошлого отчета
+
+    Регрессия - скорость перебора упала или время до первого рабочего
+    кандидата выросло больше чем на tolerance. Возвращает список описаний.
+    """
+    previous = {run["strategy"]: run for run in baseline.get("runs", []) if "error" not in run}
+    regressions = []
+    for run in report["runs"]:
+        old = previous.get(run["strategy"])
+        if not old or "error" in run:
+            continue
+        if old["candidates_per_minute"] and run["candidates_per_minute"] < old["candidates_per_minute"] * (1 - tolerance):
+            regressions.append(f"{run['strategy']}: кандидатов/мин {old['candidates_per_minute']} -> "
+                               f"{run['candidates_per_minute']}")
+        if old["time_to_first_working"] and run["time_to_first_working"] and \
+                run["time_to_first_working"] > old["time_to_first_working"] * (1 + tolerance):
+            regressions.append(f"{run['strategy']}: до первого рабочего {old['time_to_first_working']} -> "
+                               f"{run['time_to_first_working']} сек")
+    return regressions
+
+
+def print_report(report):
+    """Краткая таблица результатов"""
+    generator = report["generator"]
+    print(f"Генератор: {generator['count']} кандидатов за {generator['elapsed']} сек")
+    features = report.get("features")
+    if features:
+        print(f"Признаки: {features['count']:,} кандидатов пространства за {features['elapsed']} сек")
+    print(f"{'стратегия':10} {'кандидатов':>10} {'рабочих':>8} {'канд/мин':>9} {'1-й рабочий':>12} "
+          f"{'лучший':>8} {'RSS, МБ':>8}")
+    for run in report["runs"]:
+        if "error" in run:
+            print(f"{run['strategy']:10} ошибка: {run['error']}")
+            continue
+        print(f"{run['strategy']:10} {run['candidates']:>10} {run['working']:>8} {run['candidates_per_minute']:>9} "
+              f"{run['time_to_first_working'] or '-':>12} {run['time_to_best'] or '-':>8} "
+              f"{run['peak_rss_kb'] / 1024:>8.1f}")
+
+
+def save_report(report, output=None):
+    """Запись отчета (по умолчанию в ~/.config/ciadpi/benchmarks/); возвращает путь"""
+    output = Path(output) if output else (
+        Path.home() / '.config' / 'ciadpi' / 'benchmarks' / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк автопоиска на офлайн-стенде с поддельным ciadpi")
+    parser.add_argument('--strategies', default='flat,racing,evolution,bayes')
+    parser.add_argument('--max-tests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=None)
+    parser.add_argument('--test-duration', type=float, default=10)
+    parser.add_argument('--startup-delay', type=float, default=FAKE_DEFAULTS["startup_delay"])
+    parser.add_argument('--action', choices=['reset', 'drop', 'delay'], default='reset',
+                        help="реакция симулятора DPI на заблокированные сайты")
+    parser.add_argument('--output', help="файл отчета (по умолчанию ~/.config/ciadpi/benchmarks/)")
+    parser.add_argument('--baseline', help="прошлый отчет: при регрессии код завершения 1")
+    parser.add_argument('--seed', type=int, default=None, help="seed поиска для повторяемого прогона")
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        job = json.loads(args.child)
+        if "features" in job:
+            print(json.dumps(benchmark_features(**job["features"]), ensure_ascii=False))
+        else:
+            print(json.dumps(run_strategy(**job), ensure_ascii=False))
+        return 0
+
+    report = run_benchmark(args.strategies.split(','), args.max_tests, args.concurrency, args.test_duration,
+                           {"startup_delay": args.startup_delay}, args.action, args.verbose, args.seed)
+    print_report(report)
+
+    print(f"Отчет: {save_report(report, args.output)}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_reports(json.load(f), report)
+        for regression in regressions:
+            print(f"Регрессия: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
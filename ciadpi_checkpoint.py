@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+
+class SearchCheckpoint:
+    """Сохраненное состояние незавершенного поиска
+
+    Состояние - словарь, который каждая стратегия заполняет сама (очередь
+    кандидатов, частичные результаты, состояние оптимизатора). Запись
+    атомарная (через временный файл) и не чаще min_interval секунд, если
+    не запрошена принудительно.
+    """
+
+    def __init__(self, path, min_interval=1.0):
+        self.path = Path(path)
+        self.min_interval = min_interval
+        self.last_save = 0.0
+
+    def exists(self):
+        return self.path.exists()
+
+    def load(self):
+        """Сохраненное состояние или None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def due(self):
+        """Пора ли записывать состояние"""
+        return time.monotonic() - self.last_save >= self.min_interval
+
+    def save(self, state, force=False):
+        """Запись состояния; False, если запись отложена"""
+        if not force and not self.due():
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self.last_save = time.monotonic()
+        return True
+
+    def clear(self):
+        """Удаление состояния после завершения поиска"""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def describe(self):
+        """Краткое описание сохраненного поиска для интерфейса"""
+        state = self.load()
+        if not state:
+            return ""
+        updated = time.strftime("%d.%m %H:%M", time.localtime(state.get("updated", 0)))
+        return f"{state.get('strategy', '?')}, проверено: {state.get('completed', 0)}, {updated}"
+
+
+def rng_state(rng=random):
+    """Состояние генератора (random.Random или модуля random) в виде, пригодном для JSON"""
+    version, internal, gauss_next = rng.getstate()
+    return [version, list(internal), gauss_next]
+
+
+def restore_rng(state, rng=random):
+    """Восстановление генератора из rng_state()"""
+    version, internal, gauss_next = state
+    rng.setstate((version, tuple(internal), gauss_next))
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    import tempfile
+
+    checkpoint = SearchCheckpoint(Path(tempfile.mkdtemp()) / 'checkpoint.json')
+    random.seed(42)
+    checkpoint.save({"strategy": "flat", "completed": 3, "updated": time.time(), "rng": rng_state()}, force=True)
+    expected = [random.random() for _ in range(3)]
+    restore_rng(checkpoint.load()["rng"])
+    print(f"{checkpoint.describe()}; генератор восстановлен: {expected == [random.random() for _ in range(3)]}")
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path.home() / '.local' / 'bin'))
+
+# Консольный интерфейс без GTK: события в stdout по одному JSON на строку
+# (поле "event"), журнал - в stderr
+STRATEGIES = ('flat', 'racing', 'evolution', 'bayes', 'domains', 'space')
+# Флаги apply, которые принимаются перед параметрами ciadpi
+APPLY_FLAGS = {'--best', '--exact', '--remember', '-h', '--help'}
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+output_lock = threading.Lock()
+# Поток событий; обычные print модулей уходят в stderr (см. main)
+events = sys.stdout
+
+
+def emit(event, **fields):
+    """Событие в stdout одной строкой JSON"""
+    line = json.dumps(dict(event=event, time=round(time.time(), 3), **fields), ensure_ascii=False, default=str)
+    with output_lock:
+        print(line, file=events, flush=True)
+
+
+def log(message):
+    """Сообщение для человека - в stderr, чтобы не мешать разбору stdout"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def duration(value):
+    """Длительность для argparse: секунды или число с суффиксом s/m/h"""
+    unit = DURATION_UNITS.get(value[-1:].lower())
+    try:
+        seconds = float(value[:-1] if unit else value) * (unit or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неверная длительность: {value}")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"длительность должна быть положительной: {value}")
+    return seconds
+
+
+def shard(value):
+    """Часть пространства для argparse: «2/8» - вторая из восьми"""
+    from ciadpi_space import parse_shard
+    try:
+        return parse_shard(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неверная часть пространства: {value} (ожидается N/M)")
+
+
+def network_key():
+    """(описание, ключ) текущей сети или None без модуля отслеживания сети"""
+    try:
+        from ciadpi_network import network_fingerprint
+    except ImportError:
+        return None
+    return network_fingerprint()
+
+
+def remember_for_network(params, speed, network):
+    """Запоминание параметров для сети, в которой они проверены"""
+    if not network or not network[1]:
+        return
+    from ciadpi_network import NetworkParamsCache
+    NetworkParamsCache().remember(network[1], network[0], params, speed)
+
+
+def create_searcher(args):
+    """CIAutoSearch с настройками из аргументов"""
+    from ciadpi_autosearch import CIAutoSearch
+
+    searcher = CIAutoSearch()
+    if args.ciadpi:
+        searcher.ciadpi_path = Path(args.ciadpi)
+    if getattr(args, 'urls', None):
+        searcher.test_urls = args.urls.split(',')
+    return searcher
+
+
+def apply_params(params, keep_port=True, network=None, binary=None, speed=None):
+    """Применение параметров к сервису; True при успехе
+
+    При успехе параметры запоминаются для network вместе со скоростью speed
+    (измеренной поиском).
+    """
+    from ciadpi_service import apply_service_params, service_params
+
+    if keep_port:
+        from ciadpi_params import with_instance_options
+        params = with_instance_options(params, service_params())
+    success, message = apply_service_params(params, binary, log=log)
+    emit("applied", params=params, success=success, message=message)
+    if success:
+        remember_for_network(params, speed, network)
+    return success
+
+
+def command_search(args):
+    """Поиск параметров"""
+    searcher = create_searcher(args)
+    searcher.use_cache = not args.no_cache
+    network = network_key()
+    stream = searcher.iter_search(args.max_tests, args.test_duration, args.concurrency, args.strategy,
+                                  resume=args.resume, time_budget=args.budget, shard=args.shard, seed=args.seed,
+                                  offset=args.offset)
+
+    # SIGTERM от систем управления конфигурацией - штатная остановка поиска
+    signal.signal(signal.SIGTERM, lambda *_: searcher.stop_search())
+    emit("started", strategy=args.strategy, max_tests=args.max_tests, concurrency=args.concurrency,
+         time_budget=args.budget, resume=args.resume, seed=args.seed)
+    best_params, best_speed = None, None
+    try:
+        for event in stream:
+            kind = event.pop("type")
+            if kind == "candidate" and not args.details:
+                event.pop("targets")
+            if kind == "finished":
+                best_params, best_speed = event["params"], event["speed"]
+                event["checkpoint"] = searcher.checkpoint.exists()
+            emit(kind, **event)
+    except KeyboardInterrupt:
+        stream.close()
+        emit("finished", params=None, speed=None, seed=searcher.search_seed,
+             checkpoint=searcher.checkpoint.exists())
+
+    if not best_params:
+        return 1
+    remember_for_network(best_params, best_speed, network)
+    if args.apply and not apply_params(best_params, network=network, binary=args.ciadpi, speed=best_speed):
+        return 1
+    return 0
+
+
+def command_benchmark(args):
+    """Бенчмарк стратегий на офлайн-стенде"""
+    from ciadpi_benchmark import compare_reports, run_benchmark, save_report
+
+    report = run_benchmark(args.strategies.split(','), args.max_tests, args.concurrency, args.test_duration,
+                           {"startup_delay": args.startup_delay}, args.action, args.verbose, args.seed)
+    emit("generator", **report["generator"])
+    for run in report["runs"]:
+        emit("benchmark", **run)
+    path = save_report(report, args.output)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_reports(json.load(f), report)
+    emit("finished", report=str(path), regressions=regressions)
+    return 1 if regressions else 0
+
+
+def command_apply(args):
+    """Применение параметров к сервису"""
+    params = ' '.join(args.params).strip()
+    if args.best:
+        from ciadpi_autosearch import CIAutoSearch
+        best = CIAutoSearch().history_store.top_successful(1)
+        if not best:
+            emit("error", message="В истории нет успешных параметров")
+            return 1
+        params = best[0]["params"]
+    if not params:
+        emit("error", message="Не заданы параметры")
+        return 2
+    from ciadpi_params import check_params
+    is_valid, error_msg = check_params(params)
+    if not is_valid:
+        emit("error", message=error_msg)
+        return 2
+    network = network_key() if args.remember else None
+    return 0 if apply_params(params, not args.exact, network, args.ciadpi) else 1
+
+
+def command_history(args):
+    """Вывод истории тестирования"""
+    from ciadpi_autosearch import CIAutoSearch
+
+    store = CIAutoSearch().history_store
+    if args.runs:
+        for run in store.runs(args.limit):
+            emit("run", **run)
+        return 0
+    if args.best:
+        entries = store.top_successful(args.limit, since=time.time() - args.days * 86400)
+    else:
+        entries = store.recent(args.limit)
+        if args.successful:
+            entries = [entry for entry in entries if entry.get("success")]
+    for entry in entries:
+        if not args.details:
+            entry.pop("targets", None)
+        emit("history", **entry)
+    return 0
+
+
+def command_daemon(args):
+    """Контроль качества и переключение параметров по сетям без трея"""
+    from ciadpi_monitor import HealthMonitor
+    from ciadpi_service import service_params
+
+    searcher = create_searcher(args)
+    stop_event = threading.Event()
+
+    def apply_researched(params):
+        return apply_params(params, network=network_key(), binary=args.ciadpi)
+
+    def notify(title, message):
+        emit("notice", title=title, message=message)
+
+    monitor = HealthMonitor(service_params, apply_researched, searcher, searcher.test_urls, interval=args.interval,
+                            research_budget=args.budget, notify=notify)
+    watcher = None
+    try:
+        from ciadpi_network import NetworkParamsCache, NetworkWatcher, describe_network
+    except ImportError:
+        NetworkWatcher = None
+
+    if NetworkWatcher and not args.no_network_switch:
+        cache = NetworkParamsCache()
+
+        def on_network_changed(info, key):
+            monitor.reset()
+            cached = cache.get(key)
+            emit("network", description=describe_network(info), key=key, cached=bool(cached))
+            if cached:
+                apply_params(cached["params"], binary=args.ciadpi)
+
+        watcher = NetworkWatcher(on_network_changed)
+        watcher.start()
+        emit("network", description=describe_network(watcher.info), key=watcher.key,
+             cached=bool(cache.get(watcher.key)))
+
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signal_number, lambda *_: stop_event.set())
+    monitor.start()
+    emit("started", interval=args.interval, research_budget=args.budget)
+    last_report = 0.0
+    while not stop_event.wait(1):
+        if time.monotonic() - last_report >= args.interval:
+            last_report = time.monotonic()
+            emit("health", researching=monitor.researching, **monitor.health())
+    monitor.stop()
+    if watcher:
+        watcher.stop()
+    emit("finished")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="CIADPI без графического интерфейса (вывод - JSON lines)")
+    parser.add_argument('--ciadpi', help="путь к ciadpi (по умолчанию ~/byedpi/ciadpi)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search = commands.add_parser('search', help="поиск параметров")
+    search.add_argument('--strategy', choices=STRATEGIES, default='flat')
+    search.add_argument('--max-tests', type=int, default=20)
+    search.add_argument('--test-duration', type=duration, default=15, help="таймаут проверки кандидата")
+    search.add_argument('--concurrency', type=int, default=None, help="число параллельных проверок")
+    search.add_argument('--budget', type=duration, default=None,
+                        help="ограничение по времени: 900, 15m, 1h")
+    search.add_argument('--resume', action='store_true', help="продолжить прерванный поиск")
+    search.add_argument('--shard', type=shard, default=None,
+                        help="для --strategy space: своя часть пространства, N/M")
+    search.add_argument('--seed', type=int, default=None,
+                        help="seed поиска: с тем же seed и историей поиск повторяется")
+    search.add_argument('--offset', type=int, default=0, help="для --strategy space: начальная позиция в части")
+    search.add_argument('--urls', help="проверяемые сайты через запятую")
+    search.add_argument('--no-cache', action='store_true', help="не использовать кэш результатов")
+    search.add_argument('--apply', action='store_true', help="применить найденные параметры к сервису")
+    search.add_argument('--details', action='store_true', help="результаты по каждому сайту в событиях")
+    search.set_defaults(handler=command_search)
+
+    benchmark = commands.add_parser('benchmark', help="бенчмарк стратегий на офлайн-стенде")
+    benchmark.add_argument('--strategies', default='flat,racing,evolution,bayes')
+    benchmark.add_argument('--max-tests', type=int, default=40)
+    benchmark.add_argument('--concurrency', type=int, default=None)
+    benchmark.add_argument('--test-duration', type=float, default=10)
+    benchmark.add_argument('--startup-delay', type=float, default=0.2)
+    benchmark.add_argument('--action', choices=['reset', 'drop', 'delay'], default='reset')
+    benchmark.add_argument('--output', help="файл отчета")
+    benchmark.add_argument('--baseline', help="прошлый отчет: при регрессии код завершения 1")
+    benchmark.add_argument('--seed', type=int, default=None, help="seed поиска для повторяемого прогона")
+    benchmark.add_argument('--verbose', action='store_true')
+    benchmark.set_defaults(handler=command_benchmark)
+
+    apply = commands.add_parser('apply', help="применить параметры к сервису",
+                                usage="%(prog)s [--best] [--exact] [--remember] [--] PARAMS...")
+    apply.add_argument('--best', action='store_true', help="лучшие успешные параметры из истории")
+    apply.add_argument('--exact', action='store_true', help="не сохранять адрес и порт текущего сервиса")
+    apply.add_argument('--remember', action='store_true', help="запомнить параметры для текущей сети")
+    apply.add_argument('params', nargs='*', help="параметры ciadpi")
+    apply.set_defaults(handler=command_apply)
+
+    history = commands.add_parser('history', help="история тестирования")
+    history.add_argument('--limit', type=int, default=50)
+    history.add_argument('--successful', action='store_true', help="только успешные")
+    history.add_argument('--best', action='store_true', help="лучшие успешные параметры")
+    history.add_argument('--days', type=float, default=7, help="период для --best")
+    history.add_argument('--details', action='store_true', help="с результатами по сайтам")
+    history.add_argument('--runs', action='store_true', help="прошедшие поиски с seed и настройками")
+    history.set_defaults(handler=command_history)
+
+    daemon = commands.add_parser('daemon', help="контроль качества и переключение по сетям")
+    daemon.add_argument('--interval', type=duration, default=60, help="период проверки сервиса")
+    daemon.add_argument('--budget', type=duration, default=180, help="ограничение повторного поиска")
+    daemon.add_argument('--urls', help="проверяемые сайты через запятую")
+    daemon.add_argument('--no-network-switch', action='store_true', help="не переключать параметры по сетям")
+    daemon.set_defaults(handler=command_daemon)
+    return parser
+
+
+def split_apply_params(argv):
+    """(аргументы для argparse, параметры ciadpi команды apply в исходном порядке)
+
+    Параметры ciadpi сами похожи на опции («-s 1+s»), и argparse меняет их
+    порядок, поэтому все после флагов apply (или после «--») передается
+    как есть.
+    """
+    position = 0
+    while position < len(argv):
+        word = argv[position]
+        if word == '--ciadpi':
+            position += 2
+        elif word.startswith('-'):
+            position += 1
+        else:
+            break
+    if position >= len(argv) or argv[position] != 'apply':
+        return argv, []
+    position += 1
+    while position < len(argv) and argv[position] in APPLY_FLAGS:
+        position += 1
+    if position < len(argv) and argv[position] == '--':
+        return argv[:position], argv[position + 1:]
+    return argv[:position], argv[position:]
+
+
+def parse_args(argv=None):
+    """Разбор командной строки"""
+    argv, params = split_apply_params(sys.argv[1:] if argv is None else list(argv))
+    args = build_parser().parse_args(argv)
+    if args.command == 'apply':
+        args.params = params
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.stdout = sys.stderr
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from ciadpi_params import (GLOBAL_OPTIONS, OPTIONS, Token, canonical_tokens, params_fingerprint, parse_tokens,
+                           render)
+
+# Назначение опций ciadpi: bypass - приемы обхода, auto - автоматический
+# режим и таймаут, filter - ограничение трафика группы, socks - обработка
+# запросов SOCKS (-N запрещает доменные имена, сайты по имени не открываются);
+# instance, network и cache на обход не влияют (адрес и режим запуска,
+# сетевые настройки, кэш -A)
+OPTION_TAGS = {
+    '-i': 'instance', '-p': 'instance', '-D': 'instance', '-w': 'instance',
+    '-E': 'network', '-c': 'network', '-I': 'network', '-b': 'network', '-U': 'network',
+    '-N': 'socks',
+    '-g': 'bypass', '-F': 'bypass',
+    '-A': 'auto', '-L': 'auto', '-T': 'auto',
+    '-u': 'cache', '-y': 'cache',
+    '-K': 'filter', '-H': 'filter', '-j': 'filter', '-V': 'filter', '-R': 'filter',
+    '-s': 'bypass', '-d': 'bypass', '-o': 'bypass', '-q': 'bypass', '-f': 'bypass', '-r': 'bypass',
+    '-t': 'bypass', '-S': 'bypass', '-O': 'bypass', '-l': 'bypass', '-e': 'bypass', '-n': 'bypass',
+    '-Q': 'bypass', '-M': 'bypass', '-a': 'bypass', '-Y': 'bypass',
+}
+RELEVANT_TAGS = frozenset(['bypass', 'auto', 'filter', 'socks'])
+
+# Не больше одной опции из группы в наборе (общие опции) или в группе -A:
+# действует последнее значение, остальные лишние
+AT_MOST_ONE = [
+    ('-T',), ('-L',), ('-g',),
+    ('-t',), ('-O',), ('-l',), ('-e',), ('-n',), ('-Q',), ('-M',), ('-a',),
+    ('-K',), ('-H',), ('-j',), ('-V',), ('-R',),
+]
+
+# Опция действует только вместе с одной из перечисленных в той же группе
+# (для общих опций - в любом месте набора)
+REQUIRES = {
+    '-t': ('-f',), '-S': ('-f',), '-O': ('-f',), '-l': ('-f',), '-n': ('-f',), '-Q': ('-f',),
+    '-e': ('-o', '-q'),
+    '-L': ('-A',),
+}
+
+# Несовместимые опции: набор, где обе остались после сокращения, отклоняется
+# целиком (опции, не влияющие на обход, к этому моменту уже убраны)
+EXCLUSIONS = [
+    ('-U', '-a', "-U отключает UDP, поддельные UDP-пакеты -a не отправляются"),
+]
+
+
+class Constraints:
+    """Декларативные ограничения на наборы параметров для поиска
+
+    prune() приводит набор к минимальной равнозначной форме: убирает
+    опции, не влияющие на обход (по тегам OPTION_TAGS), лишние значения
+    опций из AT_MOST_ONE и опции без нужных им опций (REQUIRES). Затем наборы, в которых остались
+    несовместимые опции (EXCLUSIONS), и наборы с ошибками грамматики
+    отклоняются. Равнозначные наборы дают одинаковый key(), поэтому
+    проверяется только один из них.
+    """
+
+    def __init__(self, tags: Optional[Dict[str, str]] = None, relevant: FrozenSet[str] = RELEVANT_TAGS,
+                 at_most_one: Optional[List[Tuple[str, ...]]] = None,
+                 requires: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 exclusions: Optional[List[Tuple[str, str, str]]] = None):
+        self.tags = OPTION_TAGS if tags is None else tags
+        self.relevant = relevant
+        self.requires = REQUIRES if requires is None else requires
+        self.exclusions = EXCLUSIONS if exclusions is None else exclusions
+        # Опция -> номер группы «не больше одной»
+        self.single = {option: number for number, group in enumerate(AT_MOST_ONE if at_most_one is None
+                                                                     else at_most_one) for option in group}
+        self.cache = {}
+
+    def is_relevant(self, option: str) -> bool:
+        """Влияет ли опция на обход"""
+        return self.tags.get(option, 'bypass') in self.relevant
+
+    def search_options(self) -> List[str]:
+        """Опции, которые имеет смысл перебирать при поиске"""
+        return [option for option in OPTIONS if self.is_relevant(option)]
+
+    def excluded(self, options, violations: List[str]) -> bool:
+        """Есть ли среди options несовместимая пара (с записью нарушения)"""
+        for first, second, reason in self.exclusions:
+            if first in options and second in options:
+                violations.append(reason)
+                return True
+        return False
+
+    def single_values(self, tokens: List[Token], violations: List[str]) -> List[Token]:
+        """Из каждой группы AT_MOST_ONE остается последняя опция"""
+        last = {}
+        for index, (option, _) in enumerate(tokens):
+            if option in self.single:
+                last[self.single[option]] = index
+        kept = []
+        for index, (option, value) in enumerate(tokens):
+            if option in self.single and last[self.single[option]] != index:
+                violations.append(f"лишнее значение {option} {value} (действует последнее)")
+                continue
+            kept.append((option, value))
+        return kept
+
+    def analyze(self, params: str) -> Tuple[Optional[str], List[str]]:
+        """(минимальная равнозначная строка или None, список нарушений)"""
+        entry = self.cache.get(params)
+        if entry is not None:
+            return entry
+        tokens, errors = parse_tokens(params)
+        if errors:
+            return None, errors
+
+        violations = []
+        global_tokens = []
+        groups = [[]]
+        for option, value in tokens:
+            if option in GLOBAL_OPTIONS:
+                global_tokens.append((option, value))
+            elif option == '-A':
+                groups.append([(option, value)])
+            else:
+                groups[-1].append((option, value))
+
+        relevant = []
+        for scope in [global_tokens] + groups:
+            kept = []
+            for option, value in scope:
+                if self.is_relevant(option):
+                    kept.append((option, value))
+                else:
+                    violations.append(f"{option} не влияет на обход")
+            relevant.append(self.single_values(kept, violations))
+        all_options = {option for scope in relevant for option, _ in scope}
+        global_result = [token for token in relevant[0]
+                         if self.required_present(token[0], all_options, violations)]
+        group_results = []
+        for group in relevant[1:]:
+            options = {option for option, _ in group}
+            group_results.append([token for token in group
+                                  if self.required_present(token[0], options, violations)])
+
+        # Несовместимость проверяется у сокращенного набора; общие опции
+        # действуют во всех группах
+        global_options = {option for option, _ in global_result}
+        if any(self.excluded(global_options | {option for option, _ in group}, violations)
+               for group in group_results):
+            entry = (None, violations)
+        else:
+            result = global_result + [token for group in group_results for token in group]
+            entry = (render(canonical_tokens(result)), violations)
+
+        if len(self.cache) < 100_000:
+            self.cache[params] = entry
+        return entry
+
+    def required_present(self, option: str, options, violations: List[str]) -> bool:
+        """Есть ли среди options опция, нужная option (с записью нарушения)"""
+        required = self.requires.get(option)
+        if not required or any(other in options for other in required):
+            return True
+        violations.append(f"{option} без {' или '.join(required)} не действует")
+        return False
+
+    def prune(self, params: str) -> Optional[str]:
+        """Минимальная равнозначная строка или None для недопустимого набора"""
+        return self.analyze(params)[0]
+
+    def violations(self, params: str) -> List[str]:
+        """Нарушения ограничений (пусто - набор уже минимален и допустим)"""
+        return self.analyze(params)[1]
+
+    def allows(self, params: str) -> bool:
+        """Допустим ли набор в том виде, как записан (без лишних опций)"""
+        return not self.analyze(params)[1]
+
+    def key(self, params: str) -> Optional[str]:
+        """Отпечаток минимальной формы: равнозначные наборы дают один ключ"""
+        pruned = self.prune(params)
+        return None if pruned is None else params_fingerprint(pruned)
+
+
+CONSTRAINTS = Constraints()
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    examples = [
+        "-o1 -o25+s -T3 -At o--tlsrec 1+s",
+        "-o1 -T3 -T5 -s 1+s -t 8",
+        "-D -i 0.0.0.0 -p 1080 -o1 -f 1+m -t 8 -S",
+        "-L 1 -o1",
+        "-U -a 2 -o1",
+        "-o1 -A torst -t 8 -f 2+m",
+    ]
+    for params in examples:
+        pruned, violations = CONSTRAINTS.analyze(params)
+        print(f"{params}\n  -> {pruned if pruned is not None else 'отклонен'}")
+        for violation in violations:
+            print(f"     {violation}")
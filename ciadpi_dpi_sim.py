@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+import asyncio
+import socket
+import ssl
+import struct
+import threading
+import time
+
+from ciadpi_testserver import LocalTestServer, make_self_signed_cert
+
+# Реакции на совпадение с блок-листом
+ACTIONS = ('reset', 'drop', 'delay')
+
+
+def parse_sni(data):
+    """Имя сервера (SNI) из TLS ClientHello
+
+    Возвращает имя, '' если расширения SNI нет, или None, если данных
+    недостаточно для разбора (ClientHello разрезан на части).
+    """
+    if not data or data[0] != 0x16:
+        return ''
+    if len(data) < 5:
+        return None
+    record_length = struct.unpack('!H', data[3:5])[0]
+    body = data[5:5 + record_length]
+    if len(body) < record_length:
+        return None
+    if not body or body[0] != 0x01:
+        return ''
+    try:
+        position = 4 + 2 + 32  # заголовок рукопожатия, версия, random
+        position += 1 + body[position]  # session id
+        position += 2 + struct.unpack('!H', body[position:position + 2])[0]  # шифры
+        position += 1 + body[position]  # сжатие
+        extensions_end = position + 2 + struct.unpack('!H', body[position:position + 2])[0]
+        position += 2
+        while position + 4 <= extensions_end:
+            kind, length = struct.unpack('!HH', body[position:position + 4])
+            position += 4
+            if kind == 0:
+                # server_name_list: длина списка, тип имени, длина имени
+                name_length = struct.unpack('!H', body[position + 3:position + 5])[0]
+                return body[position + 5:position + 5 + name_length].decode('ascii', 'replace')
+            position += length
+    except (IndexError, struct.error):
+        return ''
+    return ''
+
+
+def parse_host(data):
+    """Значение заголовка Host из HTTP-запроса (без порта)
+
+    None - заголовки еще не пришли целиком, '' - это не HTTP или Host нет.
+    """
+    if not data[:8].split(b' ')[0].isalpha():
+        return ''
+    head, separator, _ = data.partition(b'\r\n\r\n')
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'host':
+            return value.strip().decode('latin-1').rsplit(':', 1)[0].strip('[]')
+    return '' if separator else None
+
+
+def parse_name(data):
+    """SNI или Host из начала соединения (None - первая запись еще не пришла целиком)"""
+    return parse_sni(data) if data[:1] == b'\x16' else parse_host(data)
+
+
+def inspect_segments(segments, reassemble=False):
+    """Решение DPI по сегментам начала соединения: найденное имя или None
+
+    Простой DPI разбирает только первый сегмент: если ClientHello или
+    заголовки HTTP разрезаны, имя не находится (None) и соединение
+    пропускается. reassemble=True - разбор собранных вместе сегментов.
+    Результат зависит только от сегментов, поэтому одинаковое разрезание
+    дает одинаковое решение.
+    """
+    if not segments:
+        return ''
+    return parse_name(b''.join(segments) if reassemble else segments[0])
+
+
+class DPISimulator:
+    """Локальный «провайдерский DPI» для офлайн-проверки автопоиска
+
+    TCP-ретранслятор: принимает соединения и пересылает их на upstream
+    (локальный HTTP/HTTPS-сервер). Первые данные клиента проверяются на SNI
+    или заголовок Host; при совпадении с блок-листом соединение сбрасывается
+    (reset), замораживается (drop) или задерживается (delay).
+
+    Данные соединения накапливаются до конца первой записи (TLS-запись
+    или заголовки HTTP, не больше inspect_bytes байт), и только затем
+    принимается решение (inspect_segments). Сегменты - порции данных в
+    порядке прихода. Как и простые DPI, по умолчанию смотрит только первый
+    сегмент: если ClientHello разрезан (-s, -d у ciadpi), имя не
+    разбирается и соединение пропускается. reassemble=True разбирает
+    запись целиком - такой DPI разрезанием не обойти.
+    """
+
+    def __init__(self, upstream, blocklist=None, action='reset', delay=3.0, host='127.0.0.1', port=0,
+                 reassemble=False, inspect_bytes=4096, inspect_timeout=0.5):
+        if action not in ACTIONS:
+            raise ValueError(f"Неизвестная реакция DPI: {action}")
+        self.upstream = upstream
+        self.blocklist = {domain.lower().strip('.') for domain in blocklist or []}
+        self.action = action
+        self.delay = delay
+        self.host = host
+        self.port = port
+        self.reassemble = reassemble
+        self.inspect_bytes = inspect_bytes
+        self.inspect_timeout = inspect_timeout
+        self.stats = {"connections": 0, "blocked": 0, "passed": 0, "unparsed": 0}
+        self.lock = threading.Lock()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+
+    def is_blocked(self, name):
+        """Совпадение имени с блок-листом (сам домен или поддомен)"""
+        name = (name or '').lower().strip('.')
+        return any(name == domain or name.endswith('.' + domain) for domain in self.blocklist)
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    async def inspect(self, reader):
+        """Данные клиента до конца первой записи и найденное имя (None - не разобрано)"""
+        segments = [await reader.read(self.inspect_bytes)]
+        data = segments[0]
+        while data and parse_name(data) is None and len(data) < self.inspect_bytes:
+            try:
+                chunk = await asyncio.wait_for(reader.read(self.inspect_bytes - len(data)), self.inspect_timeout)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            segments.append(chunk)
+            data += chunk
+        return data, inspect_segments(segments, self.reassemble)
+
+    @staticmethod
+    def reset(writer):
+        """Сброс соединения пакетом RST (SO_LINGER с нулевым таймаутом)"""
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        writer.transport.abort()
+
+    @staticmethod
+    async def pipe(reader, writer):
+        """Пересылка данных в одну сторону до закрытия"""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, reader, writer):
+        """Обработка одного клиентского соединения"""
+        self.count("connections")
+        try:
+            data, name = await self.inspect(reader)
+            if name is None:
+                self.count("unparsed")
+            if self.is_blocked(name):
+                self.count("blocked")
+                if self.action == 'reset':
+                    self.reset(writer)
+                    return
+                if self.action == 'drop':
+                    # Данные в обе стороны больше не идут, клиент ждет таймаута
+                    while await reader.read(65536):
+                        pass
+                    writer.close()
+                    return
+                await asyncio.sleep(self.delay)
+            else:
+                self.count("passed")
+
+            upstream_reader, upstream_writer = await asyncio.open_connection(*self.upstream)
+            upstream_writer.write(data)
+            await upstream_writer.drain()
+            await asyncio.gather(self.pipe(reader, upstream_writer), self.pipe(upstream_reader, writer))
+        except (OSError, asyncio.CancelledError):
+            writer.close()
+
+    def run(self):
+        """Цикл ретранслятора в фоновом потоке"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started.set()
+        self.loop.run_forever()
+
+        self.server.close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def start(self):
+        """Запуск ретранслятора; возвращает порт"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+        return self.port
+
+    def stop(self):
+        """Остановка ретранслятора"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(5)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class OfflineStand:
+    """Офлайн-стенд: локальные HTTPS/HTTP-сайты за симулятором DPI
+
+    Сайты с именем blocked_host блокируются, 127.0.0.1 - нет. Готовые для
+    CIAutoSearch адреса - urls (или blocked_urls/open_urls), контекст TLS
+    с сертификатом стенда - ssl_context.
+    """
+
+    def __init__(self, action='reset', delay=3.0, reassemble=False, blocked_host='localhost'):
+        self.blocked_host = blocked_host
+        cert = make_self_signed_cert(hostname=blocked_host)
+        self.ssl_context = ssl.create_default_context(cafile=cert[0]) if cert else None
+        self.tls_origin = LocalTestServer(certfile=cert[0], keyfile=cert[1]) if cert else None
+        self.http_origin = LocalTestServer()
+        self.simulators = []
+        self.action = action
+        self.delay = delay
+        self.reassemble = reassemble
+        self.blocked_urls = []
+        self.open_urls = []
+
+    @property
+    def urls(self):
+        return self.blocked_urls + self.open_urls
+
+    def start(self):
+        """Запуск сайтов и симуляторов перед ними"""
+        for origin in filter(None, [self.tls_origin, self.http_origin]):
+            origin.start()
+            simulator = DPISimulator((origin.host, origin.port), [self.blocked_host], self.action,
+                                     self.delay, reassemble=self.reassemble)
+            simulator.start()
+            self.simulators.append(simulator)
+            address = f"{origin.scheme}://{{host}}:{simulator.port}/"
+            self.blocked_urls.append(address.format(host=self.blocked_host))
+            if origin.scheme == 'http':
+                self.open_urls.append(address.format(host='127.0.0.1'))
+        return self
+
+    def stop(self):
+        """Остановка стенда"""
+        for simulator in self.simulators:
+            simulator.stop()
+        for origin in filter(None, [self.tls_origin, self.http_origin]):
+            origin.stop()
+
+    def stats(self):
+        """Суммарная статистика симуляторов"""
+        total = {}
+        for simulator in self.simulators:
+            for key, value in simulator.stats.items():
+                total[key] = total.get(key, 0) + value
+        return total
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    from ciadpi_probe import run_probes
+
+    for action in ACTIONS:
+        with OfflineStand(action=action, delay=1.0) as stand:
+            start_time = time.perf_counter()
+            results = run_probes(stand.urls, timeout=2, ssl_context=stand.ssl_context)
+            print(f"{action}: {time.perf_counter() - start_time:.2f} сек, {stand.stats()}")
+            for item in results:
+                print(f"  {item['url']:35} успех: {item['success']}, ошибка: {item['error']}")
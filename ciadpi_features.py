@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ciadpi_constraints import CONSTRAINTS, Constraints
+from ciadpi_params import (AUTO_TRIGGERS, HTTP_MODS, OFFSET_FLAGS, OPTIONS, PROTOCOLS, VALUE_PARSERS, Offset,
+                           parse_offset, parse_tokens, typed_value)
+from ciadpi_scoring import fitness
+
+# NumPy нужен только для пакетной обработки; кодирование одного набора работает без него
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Варианты опций со списком значений: каждый вариант - отдельный признак
+CHOICES = {
+    '-A': AUTO_TRIGGERS,
+    '-K': tuple(sorted(PROTOCOLS)),
+    '-M': tuple(sorted(HTTP_MODS)),
+    '-Q': ('r', 'o'),
+}
+
+# Опции с числовым значением: признак - само значение
+NUMERIC_OPTIONS = {'-T', '-t', '-g', '-L', '-a', '-c', '-b', '-u'}
+
+
+def require_numpy():
+    """Ошибка с подсказкой, если NumPy не установлен"""
+    if not NUMPY_AVAILABLE:
+        raise ImportError("Для пакетной обработки кандидатов нужен NumPy (pip install numpy)")
+
+
+class FeatureEncoder:
+    """Кодирование набора параметров в вектор признаков фиксированной ширины
+
+    Для каждой опции, влияющей на обход (см. ciadpi_constraints), есть
+    признак-счетчик; у позиционных опций (-s, -d, -o...) добавляются сумма
+    смещений и счетчики флагов позиции, у числовых (-T, -t...) - сумма
+    значений, у опций со списком (-A, -M...) - счетчики вариантов. Все
+    признаки складываются по опциям набора, поэтому вектор набора равен
+    сумме векторов его частей - на этом построено кодирование
+    пространства (SpaceEncoder).
+
+    Методы обхода (-s, -d, -o...) - счетчики, а не признаки 0/1: сумма
+    нужна для кодирования по измерениям и для проверки «не больше одной»
+    (constraint_mask). Для метода, заданного один раз, счетчик совпадает
+    с признаком 0/1; коэффициент модели - вклад еще одного вхождения.
+    """
+
+    def __init__(self, constraints: Optional[Constraints] = None):
+        self.constraints = constraints or CONSTRAINTS
+        self.columns = []
+        for option in self.constraints.search_options():
+            self.columns.append(option)
+            if VALUE_PARSERS.get(option) is parse_offset:
+                self.columns.append(f"{option}:pos")
+                self.columns.extend(f"{option}+{flag}" for flag in sorted(OFFSET_FLAGS))
+            elif option in NUMERIC_OPTIONS and OPTIONS[option][1]:
+                self.columns.append(f"{option}:value")
+            elif option in CHOICES:
+                self.columns.extend(f"{option}={choice}" for choice in CHOICES[option])
+        self.index = {column: number for number, column in enumerate(self.columns)}
+        self.width = len(self.columns)
+
+    def encode_raw(self, params: str) -> List[float]:
+        """Признаки набора как записан, без приведения к минимальной форме
+
+        Опции, для которых нет признаков, и слова без опции пропускаются.
+        При ошибках грамматики выбрасывается ValueError.
+        """
+        tokens, errors = parse_tokens(params)
+        if errors:
+            raise ValueError('; '.join(errors))
+        vector = [0.0] * self.width
+        index = self.index
+        for option, raw in tokens:
+            column = index.get(option)
+            if column is None:
+                continue
+            vector[column] += 1.0
+            value = typed_value(option, raw)[0]
+            if isinstance(value, Offset):
+                vector[index[f"{option}:pos"]] += value.position
+                for flag in value.flags:
+                    vector[index[f"{option}+{flag}"]] += 1.0
+            elif isinstance(value, tuple):
+                for choice in value:
+                    column = index.get(f"{option}={choice}")
+                    if column is not None:
+                        vector[column] += 1.0
+            elif f"{option}:value" in index:
+                vector[index[f"{option}:value"]] += float(value)
+        return vector
+
+    def encode(self, params: str) -> Optional[List[float]]:
+        """Признаки минимальной формы набора или None для недопустимого"""
+        pruned = self.constraints.prune(params)
+        return None if pruned is None else self.encode_raw(pruned)
+
+    def encode_batch(self, params_list: Iterable[str]) -> "np.ndarray":
+        """Матрица признаков (кандидаты x признаки); недопустимые - строки NaN"""
+        require_numpy()
+        rows = []
+        cache = {}
+        for params in params_list:
+            pruned = self.constraints.prune(params)
+            if pruned not in cache:
+                cache[pruned] = [math.nan] * self.width if pruned is None else self.encode_raw(pruned)
+            rows.append(cache[pruned])
+        return np.array(rows, dtype=np.float32).reshape(len(rows), self.width)
+
+    def column(self, features: "np.ndarray", name: str) -> "np.ndarray":
+        """Столбец признака name (нулевой, если признака нет)"""
+        number = self.index.get(name)
+        return features[:, number] if number is not None else np.zeros(len(features), dtype=features.dtype)
+
+    def constraint_mask(self, features: "np.ndarray") -> "np.ndarray":
+        """Маска допустимых строк по таблицам ограничений, без разбора строк
+
+        Проверяются «не больше одной», обязательные пары и несовместимые
+        опции по счетчикам опций. Группы -A не различаются, поэтому
+        проверка точна для наборов, где после -A нет других опций (так
+        строятся кандидаты пространства); слова без опции и опции без
+        признаков в векторе не видны.
+        """
+        require_numpy()
+        counts = {option: self.column(features, option) for option in self.constraints.search_options()}
+        mask = np.isfinite(features).all(axis=1)
+        groups = {}
+        for option, number in self.constraints.single.items():
+            groups.setdefault(number, []).append(option)
+        for options in groups.values():
+            present = [counts[option] for option in options if option in counts]
+            if present:
+                mask &= sum(present) <= 1
+        for option, required in self.constraints.requires.items():
+            if option in counts:
+                present = [counts[other] > 0 for other in required if other in counts]
+                mask &= (counts[option] == 0) | np.logical_or.reduce(present or [False])
+        for first, second, _ in self.constraints.exclusions:
+            if first in counts and second in counts:
+                mask &= (counts[first] == 0) | (counts[second] == 0)
+        return mask
+
+
+class SpaceEncoder:
+    """Векторное кодирование кандидатов ParamSpace по номерам
+
+    Для каждого измерения заранее кодируются его варианты (хранятся только
+    ненулевые столбцы). Признаки кандидата - сумма признаков выбранных
+    вариантов, поэтому миллионы номеров кодируются операциями над
+    массивами, без построения строк. Номера должны помещаться в int64.
+    """
+
+    def __init__(self, space, encoder: Optional[FeatureEncoder] = None):
+        require_numpy()
+        if space.size > np.iinfo(np.int64).max:
+            raise ValueError(f"Пространство слишком велико для int64: {space.size:,}")
+        self.space = space
+        self.encoder = encoder or FeatureEncoder()
+        self.radices = [np.int64(radix) for radix in space.radices]
+        self.tables = []
+        for values in space.dimensions:
+            table = np.array([self.encoder.encode_raw(values[number]) for number in range(len(values))],
+                             dtype=np.float32).reshape(len(values), self.encoder.width)
+            used = np.flatnonzero(np.any(table != 0, axis=0))
+            self.tables.append((used, np.ascontiguousarray(table[:, used])))
+
+    def encode(self, indices) -> "np.ndarray":
+        """Матрица признаков кандидатов с номерами indices"""
+        indices = np.asarray(indices, dtype=np.int64)
+        if indices.size and (indices.min() < 0 or indices.max() >= self.space.size):
+            raise IndexError("номер вне пространства")
+        features = np.zeros((len(indices), self.encoder.width), dtype=np.float32)
+        rest = indices
+        for radix, (used, table) in zip(self.radices, self.tables):
+            rest, digits = np.divmod(rest, radix)
+            if len(used):
+                features[:, used] += table[digits]
+        return features
+
+    def encode_range(self, start: int, stop: int) -> "np.ndarray":
+        """Матрица признаков кандидатов с номерами start..stop-1"""
+        return self.encode(np.arange(start, stop, dtype=np.int64))
+
+
+class LinearSurrogate:
+    """Линейная модель оценки кандидата по признакам (гребневая регрессия)
+
+    Обучается на проверенных кандидатах (история, результаты поиска) и
+    предсказывает их оценку (по умолчанию fitness) для целых матриц
+    признаков за одно умножение. Признаки приводятся к нулевому среднему
+    и единичному разбросу; свободный член не штрафуется.
+    """
+
+    def __init__(self, encoder: Optional[FeatureEncoder] = None, alpha: float = 1.0):
+        require_numpy()
+        self.encoder = encoder or FeatureEncoder()
+        self.alpha = alpha
+        self.weights = None
+        self.bias = 0.0
+
+    def fit(self, features: "np.ndarray", targets) -> "LinearSurrogate":
+        """Обучение на матрице признаков и оценках; строки с NaN пропускаются"""
+        features = np.asarray(features, dtype=np.float64)
+        targets = np.asarray(targets, dtype=np.float64)
+        valid = np.isfinite(features).all(axis=1) & np.isfinite(targets)
+        features, targets = features[valid], targets[valid]
+        if not len(targets):
+            raise ValueError("Нет кандидатов для обучения модели")
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        centered = (features - self.mean) / self.scale
+        self.bias = float(targets.mean())
+        gram = centered.T @ centered + self.alpha * np.eye(self.encoder.width)
+        self.weights = np.linalg.solve(gram, centered.T @ (targets - self.bias))
+        return self
+
+    def fit_history(self, history: List[Dict], score=None) -> "LinearSurrogate":
+        """Обучение на записях истории ({"params", "success", "speed"...})"""
+        score = score or fitness
+        items = [item for item in history if item.get("params")]
+        features = self.encoder.encode_batch(item["params"] for item in items)
+        return self.fit(features, [score(item) for item in items])
+
+    def predict(self, features: "np.ndarray") -> "np.ndarray":
+        """Предсказанные оценки; для строк с NaN - минус бесконечность"""
+        if self.weights is None:
+            raise ValueError("Модель не обучена")
+        features = np.asarray(features, dtype=np.float64)
+        scores = ((features - self.mean) / self.scale) @ self.weights + self.bias
+        return np.where(np.isfinite(scores), scores, -np.inf)
+
+
+def top_indices(scores: "np.ndarray", count: int) -> "np.ndarray":
+    """Номера count наибольших оценок по убыванию (без полной сортировки)"""
+    count = min(count, len(scores))
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, count - 1)[:count]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def select_top(params_list: List[str], surrogate: LinearSurrogate, count: int) -> List[Tuple[str, float]]:
+    """count лучших по модели допустимых кандидатов из списка: (params, оценка)"""
+    params_list = list(params_list)
+    features = surrogate.encoder.encode_batch(params_list)
+    scores = surrogate.predict(features)
+    scores[~surrogate.encoder.constraint_mask(features)] = -np.inf
+    return [(params_list[number], float(scores[number])) for number in top_indices(scores, count)
+            if np.isfinite(scores[number])]
+
+
+def preselect(space_encoder: SpaceEncoder, surrogate: LinearSurrogate, count: int, start: int = 0,
+              stop: Optional[int] = None, batch: int = 1 << 16, indices=None) -> List[Tuple[int, str, float]]:
+    """Предварительный отбор в пространстве: count лучших по модели кандидатов
+
+    Номера start..stop (или заданные indices, например случайный пул)
+    кодируются и оцениваются пачками по batch, память не зависит от длины
+    диапазона. Недопустимые по ограничениям кандидаты отбрасываются по
+    маске. Возвращает (номер, params, оценка) по убыванию оценки.
+    """
+    stop = space_encoder.space.size if stop is None else min(stop, space_encoder.space.size)
+    if indices is None:
+        chunks = (np.arange(chunk, min(chunk + batch, stop), dtype=np.int64) for chunk in range(start, stop, batch))
+    else:
+        indices = np.asarray(indices, dtype=np.int64)
+        chunks = (indices[chunk:chunk + batch] for chunk in range(0, len(indices), batch))
+    best_indices = np.zeros(0, dtype=np.int64)
+    best_scores = np.zeros(0, dtype=np.float64)
+    for indices in chunks:
+        features = space_encoder.encode(indices)
+        scores = surrogate.predict(features)
+        keep = space_encoder.encoder.constraint_mask(features) & np.isfinite(scores)
+        indices = np.concatenate([best_indices, indices[keep]])
+        scores = np.concatenate([best_scores, scores[keep]])
+        top = top_indices(scores, count)
+        best_indices, best_scores = indices[top], scores[top]
+    return [(int(index), space_encoder.space[int(index)], float(score))
+            for index, score in zip(best_indices, best_scores)]
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    import random
+    import time
+
+    encoder = FeatureEncoder()
+    print(f"Признаков: {encoder.width}")
+    example = "-o1 -o25+s -T3 -At o--tlsrec 1+s"
+    vector = encoder.encode(example)
+    print(f"{example}: " + ', '.join(f"{name}={value:g}" for name, value in zip(encoder.columns, vector) if value))
+
+    if not NUMPY_AVAILABLE:
+        print("NumPy не установлен - пакетная обработка недоступна")
+        raise SystemExit(0)
+
+    from ciadpi_param_generator import AdvancedParamGenerator
+
+    generator = AdvancedParamGenerator(rng=1)
+    space = generator.param_space()
+    start_time = time.perf_counter()
+    space_encoder = SpaceEncoder(space, encoder)
+    print(f"Таблицы пространства: {time.perf_counter() - start_time:.2f} сек")
+
+    # Модель на синтетической истории: быстрее наборы с -o и -T 2
+    rng = random.Random(1)
+    history = []
+    for params in generator.generate_comprehensive_params(500):
+        speed = 0.5 + rng.random() - 0.3 * ('-o' in params) - 0.2 * ('-T 2' in params)
+        history.append({"params": params, "success": rng.random() < 0.7, "speed": max(speed, 0.01)})
+    surrogate = LinearSurrogate(encoder).fit_history(history)
+
+    start_time = time.perf_counter()
+    total = 1 << 20
+    found = preselect(space_encoder, surrogate, 5, stop=total)
+    elapsed = time.perf_counter() - start_time
+    print(f"Отбор из {total:,} кандидатов: {elapsed:.2f} сек ({total / elapsed:,.0f} в секунду)")
+    for index, params, score in found:
+        print(f"  #{index}: {score:.3f} {params}")
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from ciadpi_params import params_fingerprint
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    id INTEGER PRIMARY KEY,
+    params TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    success INTEGER NOT NULL,
+    speed REAL,
+    startup_time REAL,
+    notes TEXT,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS tests_fingerprint ON tests (fingerprint);
+CREATE INDEX IF NOT EXISTS tests_timestamp ON tests (timestamp);
+CREATE INDEX IF NOT EXISTS tests_success_timestamp ON tests (success, timestamp);
+CREATE INDEX IF NOT EXISTS tests_success_speed ON tests (success, speed);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    strategy TEXT NOT NULL,
+    seed INTEGER,
+    settings TEXT,
+    params TEXT,
+    speed REAL,
+    completed INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+"""
+
+# Поля записи, которые хранятся в отдельных колонках
+COLUMNS = ('params', 'timestamp', 'success', 'speed', 'startup_time', 'notes')
+
+
+class HistoryStore:
+    """История тестирования в SQLite (WAL)
+
+    Запись идет пачками: add() копит записи в памяти и сбрасывает их одной
+    транзакцией по размеру пачки или по времени. Благодаря WAL чтение из
+    других процессов (трея) не блокируется записью поиска.
+    """
+
+    def __init__(self, db_path, batch_size=50, flush_interval=1.0):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self.connection()
+        connection.executescript(SCHEMA)
+        connection.commit()
+
+    def connection(self):
+        """Соединение текущего потока"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.db_path), timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def to_row(entry):
+        """Запись истории -> строка таблицы"""
+        timestamp = entry.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp).timestamp()
+        details = {key: value for key, value in entry.items() if key not in COLUMNS}
+        return (
+            entry["params"],
+            params_fingerprint(entry["params"]),
+            timestamp or time.time(),
+            1 if entry.get("success") else 0,
+            entry.get("speed"),
+            entry.get("startup_time"),
+            entry.get("notes", ""),
+            json.dumps(details, ensure_ascii=False) if details else None,
+        )
+
+    @staticmethod
+    def from_row(row):
+        """Строка таблицы -> запись истории в прежнем формате"""
+        params, timestamp, success, speed, startup_time, notes, details = row
+        entry = {
+            "params": params,
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            "success": bool(success),
+            "speed": speed,
+            "notes": notes or "",
+        }
+        if startup_time is not None:
+            entry["startup_time"] = startup_time
+        if details:
+            entry.update(json.loads(details))
+        return entry
+
+    def add(self, entry):
+        """Добавление записи (сбрасывается на диск пачкой)"""
+        with self.lock:
+            self.pending.append(self.to_row(entry))
+            due = (len(self.pending) >= self.batch_size or
+                   time.monotonic() - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Запись накопленных записей одной транзакцией"""
+        with self.lock:
+            rows, self.pending = self.pending, []
+            self.last_flush = time.monotonic()
+        if not rows:
+            return
+        connection = self.connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO tests (params, fingerprint, timestamp, success, speed, startup_time, notes, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def query(self, sql, args=()):
+        """Чтение с предварительным сбросом своих несохраненных записей"""
+        self.flush()
+        return self.connection().execute(sql, args).fetchall()
+
+    def recent(self, limit=50):
+        """Последние записи, новые первыми"""
+        rows = self.query(
+            "SELECT params, timestamp, success, speed, startup_time, notes, details "
+            "FROM tests ORDER BY timestamp DESC LIMIT ?", (limit,)
+        )
+        return [self.from_row(row) for row in rows]
+
+    def top_successful(self, limit=10, since=None):
+        """Лучшие успешные параметры (по минимальной задержке) с момента since
+
+        since - unix-время; по умолчанию за последнюю неделю. Равнозначные
+        записи параметров объединяются по отпечатку.
+        """
+        since = time.time() - 7 * 86400 if since is None else since
+        rows = self.query(
+            "SELECT params, MIN(speed) AS best, COUNT(*) FROM tests "
+            "WHERE success = 1 AND timestamp >= ? "
+            "GROUP BY fingerprint ORDER BY best LIMIT ?", (since, limit)
+        )
+        return [{"params": params, "success": True, "speed": best, "tests": count}
+                for params, best, count in rows]
+
+    def results_for(self, params):
+        """Все результаты для параметров, равнозначных params"""
+        rows = self.query(
+            "SELECT params, timestamp, success, speed, startup_time, notes, details "
+            "FROM tests WHERE fingerprint = ? ORDER BY timestamp DESC", (params_fingerprint(params),)
+        )
+        return [self.from_row(row) for row in rows]
+
+    def count(self):
+        """Число записей"""
+        return self.query("SELECT COUNT(*) FROM tests")[0][0]
+
+    def last_tested(self):
+        """Время последнего теста в ISO-формате или None"""
+        timestamp = self.query("SELECT MAX(timestamp) FROM tests")[0][0]
+        return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+    def add_run(self, run):
+        """Запись о завершенном поиске: стратегия, seed, настройки и итог
+
+        По seed и настройкам поиск можно повторить (см. find_optimal_params).
+        """
+        connection = self.connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO runs (started, finished, strategy, seed, settings, params, speed, completed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run["started"], run.get("finished") or time.time(), run["strategy"], run.get("seed"),
+                 json.dumps(run.get("settings") or {}, ensure_ascii=False), run.get("params"), run.get("speed"),
+                 run.get("completed"))
+            )
+
+    def runs(self, limit=20):
+        """Последние поиски, новые первыми"""
+        rows = self.query(
+            "SELECT started, finished, strategy, seed, settings, params, speed, completed "
+            "FROM runs ORDER BY started DESC LIMIT ?", (limit,)
+        )
+        return [{"started": datetime.fromtimestamp(started).isoformat(),
+                 "finished": datetime.fromtimestamp(finished).isoformat(),
+                 "strategy": strategy, "seed": seed, "settings": json.loads(settings or '{}'),
+                 "params": params, "speed": speed, "completed": completed}
+                for started, finished, strategy, seed, settings, params, speed, completed in rows]
+
+    def clear(self):
+        """Удаление всей истории"""
+        with self.lock:
+            self.pending = []
+        connection = self.connection()
+        with connection:
+            connection.execute("DELETE FROM tests")
+            connection.execute("DELETE FROM runs")
+
+    def import_json(self, json_path):
+        """Перенос истории из старого test_history.json
+
+        Файл переименовывается в *.migrated, чтобы не импортировать его повторно.
+        Возвращает число перенесенных записей.
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            tests = json.load(f).get("tests", [])
+        for entry in reversed(tests):
+            self.add(entry)
+        self.flush()
+        json_path.rename(json_path.with_suffix(json_path.suffix + '.migrated'))
+        return len(tests)
+
+    def close(self):
+        """Сброс записей и закрытие соединения текущего потока"""
+        self.flush()
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    db_path = Path(tempfile.mkdtemp()) / 'history.db'
+    store = HistoryStore(db_path, batch_size=10000)
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    # Все строки попадают в запрашиваемое окно (неделя), чтобы запрос
+    # группировал и сортировал их все
+    start_time = time.perf_counter()
+    now = time.time()
+    step = 7 * 86400 / rows
+    for i in range(rows):
+        store.add({"params": f"-o{i % 25 + 1} -s {i % 997}+s -T3", "timestamp": now - i * step,
+                   "success": i % 3 == 0, "speed": (i * 7919) % 1000 / 100, "notes": ""})
+    store.flush()
+    print(f"Запись {rows} строк: {time.perf_counter() - start_time:.2f} сек")
+
+    start_time = time.perf_counter()
+    top = store.top_successful(5, since=now - 7 * 86400)
+    in_window = store.query("SELECT COUNT(*) FROM tests WHERE timestamp >= ?", (now - 7 * 86400,))[0][0]
+    print(f"Топ-5 за неделю ({in_window} строк в окне): {(time.perf_counter() - start_time) * 1000:.1f} мс")
+    for item in top:
+        print(f"  {item['speed']:.2f} сек  {item['params']}")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import deque
+
+from ciadpi_params import with_instance_options
+from ciadpi_probe import run_probes
+from ciadpi_readiness import is_listening, listen_address
+from ciadpi_scoring import percentile
+
+
+class HealthMonitor:
+    """Фоновый контроль качества работающего сервиса ciadpi
+
+    Раз в interval секунд проверяет сайты через порт сервиса и хранит
+    скользящие окна последних window проверок (успех и задержка). Если доля
+    успешных проверок падает ниже min_success или медианная задержка
+    превышает базовую в latency_factor раз, запускается ограниченный по
+    времени повторный поиск (CIAutoSearch.research), начатый с текущих
+    параметров и лучших из истории. Найденные параметры применяются через
+    apply_params, если они отличаются от текущих.
+    """
+
+    def __init__(self, get_params, apply_params=None, searcher=None, urls=None, interval=60, window=20,
+                 min_samples=8, min_success=0.7, latency_factor=3.0, probe_timeout=8, research_budget=180,
+                 cooldown=900, notify=None):
+        self.get_params = get_params
+        self.apply_params = apply_params
+        self.searcher = searcher
+        self.urls = urls or ["https://www.youtube.com", "https://www.google.com", "https://github.com"]
+        self.interval = interval
+        self.min_samples = min_samples
+        self.min_success = min_success
+        self.latency_factor = latency_factor
+        self.probe_timeout = probe_timeout
+        self.research_budget = research_budget
+        self.cooldown = cooldown
+        self.notify = notify
+        self.successes = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.baseline = None  # Медианная задержка в хорошем состоянии
+        self.last_research = 0.0
+        self.researching = False
+        self.running = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def health(self):
+        """Текущие показатели: число проверок, доля успешных, p50/p95 задержки"""
+        latencies = list(self.latencies)
+        samples = len(self.successes)
+        return {
+            "samples": samples,
+            "success_rate": sum(self.successes) / samples if samples else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "baseline": self.baseline,
+        }
+
+    def degradation(self):
+        """Причина ухудшения или пустая строка, если все в порядке"""
+        health = self.health()
+        if health["samples"] < self.min_samples:
+            return ""
+        if health["success_rate"] < self.min_success:
+            return f"доля успешных проверок {health['success_rate']:.0%}"
+        if self.baseline and health["p50"] and health["p50"] > self.baseline * self.latency_factor:
+            return f"задержка {health['p50']:.2f} сек (обычно {self.baseline:.2f} сек)"
+        return ""
+
+    def check(self):
+        """Одна проверка через работающий сервис; False, если сервис не слушает порт"""
+        host, port = listen_address(self.get_params())
+        if not is_listening(host, port):
+            return False
+        try:
+            results = run_probes(self.urls, host, port, self.probe_timeout)
+        except Exception:
+            return False
+        for item in results:
+            self.successes.append(1 if item["success"] else 0)
+            if item["success"]:
+                self.latencies.append(item["total"])
+
+        # Базовая задержка запоминается, пока сервис работает хорошо
+        health = self.health()
+        if health["samples"] >= self.min_samples and not self.degradation() and health["p50"]:
+            self.baseline = health["p50"] if self.baseline is None else min(self.baseline * 1.1, health["p50"])
+        return True
+
+    def reset(self):
+        """Сброс окон (после смены параметров)"""
+        self.successes.clear()
+        self.latencies.clear()
+        self.baseline = None
+
+    def recover(self, reason):
+        """Повторный поиск и применение найденных параметров"""
+        if not self.searcher or self.researching or time.monotonic() - self.last_research < self.cooldown:
+            return
+        if self.searcher.is_searching:
+            return
+        self.researching = True
+        self.last_research = time.monotonic()
+        try:
+            current = self.get_params()
+            if self.notify:
+                self.notify("Качество обхода ухудшилось", f"{reason}; запущен повторный поиск")
+            best_params, best_speed = self.searcher.research(current, self.research_budget)
+            if best_params and self.apply_params:
+                best_params = with_instance_options(best_params, current)
+                if best_params != current:
+                    self.apply_params(best_params)
+                    self.reset()
+        finally:
+            self.researching = False
+
+    def run(self):
+        """Цикл мониторинга в фоновом потоке"""
+        while not self.stop_event.wait(self.interval):
+            if not self.check():
+                continue
+            reason = self.degradation()
+            if reason:
+                self.recover(reason)
+
+    def start(self):
+        """Запуск мониторинга"""
+        if self.running:
+            return
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='ciadpi-monitor')
+        self.thread.start()
+
+    def stop(self):
+        """Остановка мониторинга (повторный поиск, если идет, прерывается)"""
+        self.running = False
+        self.stop_event.set()
+        if self.searcher and self.researching:
+            self.searcher.stop_search()
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    import sys
+
+    params = ' '.join(sys.argv[1:]) or "-p 1080"
+    monitor = HealthMonitor(lambda: params, min_samples=3)
+    for _ in range(3):
+        if not monitor.check():
+            print(f"Сервис не слушает {listen_address(params)}")
+            break
+        time.sleep(1)
+    print(f"Показатели: {monitor.health()}, ухудшение: {monitor.degradation() or 'нет'}")
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+import hashlib
+import ipaddress
+import json
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+CONFIG_DIR = Path.home() / '.config' / 'ciadpi'
+
+# Источники событий смены сети: netlink через iproute2 и NetworkManager
+MONITOR_COMMANDS = [
+    ['ip', 'monitor', 'link', 'route', 'address'],
+    ['nmcli', 'monitor'],
+]
+
+
+def default_route(route_path='/proc/net/route'):
+    """Интерфейс и шлюз маршрута по умолчанию: (интерфейс, шлюз) или (None, None)"""
+    try:
+        with open(route_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()[1:]
+    except OSError:
+        return None, None
+
+    best = None
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 7 or fields[1] != '00000000' or not int(fields[3], 16) & 0x2:
+            continue
+        # Шлюз записан в порядке байт хоста (little-endian)
+        gateway = str(ipaddress.IPv4Address(bytes.fromhex(fields[2])[::-1]))
+        metric = int(fields[6])
+        if best is None or metric < best[2]:
+            best = (fields[0], gateway, metric)
+    return (best[0], best[1]) if best else (None, None)
+
+
+def gateway_mac(gateway, interface=None, arp_path='/proc/net/arp'):
+    """MAC-адрес шлюза из ARP-таблицы или пустая строка"""
+    if not gateway:
+        return ""
+    try:
+        with open(arp_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()[1:]
+    except OSError:
+        return ""
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 6 and fields[0] == gateway and (not interface or fields[5] == interface):
+            mac = fields[3].lower()
+            return "" if mac == '00:00:00:00:00:00' else mac
+    return ""
+
+
+def nameservers(paths=('/run/systemd/resolve/resolv.conf', '/etc/resolv.conf')):
+    """DNS-серверы сети
+
+    При systemd-resolved в /etc/resolv.conf записан только локальный
+    127.0.0.53, поэтому сначала читается список настоящих серверов.
+    """
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                servers = [line.split()[1] for line in f
+                           if line.startswith('nameserver') and len(line.split()) > 1]
+        except OSError:
+            continue
+        servers = [server for server in servers if not server.startswith('127.')]
+        if servers:
+            return sorted(set(servers))
+    return []
+
+
+def interface_addresses(interface):
+    """IPv4-адреса интерфейса (через ip -4 -o addr)"""
+    if not interface or not shutil.which('ip'):
+        return []
+    try:
+        result = subprocess.run(['ip', '-4', '-o', 'addr', 'show', 'dev', interface],
+                                capture_output=True, text=True, timeout=2)
+    except (OSError, subprocess.SubprocessError):
+        return []
+    addresses = []
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if 'inet' in fields:
+            addresses.append(fields[fields.index('inet') + 1].split('/')[0])
+    return addresses
+
+
+def load_asn_table(path=None):
+    """Локальная таблица ASN: строки «префикс ASN [название]», # - комментарий"""
+    path = Path(path) if path else CONFIG_DIR / 'asn.txt'
+    table = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split(None, 2)
+                if len(fields) < 2:
+                    continue
+                try:
+                    table.append((ipaddress.ip_network(fields[0], strict=False), fields[1],
+                                  fields[2].strip() if len(fields) > 2 else ""))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    # Более узкие префиксы проверяются первыми
+    table.sort(key=lambda entry: entry[0].prefixlen, reverse=True)
+    return table
+
+
+def lookup_asn(addresses, table):
+    """ASN первого адреса, найденного в таблице, или пустая строка"""
+    for address in addresses:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            continue
+        for network, asn, _ in table:
+            if ip.version == network.version and ip in network:
+                return asn
+    return ""
+
+
+def network_fingerprint(asn_table=None):
+    """Описание текущей сети и ее ключ
+
+    Ключ строится из MAC шлюза, DNS-серверов, интерфейса и (если есть
+    таблица ~/.config/ciadpi/asn.txt) ASN провайдера. ASN ищется по
+    адресам интерфейса и DNS-серверов: DNS, выданные по DHCP, обычно
+    принадлежат провайдеру. Без маршрута по умолчанию ключ пустой.
+    """
+    interface, gateway = default_route()
+    info = {
+        "interface": interface or "",
+        "gateway": gateway or "",
+        "gateway_mac": gateway_mac(gateway, interface),
+        "nameservers": nameservers(),
+        "asn": "",
+    }
+    table = load_asn_table() if asn_table is None else asn_table
+    if table:
+        info["asn"] = lookup_asn(interface_addresses(interface) + info["nameservers"], table)
+
+    if not interface:
+        return info, ""
+    # MAC надежнее адреса шлюза: 192.168.1.1 есть почти в каждой сети
+    source = [info["interface"], info["gateway_mac"] or info["gateway"], ','.join(info["nameservers"]), info["asn"]]
+    return info, hashlib.sha1('|'.join(source).encode()).hexdigest()[:16]
+
+
+def describe_network(info):
+    """Краткое описание сети для уведомлений"""
+    parts = [info.get("interface") or "нет сети"]
+    if info.get("gateway"):
+        parts.append(f"шлюз {info['gateway']}")
+    if info.get("asn"):
+        parts.append(f"AS{info['asn'].upper().removeprefix('AS')}")
+    return ', '.join(parts)
+
+
+class NetworkParamsCache:
+    """Лучшие проверенные параметры для каждой сети (по ключу отпечатка)"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else CONFIG_DIR / 'networks.json'
+        self.lock = threading.Lock()
+        self.networks = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.networks, f, indent=2, ensure_ascii=False)
+        temp_path.replace(self.path)
+
+    def get(self, key):
+        """Запись для сети или None"""
+        with self.lock:
+            return self.networks.get(key) if key else None
+
+    def remember(self, key, info, params, speed=None):
+        """Сохранение проверенных параметров для сети"""
+        if not key or not params:
+            return
+        with self.lock:
+            self.networks[key] = {
+                "params": params,
+                "speed": speed,
+                "network": info,
+                "verified": time.time(),
+            }
+            self.save()
+
+    def forget(self, key):
+        """Удаление параметров сети (перестали работать)"""
+        with self.lock:
+            if self.networks.pop(key, None) is not None:
+                self.save()
+
+
+class NetworkWatcher:
+    """Отслеживание смены сети
+
+    Читает события `ip monitor` (netlink) или `nmcli monitor`; после
+    события ждет debounce секунд, пока сеть успокоится, и пересчитывает
+    отпечаток. on_change(info, key) вызывается только при смене ключа.
+    Без обеих утилит отпечаток опрашивается раз в poll_interval секунд.
+    """
+
+    def __init__(self, on_change, debounce=3.0, poll_interval=30.0, asn_table=None):
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.asn_table = asn_table
+        self.info, self.key = network_fingerprint(asn_table)
+        self.event = threading.Event()
+        self.stop_event = threading.Event()
+        self.process = None
+        self.running = False
+
+    def refresh(self):
+        """Пересчет отпечатка; True, если сеть сменилась"""
+        info, key = network_fingerprint(self.asn_table)
+        if key == self.key:
+            return False
+        self.info, self.key = info, key
+        try:
+            self.on_change(info, key)
+        except Exception as e:
+            print(f"⚠️ Ошибка обработки смены сети: {e}")
+        return True
+
+    def read_events(self):
+        """Чтение событий первой доступной утилиты"""
+        for command in MONITOR_COMMANDS:
+            if self.stop_event.is_set() or not shutil.which(command[0]):
+                continue
+            try:
+                self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                                text=True)
+            except OSError:
+                continue
+            for _ in iter(self.process.stdout.readline, ''):
+                self.event.set()
+            self.process.wait()
+        # Утилит нет или они завершились - переходим на опрос
+        self.process = None
+
+    def run(self):
+        """Цикл обработки событий"""
+        while not self.stop_event.is_set():
+            if not self.event.wait(self.poll_interval):
+                self.refresh()
+                continue
+            # Пачку событий (интерфейс, адрес, маршрут) обрабатываем один раз
+            while self.event.is_set() and not self.stop_event.is_set():
+                self.event.clear()
+                self.stop_event.wait(self.debounce)
+            if not self.stop_event.is_set():
+                self.refresh()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.stop_event.clear()
+        threading.Thread(target=self.read_events, daemon=True, name='ciadpi-network-events').start()
+        threading.Thread(target=self.run, daemon=True, name='ciadpi-network').start()
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set()
+        self.event.set()
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    info, key = network_fingerprint()
+    print(f"Сеть: {describe_network(info)}; ключ: {key or '-'}")
+    print(json.dumps(info, ensure_ascii=False, indent=2))
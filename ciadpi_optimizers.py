@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import math
+import random
+from typing import Callable, Dict, List, Optional, Union
+
+from ciadpi_param_generator import AdvancedParamGenerator, make_rng
+from ciadpi_params import params_fingerprint
+from ciadpi_scoring import fitness
+
+
+def split_genes(params: str) -> List[str]:
+    """Разбиение строки параметров на гены: опция вместе со своим значением"""
+    parts = params.split()
+    genes = []
+    i = 0
+    while i < len(parts):
+        part = parts[i]
+        # "-T 3" - опция и значение отдельными словами
+        if len(part) == 2 and part.startswith('-') and i + 1 < len(parts) and not parts[i + 1].startswith('-'):
+            genes.append(f"{part} {parts[i + 1]}")
+            i += 2
+            continue
+        genes.append(part)
+        i += 1
+    return genes
+
+
+class EvolutionaryOptimizer:
+    """Эволюционный поиск параметров с турнирным отбором и элитизмом"""
+
+    def __init__(self, generator: Optional[AdvancedParamGenerator] = None, population_size: int = 12,
+                 elite: int = 2, tournament: int = 3, crossover_rate: float = 0.7,
+                 mutation_intensity: float = 0.3, score: Optional[Callable[[Dict], float]] = None,
+                 rng: Union[random.Random, int, None] = None):
+        # Без rng используется генератор случайных чисел генератора параметров
+        self.generator = generator or AdvancedParamGenerator(rng)
+        self.rng = self.generator.rng if rng is None else make_rng(rng)
+        self.score = score or fitness
+        self.population_size = population_size
+        self.elite = elite
+        self.tournament = tournament
+        self.crossover_rate = crossover_rate
+        self.mutation_intensity = mutation_intensity
+        self.population = []  # [(params, fitness)]
+        self.evaluated = {}   # params -> fitness
+        self.seen = set()     # Отпечатки проверенных и запланированных кандидатов
+        self.generation = 0
+
+    def key(self, params: str) -> str:
+        """Ключ равнозначности кандидата (см. ciadpi_constraints)"""
+        return self.generator.constraints.key(params) or params_fingerprint(params)
+
+    def initial_population(self, history: List[Dict] = None) -> List[str]:
+        """Начальная популяция: успешные из истории, известные рабочие и случайные
+
+        Кандидаты приводятся к минимальной форме, равнозначные отбрасываются.
+        """
+        prune = self.generator.constraints.prune
+        candidates = []
+        for item in history or []:
+            params = prune(item['params']) if item.get('success') else None
+            if params and params not in candidates:
+                candidates.append(params)
+        candidates = candidates[:self.population_size // 2]
+
+        for params in map(prune, self.generator.known_working):
+            if params and params not in candidates:
+                candidates.append(params)
+
+        for params in self.generator.generate_comprehensive_params(self.population_size * 2):
+            if len(candidates) >= self.population_size:
+                break
+            if params not in candidates:
+                candidates.append(params)
+
+        return candidates[:self.population_size]
+
+    def tell(self, params: str, result: Dict):
+        """Учет результата проверки кандидата"""
+        score = self.score(result)
+        self.evaluated[params] = score
+        self.seen.add(self.key(params))
+        self.population.append((params, score))
+
+    def select(self) -> str:
+        """Турнирный отбор родителя"""
+        contenders = self.rng.sample(self.population, min(self.tournament, len(self.population)))
+        return max(contenders, key=lambda item: item[1])[0]
+
+    def crossover(self, first: str, second: str) -> str:
+        """Равномерное скрещивание на уровне генов"""
+        genes = []
+        for gene in split_genes(first) + split_genes(second):
+            if self.rng.random() < 0.5 and gene not in genes:
+                genes.append(gene)
+
+        # Не больше одного таймаута
+        timeouts = [gene for gene in genes if gene.startswith('-T')]
+        for gene in timeouts[1:]:
+            genes.remove(gene)
+
+        return ' '.join(genes) or first
+
+    def next_generation(self) -> List[str]:
+        """Новое поколение: элита без изменений и потомки с мутациями
+
+        Элита уже проверена, поэтому возвращаются только новые кандидаты.
+        """
+        self.generation += 1
+        # Равные оценки упорядочиваются по параметрам: порядок завершения
+        # параллельных проверок не влияет на отбор
+        self.population.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        self.population = self.population[:self.population_size]
+        elite = [params for params, score in self.population[:self.elite] if score > 0]
+
+        offspring = []
+        attempts = 0
+        while len(elite) + len(offspring) < self.population_size and attempts < self.population_size * 20:
+            attempts += 1
+            parent = self.select()
+            if self.rng.random() < self.crossover_rate:
+                child = self.crossover(parent, self.select())
+            else:
+                child = parent
+            child = self.generator.mutate_params(child, self.mutation_intensity)
+            # Равнозначные уже проверенным кандидаты не тратят бюджет
+            fingerprint = self.key(child) if child else None
+            if fingerprint and fingerprint not in self.seen:
+                self.seen.add(fingerprint)
+                offspring.append(child)
+
+        return offspring
+
+    def best(self):
+        """Лучший кандидат (params, fitness) среди проверенных"""
+        if not self.evaluated:
+            return None, 0.0
+        return max(self.evaluated.items(), key=lambda item: item[1])
+
+    def to_state(self) -> Dict:
+        """Состояние для сохранения поиска (JSON)"""
+        return {"population": [list(item) for item in self.population], "evaluated": self.evaluated,
+                "seen": sorted(self.seen), "generation": self.generation}
+
+    def load_state(self, state: Dict):
+        """Восстановление состояния из to_state()"""
+        self.population = [tuple(item) for item in state["population"]]
+        self.evaluated = dict(state["evaluated"])
+        self.seen = set(state["seen"])
+        self.generation = state["generation"]
+
+
+class BanditOptimizer:
+    """Байесовский поиск по категориальным измерениям параметров
+
+    Для каждого значения каждого измерения (split, disorder, fake, tlsrec,
+    timeout...) хранится бета-распределение вероятности успеха и оценка
+    средней задержки. Кандидат оценивается как среднее по своим значениям;
+    следующий выбирается сэмплированием Томпсона или по ожидаемому улучшению.
+    С NumPy кандидаты можно брать из большого пула пространства по
+    линейной модели признаков (ask_preselected).
+    """
+
+    # Измерения, влияющие на обход DPI
+    DIMENSIONS = ['split', 'disorder', 'oob', 'disoob', 'fake', 'tlsrec', 'timeout',
+                  'ttl', 'fake_offset', 'mod_http', 'auto', 'md5sig', 'drop_sack']
+
+    def __init__(self, generator: Optional[AdvancedParamGenerator] = None,
+                 dimensions: Optional[List[str]] = None, prior_latency: float = 5.0,
+                 score: Optional[Callable[[Dict], float]] = None, rng: Union[random.Random, int, None] = None):
+        self.generator = generator or AdvancedParamGenerator(rng)
+        self.rng = self.generator.rng if rng is None else make_rng(rng)
+        self.score = score or fitness
+        self.dimensions = {name: self.generator.all_params[name] for name in dimensions or self.DIMENSIONS}
+        self.prior_latency = prior_latency
+        # (измерение, значение) -> [успехи, неудачи, сумма задержек, число задержек]
+        self.stats = {}
+        self.evaluated = {}  # Все известные кандидаты, включая историю
+        self.tested = {}     # Проверенные в текущем поиске
+        self.seen = set()    # Отпечатки проверенных и запланированных кандидатов
+        self.best_utility = 0.0
+        # Предварительный отбор по модели: кодировщик пространства и
+        # кандидаты по возрастанию оценки для числа наблюдений ranked_for
+        self.space_encoder = None
+        self.ranked = []
+        self.ranked_for = None
+        # Значение гена -> измерение для разбора строк из истории
+        self.gene_index = {}
+        for name, values in self.dimensions.items():
+            for value in values:
+                if value:
+                    self.gene_index[value] = name
+
+    def key(self, params: str) -> str:
+        """Ключ равнозначности кандидата (см. ciadpi_constraints)"""
+        return self.generator.constraints.key(params) or params_fingerprint(params)
+
+    def encode(self, params: str) -> Dict[str, str]:
+        """Значения измерений, заданные в строке параметров ('' - не задано)"""
+        encoded = {name: '' for name in self.dimensions}
+        for gene in split_genes(params):
+            # "-T3" и "-T 3" - одно и то же значение
+            if len(gene) > 2 and gene[2] != ' ' and gene.startswith('-'):
+                gene = f"{gene[:2]} {gene[2:]}"
+            name = self.gene_index.get(gene)
+            if name:
+                encoded[name] = gene
+        return encoded
+
+    def decode(self, encoded: Dict[str, str]) -> str:
+        """Строка параметров из значений измерений"""
+        return ' '.join(encoded[name] for name in self.dimensions if encoded.get(name))
+
+    def tell(self, params: str, result: Dict, from_history: bool = False):
+        """Обновление апостериорных оценок по результату проверки"""
+        success = result.get("success", False)
+        speed = result.get("speed", 0.0)
+        self.evaluated[params] = self.score(result)
+        self.best_utility = max(self.best_utility, fitness(result))
+        self.seen.add(self.key(params))
+        if not from_history:
+            self.tested[params] = self.evaluated[params]
+        for item in self.encode(params).items():
+            stats = self.stats.setdefault(item, [0, 0, 0.0, 0])
+            if success:
+                stats[0] += 1
+                stats[2] += speed
+                stats[3] += 1
+            else:
+                stats[1] += 1
+
+    def warm_start(self, history: List[Dict]):
+        """Начальные оценки из истории тестирования (test_history.json)"""
+        for item in history:
+            if item.get('params'):
+                self.tell(item['params'], item, from_history=True)
+
+    def sample_utility(self, encoded: Dict[str, str]) -> float:
+        """Одна выборка полезности кандидата из апостериорного распределения"""
+        success = 0.0
+        latency = 0.0
+        for item in encoded.items():
+            wins, losses, latency_sum, latency_count = self.stats.get(item, (0, 0, 0.0, 0))
+            success += self.rng.betavariate(wins + 1, losses + 1)
+            # Среднее с априорной задержкой; разброс уменьшается с числом наблюдений
+            mean = (latency_sum + self.prior_latency) / (latency_count + 1)
+            latency += max(0.0, self.rng.gauss(mean, mean / math.sqrt(latency_count + 1)))
+        size = len(encoded)
+        return (success / size) / (1.0 + latency / size)
+
+    def random_candidate(self) -> Dict[str, str]:
+        """Случайная точка пространства (таймаут задан всегда)"""
+        encoded = {name: self.rng.choice(values) for name, values in self.dimensions.items()}
+        if 'timeout' in encoded and not encoded['timeout']:
+            encoded['timeout'] = self.rng.choice([v for v in self.dimensions['timeout'] if v])
+        return encoded
+
+    def thompson(self) -> Dict[str, str]:
+        """Выбор кандидата сэмплированием Томпсона по каждому измерению"""
+        encoded = {}
+        for name, values in self.dimensions.items():
+            encoded[name] = max(values, key=lambda value: self.sample_utility({name: value}))
+        return encoded
+
+    def expected_improvement(self, pool_size: int = 256, samples: int = 16) -> Dict[str, str]:
+        """Выбор кандидата из случайного пула по ожидаемому улучшению"""
+        best = self.best_utility
+        pool = [self.random_candidate() for _ in range(pool_size)]
+
+        def improvement(encoded):
+            return sum(max(self.sample_utility(encoded) - best, 0.0) for _ in range(samples)) / samples
+
+        return max(pool, key=improvement)
+
+    def ask(self, acquisition: str = 'thompson', attempts: int = 50) -> Optional[str]:
+        """Следующий непроверенный кандидат в минимальной форме (см. ciadpi_constraints)"""
+        prune = self.generator.constraints.prune
+        for _ in range(attempts):
+            if acquisition == 'ei':
+                encoded = self.expected_improvement()
+            else:
+                encoded = self.thompson()
+            params = prune(self.decode(encoded))
+            if params and self.key(params) not in self.seen:
+                self.seen.add(self.key(params))
+                return params
+        # Пространство вокруг лучших значений исчерпано - случайная точка
+        params = prune(self.decode(self.random_candidate()))
+        if not params or self.key(params) in self.seen:
+            return None
+        self.seen.add(self.key(params))
+        return params
+
+    def ask_preselected(self, pool_size: int = 1 << 15, keep: int = 256, min_observations: int = 8) -> Optional[str]:
+        """Лучший по линейной модели непроверенный кандидат из случайного пула пространства
+
+        Модель (ciadpi_features.LinearSurrogate) обучается на всех известных
+        кандидатах, включая историю; pool_size случайных кандидатов
+        ParamSpace оцениваются векторно, keep лучших идут в очередь.
+        Очередь пересчитывается после новых наблюдений. None - нет NumPy,
+        наблюдений меньше min_observations или очередь исчерпана.
+        """
+        from ciadpi_features import NUMPY_AVAILABLE, LinearSurrogate, SpaceEncoder, preselect
+
+        if not NUMPY_AVAILABLE or len(self.evaluated) < min_observations:
+            return None
+        if self.ranked_for != len(self.evaluated):
+            if self.space_encoder is None:
+                self.space_encoder = SpaceEncoder(self.generator.param_space())
+            surrogate = LinearSurrogate(self.space_encoder.encoder)
+            params_list = list(self.evaluated)
+            try:
+                surrogate.fit(surrogate.encoder.encode_batch(params_list),
+                              [self.evaluated[params] for params in params_list])
+            except ValueError:
+                return None
+            size = self.space_encoder.space.size
+            pool = [self.rng.randrange(size) for _ in range(pool_size)]
+            ranked = preselect(self.space_encoder, surrogate, keep, indices=pool)
+            self.ranked = [params for _, params, _ in reversed(ranked)]
+            self.ranked_for = len(self.evaluated)
+        prune = self.generator.constraints.prune
+        while self.ranked:
+            params = prune(self.ranked.pop())
+            if params and self.key(params) not in self.seen:
+                self.seen.add(self.key(params))
+                return params
+        return None
+
+    def best(self):
+        """Лучший кандидат (params, fitness) среди проверенных в текущем поиске"""
+        if not self.tested:
+            return None, 0.0
+        return max(self.tested.items(), key=lambda item: item[1])
+
+    def to_state(self) -> Dict:
+        """Состояние модели для сохранения поиска (JSON)"""
+        return {"stats": [[name, value, stats] for (name, value), stats in self.stats.items()],
+                "evaluated": self.evaluated, "tested": self.tested, "seen": sorted(self.seen),
+                "best_utility": self.best_utility}
+
+    def load_state(self, state: Dict):
+        """Восстановление модели из to_state()"""
+        self.stats = {(name, value): stats for name, value, stats in state["stats"]}
+        self.evaluated = dict(state["evaluated"])
+        self.tested = dict(state["tested"])
+        self.seen = set(state["seen"])
+        self.best_utility = state["best_utility"]
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    optimizer = EvolutionaryOptimizer(population_size=6)
+    population = optimizer.initial_population()
+    for generation in range(3):
+        print(f"Поколение {generation}:")
+        for params in population:
+            # Условная оценка: чем короче параметры, тем "быстрее"
+            result = {"success": True, "speed": len(params) / 20}
+            optimizer.tell(params, result)
+            print(f"  {fitness(result):.3f}  {params}")
+        population = optimizer.next_generation()
+    print(f"Лучшие: {optimizer.best()}")
+
+    bandit = BanditOptimizer()
+    for step in range(20):
+        params = bandit.ask('ei' if step % 2 else 'thompson')
+        # Условная оценка: работает только с split, быстрее с малым таймаутом
+        encoded = bandit.encode(params)
+        success = bool(encoded['split'])
+        bandit.tell(params, {"success": success, "speed": float(encoded['timeout'][3:] or 5)})
+    print(f"Байесовский поиск, лучшие: {bandit.best()}")
@@ -1,12 +1,33 @@
 #!/usr/bin/env python3
 
 import random
-import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple, Union
 from pathlib import Path
 
+from ciadpi_constraints import CONSTRAINTS, Constraints
+from ciadpi_params import check_params, render, tokenize
+from ciadpi_space import Chain, Combinations, ParamSpace
+
+# Измерения пространства параметров (param_space) в порядке записи:
+# -A и все после него относятся к запасной группе, поэтому auto - последним.
+# oob не входит - его покрывают методы -oN+s; timeout обязателен. Измерения
+# опций, не влияющих на обход (см. ciadpi_constraints), пропускаются.
+SPACE_DIMENSIONS = ['timeout', 'tlsrec', 'split', 'disorder', 'disoob', 'fake', 'ttl', 'md5sig', 'fake_offset',
+                    'fake_tls_mod', 'mod_http', 'udp_fake', 'max_conn', 'def_ttl', 'tfo', 'auto_mode', 'auto']
+REQUIRED_DIMENSIONS = {'timeout'}
+
+def make_rng(rng: Union[random.Random, int, None] = None) -> random.Random:
+    """Генератор случайных чисел: переданный random.Random, новый с seed или без него"""
+    return rng if isinstance(rng, random.Random) else random.Random(rng)
+
+
 class AdvancedParamGenerator:
-    def __init__(self):
+    def __init__(self, rng: Union[random.Random, int, None] = None, constraints: Optional[Constraints] = None):
+        # Все случайные решения идут через self.rng: с одним seed генерация
+        # и мутации повторяются один в один
+        self.rng = make_rng(rng)
+        # Кандидаты приводятся к минимальной форме и сравниваются по ней
+        self.constraints = constraints or CONSTRAINTS
         # Все параметры из документации
         self.all_params = {
             # Основные параметры
@@ -34,7 +55,7 @@ class AdvancedParamGenerator:
             'proto': ['-K t', '-K h', '-K u', '-K i', '-K t,h', '-K t,u', '-K h,i', ''],
             
             # Ограничители
-            'hosts': ['', '-H :youtube.com google.com'],
+            'hosts': ['', '-H :youtube.com'],
             'ipset': ['', '-j :127.0.0.1'],
             'port_filter': ['', '-V 80-443'],
             'round': ['-R 1', '-R 2', '-R 1-3', ''],
@@ -73,10 +94,10 @@ class AdvancedParamGenerator:
         # Известные рабочие комбинации
         self.known_working = [
             "-o1 -o25+s -T3 -At o--tlsrec 1+s",
-            "-o2 -o15+s -T2 -At o--tlsrec",
+            "-o2 -o15+s -T2 -At",
             "-o1 -o5+s -T1 -At",
             "-o3 -o20+s -T3 -At o--tlsrec 2+s",
-            "-o4 -o25+s -T3 -At o--tlsrec"
+            "-o4 -o25+s -T3 -At"
         ]
 
     def generate_split_params(self) -> List[str]:
@@ -121,24 +142,24 @@ class AdvancedParamGenerator:
         # Базовые комбинации с методами обхода
         for _ in range(count // 2):
             # Выбираем 2-3 метода обхода
-            methods = random.sample(self.obfuscation_methods, random.randint(2, 3))
-            methods = [m + random.choice(self.method_suffixes) for m in methods]
+            methods = self.rng.sample(self.obfuscation_methods, self.rng.randint(2, 3))
+            methods = [m + self.rng.choice(self.method_suffixes) for m in methods]
             
             # Базовые параметры
             base_params = [
-                random.choice(self.all_params['timeout']),
-                random.choice(['-At', '']),
-                random.choice(self.all_params['tlsrec'])
+                self.rng.choice(self.all_params['timeout']),
+                self.rng.choice(['-At', '']),
+                self.rng.choice(self.all_params['tlsrec'])
             ]
             
             # Дополнительные параметры (1-2 случайных)
-            additional_params = random.sample([
-                random.choice(self.all_params['split']),
-                random.choice(self.all_params['disorder']),
-                random.choice(self.all_params['fake']),
-                random.choice(self.all_params['mod_http']),
-                random.choice(['1+s', '2+s', '3+s'])
-            ], random.randint(1, 2))
+            additional_params = self.rng.sample([
+                self.rng.choice(self.all_params['split']),
+                self.rng.choice(self.all_params['disorder']),
+                self.rng.choice(self.all_params['fake']),
+                self.rng.choice(self.all_params['mod_http']),
+                self.rng.choice(self.all_params['tlsrec'])
+            ], self.rng.randint(1, 2))
             
             combo = ' '.join(methods + base_params + additional_params)
             combinations.append(combo)
@@ -148,102 +169,78 @@ class AdvancedParamGenerator:
             combo_parts = []
             
             # Основные параметры
-            combo_parts.extend(random.sample(self.obfuscation_methods, 2))
-            combo_parts.append(random.choice(self.all_params['timeout']))
+            combo_parts.extend(self.rng.sample(self.obfuscation_methods, 2))
+            combo_parts.append(self.rng.choice(self.all_params['timeout']))
             
             # Сетевые параметры (0-2)
-            network_params = random.sample([
-                random.choice(self.all_params['max_conn']),
-                random.choice(self.all_params['def_ttl']),
-                random.choice(self.all_params['tfo'])
-            ], random.randint(0, 2))
+            network_params = self.rng.sample([
+                self.rng.choice(self.all_params['max_conn']),
+                self.rng.choice(self.all_params['def_ttl']),
+                self.rng.choice(self.all_params['tfo'])
+            ], self.rng.randint(0, 2))
             combo_parts.extend(network_params)
             
             # Параметры обхода (1-3)
-            obfuscation_params = random.sample([
-                random.choice(self.all_params['split']),
-                random.choice(self.all_params['disorder']),
-                random.choice(self.all_params['fake']),
-                random.choice(self.all_params['tlsrec'])
-            ], random.randint(1, 3))
+            obfuscation_params = self.rng.sample([
+                self.rng.choice(self.all_params['split']),
+                self.rng.choice(self.all_params['disorder']),
+                self.rng.choice(self.all_params['fake']),
+                self.rng.choice(self.all_params['tlsrec'])
+            ], self.rng.randint(1, 3))
             combo_parts.extend(obfuscation_params)
             
             # Автоматический режим (50% chance)
-            if random.random() > 0.5:
-                combo_parts.append(random.choice(self.all_params['auto']))
-                combo_parts.append(random.choice(self.all_params['auto_mode']))
+            if self.rng.random() > 0.5:
+                combo_parts.append(self.rng.choice(self.all_params['auto']))
+                combo_parts.append(self.rng.choice(self.all_params['auto_mode']))
             
             combo = ' '.join([p for p in combo_parts if p])
             combinations.append(combo)
         
-        # Уникальные комбинации
-        unique_combinations = list(set(combinations))
-        return unique_combinations[:count]
+        # Уникальные комбинации (с сохранением порядка); недостающие -
+        # случайная выборка без повторов из полного пространства
+        return self.unique_params(combinations, count)
+
+    def param_space(self) -> ParamSpace:
+        """Полное пространство комбинаций с доступом по номеру (см. ciadpi_space)"""
+        # 2-3 разных метода обхода, у каждого свой суффикс
+        methods = Chain([Combinations(self.obfuscation_methods, k, self.method_suffixes) for k in (2, 3)])
+        dimensions = [('methods', methods)]
+        for name in SPACE_DIMENSIONS:
+            values = [value for value in self.all_params[name] if value]
+            if not self.constraints.is_relevant(tokenize(values[0])[0][0]):
+                continue
+            dimensions.append((name, values if name in REQUIRED_DIMENSIONS else [''] + values))
+        # Наборы с лишними опциями равнозначны другим кандидатам пространства
+        return ParamSpace(dimensions, accept=self.constraints.allows)
+
+    def unique_params(self, combinations: List[str], count: int) -> List[str]:
+        """Первые count неравнозначных комбинаций в минимальной форме
+
+        Недопустимые по ограничениям отбрасываются; недостающие добираются
+        выборкой из пространства.
+        """
+        unique = {}
+        for combo in combinations:
+            pruned = self.constraints.prune(combo)
+            if pruned:
+                unique.setdefault(pruned, None)
+        if len(unique) < count:
+            for _, combo in self.param_space().sample(self.rng.getrandbits(64)):
+                unique.setdefault(self.constraints.prune(combo), None)
+                if len(unique) >= count:
+                    break
+        return list(unique)[:count]
 
     def validate_params(self, params: str) -> Tuple[bool, str]:
-        """Валидация параметров с детальным выводом ошибок"""
-        if not params.strip():
-            return True, ""
-            
-        parts = params.split()
-        unknown_params = []
-        invalid_values = []
-        
-        # Все допустимые параметры
-        valid_params = set()
-        for param_list in self.all_params.values():
-            for param in param_list:
-                if param:  # Игнорируем пустые строки
-                    # Извлекаем имя параметра (первое слово)
-                    param_name = param.split()[0] if ' ' in param else param
-                    valid_params.add(param_name)
-        
-        # Добавляем методы обхода
-        for method in self.obfuscation_methods:
-            valid_params.add(method)
-            for suffix in self.method_suffixes:
-                if suffix:  # Игнорируем пустой суффикс
-                    valid_params.add(method + suffix)
-        
-        # Добавляем специальные параметры
-        valid_params.update(['-At', '1+s', '2+s', '3+s', 'o--tlsrec'])
-        
-        i = 0
-        while i < len(parts):
-            part = parts[i]
-            
-            # Проверяем, является ли часть допустимым параметром
-            if part not in valid_params:
-                # Проверяем, не является ли это значением предыдущего параметра
-                if i > 0 and parts[i-1] in ['-H', '-j', '-l', '-n']:
-                    # Эти параметры принимают произвольные значения
-                    i += 1
-                    continue
-                
-                # Проверяем специальные форматы
-                if (part.startswith('o--tlsrec') or 
-                    part in ['1+s', '2+s', '3+s'] or
-                    re.match(r'^-o\d+[\+sme]*$', part) or
-                    re.match(r'^-\w+ \S+', ' '.join(parts[max(0,i-1):i+1]))):
-                    i += 1
-                    continue
-                
-                unknown_params.append(part)
-            
-            i += 1
-        
-        if unknown_params:
-            error_msg = f"Неизвестные параметры: {', '.join(unknown_params)}\n"
-            error_msg += f"Допустимые параметры: {', '.join(sorted(valid_params))}"
-            return False, error_msg
-        
-        return True, ""
+        """Валидация параметров с детальным выводом ошибок (общая грамматика ciadpi_params)"""
+        return check_params(params)
 
     def get_usage_examples(self) -> List[str]:
         """Получить примеры использования для UI"""
         return [
             "-o1 -o25+s -T3 -At o--tlsrec 1+s",
-            "-o2 -o15+s -T2 -At o--tlsrec", 
+            "-o2 -o15+s -T2 -At", 
             "-o1 -o5+s -T1 -At",
             "-o3 -o20+s -T3 -At o--tlsrec 2+s",
             "-o4 -o10+m -T5 -A torst -L 1",
@@ -252,53 +249,58 @@ class AdvancedParamGenerator:
         ]
 
     def mutate_params(self, base_params: str, intensity: float = 0.3) -> str:
-        """Мутация существующих параметров"""
-        parts = base_params.split()
+        """Мутация существующих параметров
+
+        Мутации идут по опциям вместе со значениями ("-T 3"); результат -
+        минимальная форма по ограничениям или пустая строка, если набор
+        недопустим.
+        """
+        parts = [render([token]) for token in tokenize(base_params)]
         if not parts:
             return base_params
         
         num_mutations = max(1, int(len(parts) * intensity))
         
         for _ in range(num_mutations):
-            mutation_type = random.choice(['replace', 'add', 'remove', 'modify'])
+            mutation_type = self.rng.choice(['replace', 'add', 'remove', 'modify'])
             
             if mutation_type == 'replace' and parts:
-                idx = random.randint(0, len(parts) - 1)
+                idx = self.rng.randint(0, len(parts) - 1)
                 if parts[idx].startswith('-o'):
-                    parts[idx] = random.choice(self.obfuscation_methods) + random.choice(self.method_suffixes)
+                    parts[idx] = self.rng.choice(self.obfuscation_methods) + self.rng.choice(self.method_suffixes)
                 elif parts[idx].startswith('-T'):
-                    parts[idx] = random.choice(self.all_params['timeout'])
+                    parts[idx] = self.rng.choice(self.all_params['timeout'])
                 elif parts[idx].startswith('-'):
                     # Заменяем любой другой параметр
                     param_type = parts[idx].split()[0] if ' ' in parts[idx] else parts[idx]
                     for key, values in self.all_params.items():
                         if any(param_type in v for v in values):
-                            parts[idx] = random.choice(values)
+                            parts[idx] = self.rng.choice(values)
                             break
             
             elif mutation_type == 'add' and len(parts) < 12:
-                new_param = random.choice([
-                    random.choice(self.obfuscation_methods) + random.choice(self.method_suffixes),
-                    random.choice(self.all_params['timeout']),
-                    random.choice(self.all_params['split']),
-                    random.choice(self.all_params['disorder']),
-                    random.choice(['1+s', '2+s', '3+s'])
+                new_param = self.rng.choice([
+                    self.rng.choice(self.obfuscation_methods) + self.rng.choice(self.method_suffixes),
+                    self.rng.choice(self.all_params['timeout']),
+                    self.rng.choice(self.all_params['split']),
+                    self.rng.choice(self.all_params['disorder']),
+                    self.rng.choice(self.all_params['tlsrec'])
                 ])
                 parts.append(new_param)
             
             elif mutation_type == 'remove' and len(parts) > 3:
-                idx = random.randint(2, len(parts) - 1)
+                idx = self.rng.randint(2, len(parts) - 1)
                 parts.pop(idx)
             
             elif mutation_type == 'modify' and parts:
-                idx = random.randint(0, len(parts) - 1)
+                idx = self.rng.randint(0, len(parts) - 1)
                 if '+' in parts[idx]:
                     # Модифицируем суффикс
                     base = parts[idx].split('+')[0]
-                    new_suffix = random.choice(self.method_suffixes)
+                    new_suffix = self.rng.choice(self.method_suffixes)
                     parts[idx] = base + new_suffix if new_suffix else base
         
-        return ' '.join([p for p in parts if p])
+        return self.constraints.prune(' '.join([p for p in parts if p])) or ""
 
     def generate_from_history(self, history: List[Dict], count: int = 10) -> List[str]:
         """Генерация на основе истории тестирования"""
@@ -321,13 +323,10 @@ class AdvancedParamGenerator:
             if improved not in new_combinations:
                 new_combinations.append(improved)
         
-        # Добавляем новые случайные комбинации
-        while len(new_combinations) < count:
-            new_combo = self.generate_comprehensive_params(1)[0]
-            if new_combo not in new_combinations:
-                new_combinations.append(new_combo)
-        
-        return new_combinations[:count]
+        # Добавляем новые случайные комбинации одной пачкой
+        if len(new_combinations) < count:
+            new_combinations.extend(self.generate_comprehensive_params(count))
+        return self.unique_params(new_combinations, count)
 
     def get_param_categories(self) -> Dict[str, List[str]]:
         """Получение параметров по категориям"""
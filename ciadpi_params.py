@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+
+import hashlib
+import ipaddress
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Опции ciadpi: короткое имя -> (длинное имя, принимает значение)
+OPTIONS = {
+    '-i': ('--ip', True),
+    '-p': ('--port', True),
+    '-D': ('--daemon', False),
+    '-w': ('--pidfile', True),
+    '-E': ('--transparent', False),
+    '-c': ('--max-conn', True),
+    '-I': ('--conn-ip', True),
+    '-b': ('--buf-size', True),
+    '-g': ('--def-ttl', True),
+    '-N': ('--no-domain', False),
+    '-U': ('--no-udp', False),
+    '-F': ('--tfo', False),
+    '-A': ('--auto', True),
+    '-L': ('--auto-mode', True),
+    '-u': ('--cache-ttl', True),
+    '-y': ('--cache-dump', True),
+    '-T': ('--timeout', True),
+    '-K': ('--proto', True),
+    '-H': ('--hosts', True),
+    '-j': ('--ipset', True),
+    '-V': ('--pf', True),
+    '-R': ('--round', True),
+    '-s': ('--split', True),
+    '-d': ('--disorder', True),
+    '-o': ('--oob', True),
+    '-q': ('--disoob', True),
+    '-f': ('--fake', True),
+    '-t': ('--ttl', True),
+    '-S': ('--md5sig', False),
+    '-O': ('--fake-offset', True),
+    '-l': ('--fake-data', True),
+    '-e': ('--oob-data', True),
+    '-n': ('--fake-sni', True),
+    '-Q': ('--fake-tls-mod', True),
+    '-M': ('--mod-http', True),
+    '-r': ('--tlsrec', True),
+    '-a': ('--udp-fake', True),
+    '-Y': ('--drop-sack', False),
+}
+
+LONG_OPTIONS = {long_name: short for short, (long_name, _) in OPTIONS.items()}
+
+# Общие для всего процесса опции; остальные относятся к группе, которую начинает -A
+GLOBAL_OPTIONS = {'-i', '-p', '-D', '-w', '-E', '-c', '-I', '-b', '-g', '-N', '-U', '-F',
+                  '-L', '-u', '-y', '-T'}
+
+# Адрес прослушивания и режим запуска - не влияют на обход
+INSTANCE_OPTIONS = {'-i', '-p', '-D', '-w'}
+
+Token = Tuple[Optional[str], Optional[str]]
+
+
+class Offset(NamedTuple):
+    """Позиция разреза: смещение[:повторы[:шаг]][+флаги], например 5+sm"""
+    position: int
+    repeats: Optional[int]
+    skip: Optional[int]
+    flags: str
+
+
+class ParamError(ValueError):
+    """Ошибки разбора строки параметров (errors - список описаний)"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+# Флаги позиции: s - SNI, h - Host, n - начало; e - конец, m - середина, r - случайно
+OFFSET_FLAGS = frozenset('shnemr')
+AUTO_TRIGGERS = ('torst', 'redirect', 'ssl_err', 'none', 'conn', 'keep')
+PROTOCOLS = frozenset('thui')
+HTTP_MODS = frozenset('hdr')
+
+# Устаревшие написания опций из известных рабочих наборов
+# ("-At o--tlsrec 1+s"): разбираются как сама опция со значением в
+# следующем слове. Остальные слова без опции (например "1+s") - ошибка
+LEGACY_SPELLINGS = {'o--tlsrec': '--tlsrec'}
+
+
+def parse_int(raw: str, low: int = 0, high: Optional[int] = None) -> int:
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError("ожидается целое число")
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"ожидается число от {low}" + (f" до {high}" if high is not None else ""))
+    return value
+
+
+def parse_float(raw: str, low: float = 0.0) -> float:
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError("ожидается число")
+    if not value >= low:
+        raise ValueError(f"ожидается число не меньше {low:g}")
+    return value
+
+
+def parse_offset(raw: str) -> Offset:
+    position, plus, flags = raw.partition('+')
+    if plus and (not flags or len(flags) > 3 or not OFFSET_FLAGS.issuperset(flags)):
+        raise ValueError(f"неверные флаги позиции «{flags}»")
+    fields = position.split(':')
+    if len(fields) > 3 or not fields[0]:
+        raise ValueError("ожидается смещение[:повторы[:шаг]][+флаги]")
+    try:
+        numbers = [int(field) for field in fields] + [None, None]
+    except ValueError:
+        raise ValueError("ожидается смещение[:повторы[:шаг]][+флаги]")
+    return Offset(numbers[0], numbers[1], numbers[2], flags)
+
+
+def parse_range(raw: str) -> Tuple[int, int]:
+    low, dash, high = raw.partition('-')
+    first = parse_int(low)
+    last = parse_int(high) if dash else first
+    if last < first:
+        raise ValueError("начало диапазона больше конца")
+    return first, last
+
+
+def parse_choices(raw: str, allowed) -> Tuple[str, ...]:
+    items = tuple(raw.split(','))
+    for item in items:
+        if item not in allowed:
+            raise ValueError(f"неизвестное значение «{item}»")
+    return items
+
+
+def parse_auto(raw: str) -> Tuple[str, ...]:
+    """Условия -A: полные имена или их начало (t - torst, r - redirect, ...)"""
+    triggers = []
+    for item in raw.split(','):
+        matches = [name for name in AUTO_TRIGGERS if item and name.startswith(item.split('=')[0])]
+        if not matches:
+            raise ValueError(f"неизвестное условие «{item}»")
+        triggers.append(matches[0])
+    return tuple(triggers)
+
+
+def parse_ip(raw: str) -> str:
+    try:
+        return str(ipaddress.ip_address(raw))
+    except ValueError:
+        raise ValueError("ожидается IP-адрес")
+
+
+def parse_text(raw: str) -> str:
+    if not raw:
+        raise ValueError("пустое значение")
+    return raw
+
+
+# Тип значения каждой опции со значением
+VALUE_PARSERS = {
+    '-i': parse_ip,
+    '-I': parse_ip,
+    '-p': lambda raw: parse_int(raw, 0, 65535),
+    '-w': parse_text,
+    '-c': lambda raw: parse_int(raw, 1),
+    '-b': lambda raw: parse_int(raw, 1),
+    '-g': lambda raw: parse_int(raw, 1, 255),
+    '-A': parse_auto,
+    '-L': lambda raw: parse_int(raw, 0, 3),
+    '-u': lambda raw: parse_int(raw),
+    '-y': parse_text,
+    '-T': parse_float,
+    '-K': lambda raw: parse_choices(raw, PROTOCOLS),
+    '-H': parse_text,
+    '-j': parse_text,
+    '-V': parse_range,
+    '-R': parse_range,
+    '-s': parse_offset,
+    '-d': parse_offset,
+    '-o': parse_offset,
+    '-q': parse_offset,
+    '-f': parse_offset,
+    '-r': parse_offset,
+    '-t': lambda raw: parse_int(raw, 1, 255),
+    '-O': parse_offset,
+    '-l': parse_text,
+    '-e': parse_text,
+    '-n': parse_text,
+    '-Q': lambda raw: parse_choices(raw.replace('rand', 'r').replace('orig', 'o'), {'r', 'o'}),
+    '-M': lambda raw: parse_choices(raw, HTTP_MODS),
+    '-a': lambda raw: parse_int(raw),
+}
+
+# Таблицы разбора, заполняемые по мере встречи слов и значений: в
+# сгенерированных кандидатах словарь слов мал, поэтому после прогрева
+# разбор строки - это split() и поиск в словарях
+WORD_TABLE: Dict[str, Tuple[Tuple[Token, ...], Optional[str]]] = {}
+VALUE_TABLE: Dict[Token, Tuple[Any, str]] = {}
+ORDER_TABLE: Dict[Token, Tuple[bool, str, str]] = {}
+TABLE_LIMIT = 200_000
+
+
+def tokenize(params: str) -> List[Token]:
+    """Разбор строки параметров на пары (опция, значение)
+
+    Поддерживаются формы "-o1", "-o 1", "--oob 1", "--oob=1", группы
+    флагов вида "-NU" и устаревшие написания из LEGACY_SPELLINGS
+    ("o--tlsrec 1+s" - это "-r 1+s"). Слова, не относящиеся ни к одной
+    опции (например "1+s"), возвращаются как (None, слово).
+    """
+    parts = params.split()
+    tokens = []
+    i = 0
+    while i < len(parts):
+        part = LEGACY_SPELLINGS.get(parts[i], parts[i])
+        i += 1
+
+        if part.startswith('--') and len(part) > 2:
+            name, has_value, value = part.partition('=')
+            option = LONG_OPTIONS.get(name)
+            if option is None:
+                tokens.append((None, part))
+                continue
+            if not OPTIONS[option][1]:
+                tokens.append((option, None))
+            elif has_value:
+                tokens.append((option, value))
+            elif i < len(parts):
+                tokens.append((option, parts[i]))
+                i += 1
+            else:
+                tokens.append((option, ''))
+            continue
+
+        if not part.startswith('-') or len(part) < 2 or part[:2] not in OPTIONS:
+            tokens.append((None, part))
+            continue
+
+        # Короткие опции, возможно склеенные со значением или друг с другом
+        rest = part
+        while rest:
+            option = rest[:2]
+            if option not in OPTIONS:
+                tokens.append((None, rest))
+                break
+            if not OPTIONS[option][1]:
+                tokens.append((option, None))
+                rest = '-' + rest[2:] if len(rest) > 2 else ''
+                continue
+            if len(rest) > 2:
+                tokens.append((option, rest[2:]))
+            elif i < len(parts):
+                tokens.append((option, parts[i]))
+                i += 1
+            else:
+                tokens.append((option, ''))
+            break
+
+    return tokens
+
+
+def parse_word(word: str) -> Tuple[Tuple[Token, ...], Optional[str]]:
+    """Разбор одного слова: (пары опция-значение, опция, ждущая значения в следующем слове)"""
+    entry = WORD_TABLE.get(word)
+    if entry is None:
+        tokens = tokenize(word)
+        pending = None
+        # "-T" или "--timeout" без значения - значение в следующем слове
+        if tokens and tokens[-1][0] is not None and tokens[-1][1] == '' and '=' not in word:
+            pending = tokens.pop()[0]
+        entry = (tuple(tokens), pending)
+        if len(WORD_TABLE) < TABLE_LIMIT:
+            WORD_TABLE[word] = entry
+    return entry
+
+
+def typed_value(option: Optional[str], raw: Optional[str]) -> Tuple[Any, str]:
+    """Значение опции нужного типа и описание ошибки (пустое, если ошибки нет)"""
+    key = (option, raw)
+    entry = VALUE_TABLE.get(key)
+    if entry is None:
+        if option is None:
+            # ciadpi молча пропускает такие слова: позиция без опции не действует
+            entry = (None, f"неизвестный параметр «{raw}» (слово без опции не действует)")
+        elif raw is None:
+            entry = (True, "")
+        else:
+            try:
+                entry = (VALUE_PARSERS[option](raw), "")
+            except ValueError as e:
+                entry = (None, f"{option} {raw}: {e}" if raw else f"{option}: нет значения")
+        if len(VALUE_TABLE) < TABLE_LIMIT:
+            VALUE_TABLE[key] = entry
+    return entry
+
+
+def parse_tokens(params: str) -> Tuple[List[Token], List[str]]:
+    """Пары (опция, значение) и список ошибок; быстрый путь через таблицы слов"""
+    tokens = []
+    errors = []
+    pending = None
+    for word in params.split():
+        if pending is not None:
+            tokens.append((pending, word))
+            pending = None
+            continue
+        word_tokens, pending = parse_word(word)
+        tokens.extend(word_tokens)
+    if pending is not None:
+        tokens.append((pending, ''))
+    for option, raw in tokens:
+        error = typed_value(option, raw)[1]
+        if error:
+            errors.append(error)
+    return tokens, errors
+
+
+def parse_params(params: str) -> Tuple[Tuple[Optional[str], Any], ...]:
+    """Разбор строки в типизированные пары (опция, значение)
+
+    Значения приводятся к типам опций: числа, Offset, кортежи вариантов;
+    у опций без значения - True. Слова без опции - ошибка.
+    При ошибках выбрасывается ParamError со списком всех ошибок.
+    """
+    tokens, errors = parse_tokens(params)
+    if errors:
+        raise ParamError(errors)
+    return tuple((option, typed_value(option, raw)[0]) for option, raw in tokens)
+
+
+def check_params(params: str) -> Tuple[bool, str]:
+    """Проверка строки параметров для интерфейса: (верно, сообщение об ошибках)"""
+    if not params.strip():
+        return True, ""
+    errors = parse_tokens(params)[1]
+    if errors:
+        return False, "Ошибки в параметрах:\n" + '\n'.join(errors)
+    return True, ""
+
+
+def normalize_params(params: str) -> Optional[str]:
+    """Каноническая строка для верных параметров или None при ошибках"""
+    tokens, errors = parse_tokens(params)
+    return None if errors else render(canonical_tokens(tokens))
+
+
+def render(tokens: List[Token]) -> str:
+    """Сборка строки параметров из пар (опция, значение)"""
+    parts = []
+    for option, value in tokens:
+        if option is None:
+            parts.append(value)
+        elif value is None:
+            parts.append(option)
+        else:
+            parts.append(f"{option} {value}")
+    return ' '.join(parts)
+
+
+def without_instance_options(tokens: List[Token]) -> List[Token]:
+    """Параметры без адреса прослушивания и режима запуска"""
+    return [token for token in tokens if token[0] not in INSTANCE_OPTIONS]
+
+
+def with_instance_options(params: str, source: str) -> str:
+    """params с адресом прослушивания и режимом запуска из source
+
+    Нужна при замене параметров работающего сервиса: найденные поиском
+    параметры не должны менять его порт.
+    """
+    instance = [token for token in tokenize(source) if token[0] in INSTANCE_OPTIONS]
+    return render(instance + without_instance_options(tokenize(params)))
+
+
+def token_order(token: Token) -> Tuple[bool, str, str]:
+    """Ключ сортировки пары: опции по имени и значению, слова без опции - в конце"""
+    option, value = token
+    return (option is None, option or '', value or '')
+
+
+def canonical_tokens(tokens: List[Token]) -> List[Token]:
+    """Каноническая форма разобранных параметров
+
+    Общие опции выносятся вперед (при повторе действует последнее
+    значение, как в getopt), опции каждой группы -A сортируются,
+    точные повторы внутри группы удаляются.
+    """
+    global_options = {}
+    groups = [{}]
+    order = ORDER_TABLE
+    complete = True
+    for token in tokens:
+        if token not in order:
+            if len(order) < TABLE_LIMIT:
+                order[token] = token_order(token)
+            else:
+                complete = False
+        option = token[0]
+        if option in GLOBAL_OPTIONS:
+            global_options[option] = token[1]
+        elif option == '-A':
+            groups.append({token: None})
+        else:
+            # Словарь сохраняет порядок и убирает точные повторы
+            groups[-1][token] = None
+
+    # Ключи сортировки берутся из таблицы без вызова функции на каждую пару
+    key = order.__getitem__ if complete else token_order
+    result = sorted(global_options.items(), key=key)
+    for number, group in enumerate(groups):
+        group = list(group)
+        if number and group:
+            # -A остается заголовком своей группы
+            result.append(group[0])
+            group = group[1:]
+        result.extend(sorted(group, key=key))
+    return result
+
+
+def canonical_params(params: str) -> str:
+    """Каноническая строка параметров: равнозначные записи дают одну строку"""
+    return render(canonical_tokens(tokenize(params)))
+
+
+def params_fingerprint(params: str) -> str:
+    """Стабильный отпечаток параметров для кэша и поиска повторов"""
+    return hashlib.sha1(canonical_params(params).encode('utf-8')).hexdigest()[:16]
+
+
+def host_group_params(groups: List[Tuple[Optional[str], str]]) -> str:
+    """Общая строка ciadpi с отдельной стратегией для каждой группы доменов
+
+    groups - список (файл со списком доменов, параметры); файл None -
+    группа по умолчанию для остальных сайтов (ставится последней). Группы
+    соединяются через "-A n": следующая группа применяется, если
+    предыдущая пропущена из-за ограничения -H. Запасные группы -A из
+    параметров переносятся вместе с ними и получают то же ограничение -H,
+    поэтому действуют только для своих доменов. Общие опции выносятся
+    вперед, из таймаутов -T выбирается наибольший.
+    """
+    global_options = {}
+    sections = []
+    for hosts_file, params in sorted(groups, key=lambda group: group[0] is None):
+        local = []
+        for option, value in without_instance_options(tokenize(params)):
+            if option == '-A':
+                local.append((option, value))
+                if hosts_file:
+                    local.append(('-H', hosts_file))
+                continue
+            if option == '-T' and '-T' in global_options:
+                try:
+                    if float(value) <= float(global_options['-T']):
+                        continue
+                except ValueError:
+                    continue
+            if option in GLOBAL_OPTIONS:
+                global_options[option] = value
+            elif option not in ('-H', '-j'):
+                local.append((option, value))
+        sections.append((hosts_file, local))
+
+    tokens = sorted(global_options.items())
+    for number, (hosts_file, local) in enumerate(sections):
+        if number:
+            tokens.append(('-A', 'n'))
+        if hosts_file:
+            tokens.append(('-H', hosts_file))
+        tokens.extend(local)
+    return render(tokens)
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    for params in ["-o1 -o25+s -T3", "-T3 -o25+s -o1", "--oob=1 -o 25+s --timeout 3",
+                   "-o1 -o25+s -T3 -At o--tlsrec 1+s", "-NU -p1080 -s 1+s -A r -d 2"]:
+        print(f"{params_fingerprint(params)}  {canonical_params(params):40}  <- {params}")
+
+    for params in ["-o1 -o25+s -T3 -At o--tlsrec 1+s", "-o1 1+s", "-s 5+xz -p 70000 -K t,x"]:
+        print(check_params(params))
+    print(parse_params("-o25+s -T3 -NU -A t,r"))
+
+    print(host_group_params([("/tmp/youtube.txt", "-o1 -o25+s -T3 -At o--tlsrec 1+s"),
+                             ("/tmp/wikipedia.txt", ""), (None, "-s1 -T5")]))
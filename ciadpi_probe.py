@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import asyncio
+import socket
+import ssl
+import time
+from urllib.parse import urlsplit
+
+# Коды ответа, которые считаются успешным прохождением
+SUCCESS_CODES = {200, 206, 301, 302}
+
+# Ответы SOCKS5 на команду CONNECT
+SOCKS5_ERRORS = {
+    1: "общая ошибка сервера",
+    2: "соединение запрещено",
+    3: "сеть недоступна",
+    4: "хост недоступен",
+    5: "соединение отклонено",
+    6: "истек TTL",
+    7: "команда не поддерживается",
+    8: "тип адреса не поддерживается",
+}
+
+
+async def recv_exact(loop, sock, size):
+    """Чтение ровно size байт из неблокирующего сокета"""
+    data = b''
+    while len(data) < size:
+        chunk = await loop.sock_recv(sock, size - len(data))
+        if not chunk:
+            raise ConnectionError("Соединение закрыто прокси")
+        data += chunk
+    return data
+
+
+async def socks5_connect(loop, sock, host, port):
+    """Согласование SOCKS5 CONNECT без аутентификации"""
+    await loop.sock_sendall(sock, b'\x05\x01\x00')
+    if await recv_exact(loop, sock, 2) != b'\x05\x00':
+        raise ConnectionError("Прокси отклонил согласование SOCKS5")
+
+    host_bytes = host.encode('idna')
+    await loop.sock_sendall(sock, b'\x05\x01\x00\x03' + bytes([len(host_bytes)]) +
+                            host_bytes + port.to_bytes(2, 'big'))
+
+    reply = await recv_exact(loop, sock, 4)
+    if reply[1] != 0:
+        raise ConnectionError(f"SOCKS5: {SOCKS5_ERRORS.get(reply[1], reply[1])}")
+
+    # Пропускаем адрес, к которому привязан прокси
+    if reply[3] == 1:
+        address_size = 4
+    elif reply[3] == 4:
+        address_size = 16
+    else:
+        address_size = (await recv_exact(loop, sock, 1))[0]
+    await recv_exact(loop, sock, address_size + 2)
+
+
+async def open_tunnel(url, proxy_host=None, proxy_port=None, ssl_context=None, timings=None):
+    """Открытие соединения с целью url, при наличии proxy_port - через SOCKS5
+
+    В timings записываются длительности фаз connect, socks и tls.
+    Возвращает (reader, writer, host, path).
+    """
+    loop = asyncio.get_running_loop()
+    parts = urlsplit(url)
+    host = parts.hostname
+    is_https = parts.scheme == 'https'
+    port = parts.port or (443 if is_https else 80)
+    timings = {} if timings is None else timings
+
+    phase_start = time.perf_counter()
+    if proxy_port:
+        address = (proxy_host, proxy_port)
+        family = socket.AF_INET6 if ':' in proxy_host else socket.AF_INET
+    else:
+        family, _, _, _, address = (await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM))[0]
+
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await loop.sock_connect(sock, address)
+        timings['connect'] = time.perf_counter() - phase_start
+
+        phase_start = time.perf_counter()
+        if proxy_port:
+            await socks5_connect(loop, sock, host, port)
+        timings['socks'] = time.perf_counter() - phase_start
+    except BaseException:
+        sock.close()
+        raise
+
+    phase_start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(
+        sock=sock,
+        ssl=(ssl_context or ssl.create_default_context()) if is_https else None,
+        server_hostname=host if is_https else None
+    )
+    timings['tls'] = time.perf_counter() - phase_start if is_https else 0.0
+
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return reader, writer, host, path
+
+
+async def close_writer(writer):
+    """Закрытие соединения без ожидания TLS close_notify от сервера"""
+    writer.close()
+    try:
+        await asyncio.wait_for(writer.wait_closed(), 1)
+    except (asyncio.TimeoutError, OSError, ssl.SSLError):
+        pass
+
+
+async def probe_url(url, proxy_host=None, proxy_port=None, timeout=8.0, ssl_context=None):
+    """Проверка одного URL с замером фаз соединения
+
+    Возвращает словарь с длительностями connect, socks, tls, ttfb и total
+    (в секундах), кодом ответа, признаком успеха и текстом ошибки.
+    """
+    result = {"url": url, "success": False, "status": None, "error": ""}
+    timings = {}
+    start_time = time.perf_counter()
+    writer = None
+
+    async def run():
+        nonlocal writer
+        reader, writer, host, path = await open_tunnel(url, proxy_host, proxy_port, ssl_context, timings)
+
+        phase_start = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                     f"User-Agent: curl/8.0\r\nAccept: */*\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        timings['ttfb'] = time.perf_counter() - phase_start
+
+        fields = status_line.split()
+        if len(fields) < 2 or not fields[1].isdigit():
+            raise ConnectionError("Некорректный ответ HTTP")
+        return int(fields[1])
+
+    try:
+        result["status"] = await asyncio.wait_for(run(), timeout)
+        result["success"] = result["status"] in SUCCESS_CODES
+    except asyncio.TimeoutError:
+        result["error"] = f"Таймаут {timeout:.1f} сек"
+    except (OSError, ssl.SSLError, ConnectionError) as e:
+        result["error"] = str(e) or e.__class__.__name__
+    finally:
+        if writer:
+            await close_writer(writer)
+
+    for phase in ('connect', 'socks', 'tls', 'ttfb'):
+        result[phase] = round(timings[phase], 4) if phase in timings else None
+    result["total"] = round(time.perf_counter() - start_time, 4)
+    return result
+
+
+async def probe_throughput(url, proxy_host=None, proxy_port=None, max_bytes=1_000_000, timeout=15.0,
+                           stall_threshold=0.5, ssl_context=None):
+    """Замер скорости скачивания до max_bytes байт
+
+    Пауза между порциями данных дольше stall_threshold секунд считается
+    зависанием. Возвращает словарь с числом байт, скоростью bytes_per_sec
+    (по телу ответа, без учета установки соединения), числом зависаний
+    stalls и временем первого байта.
+    """
+    result = {"url": url, "success": False, "status": None, "bytes": 0, "bytes_per_sec": 0.0,
+              "stalls": 0, "ttfb": None, "error": ""}
+    start_time = time.perf_counter()
+    body_start = None
+    writer = None
+
+    async def run():
+        nonlocal writer, body_start
+        reader, writer, host, path = await open_tunnel(url, proxy_host, proxy_port, ssl_context)
+
+        phase_start = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                     f"User-Agent: curl/8.0\r\nAccept: */*\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        fields = (await reader.readline()).split()
+        result["ttfb"] = round(time.perf_counter() - phase_start, 4)
+        if len(fields) < 2 or not fields[1].isdigit():
+            raise ConnectionError("Некорректный ответ HTTP")
+        result["status"] = int(fields[1])
+
+        # Пропускаем заголовки
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+
+        body_start = last_chunk = time.perf_counter()
+        while result["bytes"] < max_bytes:
+            chunk = await reader.read(min(65536, max_bytes - result["bytes"]))
+            if not chunk:
+                break
+            now = time.perf_counter()
+            if now - last_chunk > stall_threshold:
+                result["stalls"] += 1
+            last_chunk = now
+            result["bytes"] += len(chunk)
+
+    try:
+        await asyncio.wait_for(run(), timeout)
+    except asyncio.TimeoutError:
+        result["error"] = f"Таймаут {timeout:.1f} сек"
+    except (OSError, ssl.SSLError, ConnectionError) as e:
+        result["error"] = str(e) or e.__class__.__name__
+    finally:
+        if writer:
+            await close_writer(writer)
+
+    if body_start is not None:
+        elapsed = max(time.perf_counter() - body_start, 1e-6)
+        result["bytes_per_sec"] = round(result["bytes"] / elapsed, 1)
+    # Обрыв по таймауту с частью данных - тоже результат, но не успех
+    result["success"] = result["status"] in SUCCESS_CODES and result["bytes"] > 0 and not result["error"]
+    result["total"] = round(time.perf_counter() - start_time, 4)
+    return result
+
+
+def run_throughput(url, proxy_host=None, proxy_port=None, max_bytes=1_000_000, timeout=15.0,
+                   stall_threshold=0.5, ssl_context=None):
+    """Синхронная обертка над probe_throughput"""
+    return asyncio.run(probe_throughput(url, proxy_host, proxy_port, max_bytes, timeout,
+                                        stall_threshold, ssl_context))
+
+
+async def probe_all(urls, proxy_host=None, proxy_port=None, timeout=8.0, ssl_context=None):
+    """Одновременная проверка всех URL через один прокси"""
+    ssl_context = ssl_context or ssl.create_default_context()
+    return await asyncio.gather(*[
+        probe_url(url, proxy_host, proxy_port, timeout, ssl_context) for url in urls
+    ])
+
+
+def run_probes(urls, proxy_host=None, proxy_port=None, timeout=8.0, ssl_context=None):
+    """Синхронная обертка над probe_all для вызова из рабочих потоков"""
+    return asyncio.run(probe_all(urls, proxy_host, proxy_port, timeout, ssl_context))
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    urls = ["https://www.youtube.com", "https://www.google.com", "https://github.com"]
+    for item in run_probes(urls, '127.0.0.1', port):
+        status = "✅" if item["success"] else "❌"
+        print(f"{status} {item['url']}: status={item['status']} connect={item['connect']} "
+              f"socks={item['socks']} tls={item['tls']} ttfb={item['ttfb']} "
+              f"total={item['total']} {item['error']}")
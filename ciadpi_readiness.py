@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import socket
+import threading
+import time
+from collections import deque
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 1080
+
+
+class StderrTail:
+    """Фоновое чтение stderr процесса с сохранением последних строк"""
+
+    def __init__(self, stream, max_lines=20):
+        self.lines = deque(maxlen=max_lines)
+        self.stream = stream
+        self.thread = None
+        if stream is not None:
+            self.thread = threading.Thread(target=self._read, daemon=True)
+            self.thread.start()
+
+    def _read(self):
+        try:
+            for line in iter(self.stream.readline, b''):
+                self.lines.append(line.decode('utf-8', errors='replace').rstrip())
+        except (OSError, ValueError):
+            pass
+
+    def text(self, timeout=0.2):
+        """Последние строки stderr одной строкой"""
+        if self.thread:
+            self.thread.join(timeout)
+        return ' | '.join(line for line in self.lines if line)
+
+
+def listen_address(params):
+    """Адрес, на котором ciadpi с параметрами params принимает соединения"""
+    host, port = DEFAULT_HOST, DEFAULT_PORT
+    parts = params.split()
+    for i, part in enumerate(parts):
+        option, value = part[:2], part[2:]
+        if option not in ('-i', '-p'):
+            continue
+        if not value and i + 1 < len(parts):
+            value = parts[i + 1]
+        if option == '-p' and value.isdigit():
+            port = int(value)
+        elif option == '-i' and value:
+            # На 0.0.0.0 и :: подключаемся через локальный адрес
+            host = DEFAULT_HOST if value in ('0.0.0.0', '::') else value
+    return host, port
+
+
+def is_listening(host, port, timeout=0.2):
+    """Проверка, принимает ли порт TCP-соединения"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_ready(host, port, process=None, stderr_tail=None, timeout=10.0,
+                   initial_delay=0.01, max_delay=0.25, backoff=1.5, started=None):
+    """Ожидание готовности экземпляра ciadpi
+
+    Порт опрашивается с экспоненциально растущей паузой. Если процесс
+    завершился раньше, чем открыл порт, ожидание прекращается сразу.
+    started - момент запуска процесса (time.monotonic()), если он запущен
+    заранее; время и таймаут отсчитываются от него.
+    Возвращает (готов, время до готовности в секундах, причина неудачи).
+    """
+    start_time = started if started is not None else time.monotonic()
+    deadline = start_time + timeout
+    delay = initial_delay
+
+    while True:
+        if process is not None and process.poll() is not None:
+            reason = f"Процесс завершился с кодом {process.returncode}"
+            error_text = stderr_tail.text() if stderr_tail else ''
+            if error_text:
+                reason += f": {error_text}"
+            return False, time.monotonic() - start_time, reason
+
+        if is_listening(host, port, timeout=min(0.2, max(deadline - time.monotonic(), 0.01))):
+            return True, time.monotonic() - start_time, ""
+
+        now = time.monotonic()
+        if now >= deadline:
+            return False, now - start_time, f"Порт {host}:{port} не открылся за {timeout:.1f} сек"
+
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * backoff, max_delay)
+
+
+def wait_for_closed(host, port, timeout=5.0, initial_delay=0.01, max_delay=0.25, backoff=1.5):
+    """Ожидание освобождения порта после остановки экземпляра"""
+    start_time = time.monotonic()
+    deadline = start_time + timeout
+    delay = initial_delay
+
+    while is_listening(host, port):
+        now = time.monotonic()
+        if now >= deadline:
+            return False, now - start_time
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * backoff, max_delay)
+
+    return True, time.monotonic() - start_time
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    for params in ["-o1 -o25+s -T3", "-i 0.0.0.0 -p 8080 -o1", "-p9050"]:
+        host, port = listen_address(params)
+        print(f"{params}: {host}:{port} (слушает: {is_listening(host, port)})")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Критические значения t-распределения (двусторонние 95%) для малых выборок
+T_CRITICAL_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+                 8: 2.306, 9: 2.262, 10: 2.228, 15: 2.131, 20: 2.086, 30: 2.042}
+
+
+def fitness(result: Dict) -> float:
+    """Оценка кандидата по успешности и задержке (больше - лучше)
+
+    Доля успешных проверок важнее скорости: любой рабочий кандидат
+    лучше нерабочего, среди рабочих выигрывает более быстрый.
+    """
+    success_rate = result.get("success_rate", 1.0 if result.get("success") else 0.0)
+    if not success_rate:
+        return 0.0
+    return success_rate / (1.0 + result.get("speed", 0.0))
+
+
+def make_score(latency_weight: float = 0.5, throughput_weight: float = 0.5,
+               reference_latency: float = 1.0, reference_throughput: float = 1_000_000) -> Callable[[Dict], float]:
+    """Оценка, смешивающая задержку и скорость скачивания
+
+    Обе составляющие приводятся к диапазону 0..1: задержка reference_latency
+    секунд и скорость reference_throughput байт/сек дают по 0.5. Кандидаты
+    без замера скорости получают за нее ноль.
+    """
+    total_weight = (latency_weight + throughput_weight) or 1.0
+
+    def score(result: Dict) -> float:
+        success_rate = result.get("success_rate", 1.0 if result.get("success") else 0.0)
+        if not success_rate:
+            return 0.0
+        latency_part = reference_latency / (reference_latency + result.get("speed", 0.0))
+        throughput = result.get("throughput") or 0.0
+        throughput_part = throughput / (throughput + reference_throughput)
+        return success_rate * (latency_weight * latency_part +
+                               throughput_weight * throughput_part) / total_weight
+
+    return score
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Перцентиль q (0..100) с линейной интерполяцией"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> Tuple[float, float]:
+    """Доверительный интервал Уилсона для доли успехов"""
+    if not trials:
+        return 0.0, 1.0
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def t_critical(degrees: int) -> float:
+    """Критическое значение t для 95% интервала"""
+    for limit in sorted(T_CRITICAL_95):
+        if degrees <= limit:
+            return T_CRITICAL_95[limit]
+    return 1.96
+
+
+def mean_interval(values: List[float]) -> Tuple[Optional[float], Optional[float]]:
+    """95% доверительный интервал среднего (по t-распределению)"""
+    if not values:
+        return None, None
+    mean = sum(values) / len(values)
+    if len(values) < 2:
+        return 0.0, float('inf')
+    deviation = math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+    margin = t_critical(len(values) - 1) * deviation / math.sqrt(len(values))
+    return max(0.0, mean - margin), mean + margin
+
+
+def summarize_trials(targets: List[Dict]) -> Dict:
+    """Статистика по отдельным проверкам сайтов
+
+    Каждый элемент targets - результат одной проверки (probe_url).
+    Возвращает число проверок, долю успешных с интервалом Уилсона,
+    p50/p95 задержки успешных проверок и интервал ее среднего.
+    """
+    successes = sum(1 for item in targets if item.get("success"))
+    latencies = [item["total"] for item in targets if item.get("success")]
+    success_low, success_high = wilson_interval(successes, len(targets))
+    latency_low, latency_high = mean_interval(latencies)
+    return {
+        "trials": len(targets),
+        "success_rate": round(successes / len(targets), 4) if targets else 0.0,
+        "success_ci": [round(success_low, 4), round(success_high, 4)],
+        "p50": round(percentile(latencies, 50), 4) if latencies else None,
+        "p95": round(percentile(latencies, 95), 4) if latencies else None,
+        "latency_ci": [round(latency_low, 4) if latency_low is not None else None,
+                       round(latency_high, 4) if latency_high is not None else None],
+    }
+
+
+def compare_stats(first: Dict, second: Dict) -> int:
+    """Сравнение кандидатов по доверительным интервалам
+
+    1 - первый надежно лучше, -1 - второй надежно лучше, 0 - интервалы
+    пересекаются и победителя объявлять рано. Сначала сравнивается доля
+    успехов, при пересечении интервалов - средняя задержка.
+    """
+    if first["success_ci"][0] > second["success_ci"][1]:
+        return 1
+    if second["success_ci"][0] > first["success_ci"][1]:
+        return -1
+
+    first_low, first_high = first["latency_ci"]
+    second_low, second_high = second["latency_ci"]
+    if first_high is None or second_high is None:
+        return 0
+    if first_high < second_low:
+        return 1
+    if second_high < first_low:
+        return -1
+    return 0
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    score = make_score(latency_weight=0.3, throughput_weight=0.7)
+    for result in [{"success": True, "speed": 0.2, "throughput": 200_000},
+                   {"success": True, "speed": 0.6, "throughput": 5_000_000},
+                   {"success": False, "speed": 0.1, "throughput": 10_000_000}]:
+        print(f"fitness={fitness(result):.3f} score={score(result):.3f}  {result}")
+
+    fast = summarize_trials([{"success": True, "total": 0.20 + i / 100} for i in range(8)])
+    slow = summarize_trials([{"success": True, "total": 0.40 + i / 100} for i in range(8)])
+    lucky = summarize_trials([{"success": True, "total": 0.15}])
+    print(f"fast: {fast}")
+    print(f"fast vs slow: {compare_stats(fast, slow)}, fast vs lucky: {compare_stats(fast, lucky)}")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import getpass
+import os
+import subprocess
+from pathlib import Path
+
+from ciadpi_readiness import listen_address, wait_for_closed, wait_for_ready
+
+SERVICE_NAME = 'ciadpi.service'
+SERVICE_FILE = Path('/etc/systemd/system/ciadpi.service')
+OVERRIDE_DIR = Path('/etc/systemd/system/ciadpi.service.d')
+DEFAULT_PARAMS = "-o1 -o25+s -T3 -At o--tlsrec 1+s"
+
+
+def privileged(command):
+    """Команда с sudo, если запущены не от root"""
+    return command if os.geteuid() == 0 else ['sudo'] + command
+
+
+def service_params(default=DEFAULT_PARAMS):
+    """Текущие параметры ciadpi из systemd сервиса"""
+    try:
+        result = subprocess.run(
+            ['systemctl', 'show', SERVICE_NAME, '--property=ExecStart', '--no-pager'],
+            capture_output=True, text=True, timeout=5
+        )
+        if result.returncode == 0:
+            output = result.stdout.strip()
+            if 'argv[]=' in output:
+                args = output.split('argv[]=')[1].split(';')[0].split()
+                if len(args) > 1:
+                    return ' '.join(args[1:])
+        return default
+    except (OSError, subprocess.SubprocessError):
+        return default
+
+
+def service_active():
+    """Запущен ли сервис"""
+    try:
+        result = subprocess.run(['systemctl', 'is-active', SERVICE_NAME], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.stdout.strip() == 'active'
+
+
+def render_service(params, username, working_dir, binary):
+    """Содержимое service файла"""
+    return f"""[Unit]
+Description=CIADPI DPI Bypass Service
+After=network.target
+Wants=network.target
+
+[Service]
+Type=simple
+User={username}
+WorkingDirectory={working_dir}
+ExecStart={binary} {params}
+Restart=on-failure
+RestartSec=5
+TimeoutStartSec=30
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+
+def apply_service_params(new_params, binary=None, log=print):
+    """Перезапуск сервиса с новыми параметрами
+
+    Сервис останавливается (с ожиданием освобождения порта), service файл
+    переписывается, затем сервис запускается и проверяется готовность.
+    Возвращает (успех, сообщение).
+    """
+    binary = Path(binary) if binary else Path.home() / 'byedpi' / 'ciadpi'
+    try:
+        log(f"🔄 Обновление параметров: {new_params}")
+        if not binary.exists():
+            message = f"Бинарник ciadpi не найден: {binary}"
+            log(f"❌ {message}")
+            return False, message
+
+        # Адрес старого экземпляра, чтобы дождаться освобождения порта
+        old_address = listen_address(service_params())
+
+        log("⏹️ Останавливаем сервис...")
+        stop_result = subprocess.run(privileged(['systemctl', 'stop', SERVICE_NAME]),
+                                     capture_output=True, text=True, timeout=10)
+        if stop_result.returncode != 0:
+            log(f"⚠️ Предупреждение при остановке: {stop_result.stderr}")
+
+        closed, elapsed = wait_for_closed(*old_address, timeout=5)
+        log(f"⏱️ Порт {old_address[1]} освобожден за {elapsed:.2f} сек" if closed
+            else f"⚠️ Порт {old_address[1]} все еще занят")
+
+        # Удаляем override директорию если есть (избегаем конфликтов)
+        if OVERRIDE_DIR.exists():
+            subprocess.run(privileged(['rm', '-rf', str(OVERRIDE_DIR)]), check=False)
+            log("🗑️ Удалена override директория")
+
+        temp_file = Path('/tmp/ciadpi_temp.service')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(render_service(new_params, getpass.getuser(), binary.parent, binary))
+
+        log("📝 Обновляем service файл...")
+        subprocess.run(privileged(['cp', str(temp_file), str(SERVICE_FILE)]),
+                       capture_output=True, text=True, check=True)
+        subprocess.run(privileged(['systemctl', 'daemon-reload']), check=True)
+
+        log("▶️ Запускаем сервис...")
+        subprocess.run(privileged(['systemctl', 'start', SERVICE_NAME]), capture_output=True, text=True, check=True)
+
+        # Ждем, пока сервис откроет порт
+        ready, elapsed, reason = wait_for_ready(*listen_address(new_params), timeout=10)
+        log(f"⏱️ Сервис готов за {elapsed:.2f} сек" if ready else f"⚠️ {reason}")
+
+        if service_active():
+            log("✅ Параметры успешно обновлены")
+            return True, "Параметры обновлены и сервис запущен"
+
+        message = "Сервис не запустился после обновления параметров"
+        log(f"❌ {message}")
+        # Последние логи для диагностики
+        log_result = subprocess.run(['journalctl', '-u', SERVICE_NAME, '-n', '10', '--no-pager'],
+                                    capture_output=True, text=True)
+        log(f"Последние логи сервиса:\n{log_result.stdout}")
+        return False, f"{message}\nПроверьте логи"
+
+    except subprocess.CalledProcessError as e:
+        log(f"❌ Ошибка выполнения команды: {e}\nStderr: {e.stderr}")
+        return False, "Не удалось выполнить системную команду"
+
+    except Exception as e:
+        log(f"❌ Общая ошибка: {e}")
+        return False, f"Не удалось обновить параметры: {e}"
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    print(f"Сервис {'запущен' if service_active() else 'остановлен'}, параметры: {service_params()}")
+    print(render_service(DEFAULT_PARAMS, getpass.getuser(), Path.home() / 'byedpi',
+                         Path.home() / 'byedpi' / 'ciadpi'))
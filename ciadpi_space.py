@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import hashlib
+import math
+import random
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+
+class Combinations:
+    """Сочетания по k из items как последовательность с доступом по номеру
+
+    Номер раскладывается в комбинаторной системе счисления: сочетания не
+    хранятся, элемент строится по номеру. Элемент - строка из выбранных
+    items (в порядке items) через пробел; к каждому выбранному item
+    добавляется свой вариант из suffixes.
+    """
+
+    def __init__(self, items: Sequence[str], k: int, suffixes: Sequence[str] = ('',)):
+        self.items = list(items)
+        self.k = k
+        self.suffixes = list(suffixes)
+        self.choices = math.comb(len(self.items), k)
+        self.size = self.choices * len(self.suffixes) ** k
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        index, rest = divmod(index, self.choices)
+        n = len(self.items)
+        chosen = []
+        start = 0
+        for slot in range(self.k):
+            for position in range(start, n):
+                count = math.comb(n - position - 1, self.k - slot - 1)
+                if rest < count:
+                    index, suffix = divmod(index, len(self.suffixes))
+                    chosen.append(self.items[position] + self.suffixes[suffix])
+                    start = position + 1
+                    break
+                rest -= count
+        return ' '.join(chosen)
+
+
+class Chain:
+    """Последовательности одна за другой как одна последовательность"""
+
+    def __init__(self, parts: Sequence[Sequence[str]]):
+        self.parts = list(parts)
+        self.size = sum(len(part) for part in self.parts)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        for part in self.parts:
+            if index < len(part):
+                return part[index]
+            index -= len(part)
+        raise IndexError(index)
+
+
+class IndexPermutation:
+    """Псевдослучайная перестановка чисел 0..size-1 без хранения
+
+    Сеть Фейстеля на ближайшей степени двойки (четное число бит) с
+    раундовой функцией blake2b от ключа seed; значения за пределами size
+    пропускаются повторным применением (cycle walking), в среднем меньше
+    двух раз. Перестановка однозначно задается size и seed.
+    """
+
+    def __init__(self, size: int, seed: int, rounds: int = 4):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+        self.digest_size = min(64, (self.half + 7) // 8)
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(128).to_bytes(16, 'big') for _ in range(rounds)]
+
+    def round(self, value: int, key: bytes) -> int:
+        digest = hashlib.blake2b(value.to_bytes(self.digest_size, 'big'), digest_size=self.digest_size,
+                                 key=key).digest()
+        return int.from_bytes(digest, 'big') & self.mask
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = index
+        while True:
+            left, right = value >> self.half, value & self.mask
+            for key in self.keys:
+                left, right = right, left ^ self.round(right, key)
+            value = (left << self.half) | right
+            if value < self.size:
+                return value
+
+
+class ParamSpace:
+    """Пространство параметров - произведение измерений с доступом по номеру
+
+    Измерение - (имя, последовательность вариантов); пустая строка означает
+    «опция не задана». Номер кандидата раскладывается в смешанной системе
+    счисления (основания - числа вариантов измерений), поэтому кандидат
+    строится по номеру за время, пропорциональное числу измерений, а
+    разные номера дают разные кандидаты. Обход, выборка без повторов
+    (sample) и деление между исполнителями (shard) не требуют памяти,
+    растущей с размером пространства. Кандидаты, для которых accept
+    ложно, при обходе и выборке пропускаются (номера при этом не
+    сдвигаются, поэтому части исполнителей не меняются).
+    """
+
+    def __init__(self, dimensions: List[Tuple[str, Sequence[str]]],
+                 accept: Optional[Callable[[str], bool]] = None):
+        self.accept = accept
+        self.names = [name for name, _ in dimensions]
+        self.dimensions = [values for _, values in dimensions]
+        self.radices = [len(values) for values in self.dimensions]
+        self.size = math.prod(self.radices)
+
+    def __len__(self):
+        return self.size
+
+    def digits(self, index: int) -> List[int]:
+        """Номера вариантов по измерениям для кандидата index"""
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        digits = []
+        for radix in self.radices:
+            index, digit = divmod(index, radix)
+            digits.append(digit)
+        return digits
+
+    def __getitem__(self, index: int) -> str:
+        parts = (values[digit] for values, digit in zip(self.dimensions, self.digits(index)))
+        return ' '.join(part for part in parts if part)
+
+    def describe(self, index: int) -> dict:
+        """Кандидат index по измерениям: имя -> выбранный вариант"""
+        return {name: values[digit] for name, values, digit in zip(self.names, self.dimensions, self.digits(index))}
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self.size):
+            params = self[index]
+            if self.accept is None or self.accept(params):
+                yield params
+
+    def shard(self, worker: int, workers: int) -> Tuple[int, int]:
+        """Диапазон позиций [start, stop) исполнителя worker из workers"""
+        if not 0 <= worker < workers:
+            raise ValueError(f"Неверный номер исполнителя: {worker} из {workers}")
+        return self.size * worker // workers, self.size * (worker + 1) // workers
+
+    def sample(self, seed: int, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """Выборка без повторов: пары (позиция, кандидат) для позиций start..stop
+
+        Позиции - места в псевдослучайной перестановке пространства,
+        заданной seed: одинаковый seed у всех исполнителей и
+        непересекающиеся диапазоны (shard) дают проверку без повторов.
+        Позиция нужна, чтобы продолжить обход с места остановки.
+        """
+        permutation = IndexPermutation(self.size, seed)
+        stop = self.size if stop is None else min(stop, self.size)
+        for position in range(start, stop):
+            params = self[permutation[position]]
+            if self.accept is None or self.accept(params):
+                yield position, params
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Разбор записи вида «2/8» (исполнитель 2 из 8, с единицы) в (1, 8)"""
+    worker, _, workers = text.partition('/')
+    worker, workers = int(worker), int(workers or 1)
+    if not 1 <= worker <= workers:
+        raise ValueError(f"Неверная часть пространства: {text}")
+    return worker - 1, workers
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    import time
+
+    from ciadpi_param_generator import AdvancedParamGenerator
+
+    space = AdvancedParamGenerator().param_space()
+    print(f"Кандидатов в пространстве: {space.size:,}")
+    print(f"Измерения: {', '.join(f'{name}={radix}' for name, radix in zip(space.names, space.radices))}")
+    for index in (0, 1, space.size // 2, space.size - 1):
+        print(f"#{index}: {space[index]}")
+
+    start_time = time.perf_counter()
+    sample = [params for _, params in space.sample(seed=42, stop=10000)]
+    elapsed = time.perf_counter() - start_time
+    # Часть позиций отбрасывается ограничениями (accept), поэтому кандидатов меньше позиций
+    print(f"Выборка из 10000 позиций: {len(sample)} кандидатов, {len(set(sample))} уникальных "
+          f"за {elapsed:.2f} сек")
+    start, stop = space.shard(1, 4)
+    print(f"Часть 2/4: позиции {start:,}..{stop:,}")
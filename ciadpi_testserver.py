@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import asyncio
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# Блок данных для отдачи тела ответа
+PAYLOAD_BLOCK = bytes(range(256)) * 256
+
+
+def make_self_signed_cert(directory=None, hostname='localhost'):
+    """Самоподписанный сертификат для локального TLS-сервера (через openssl)
+
+    Возвращает (certfile, keyfile) или None, если openssl не установлен.
+    """
+    if not shutil.which('openssl'):
+        return None
+    directory = Path(directory or tempfile.mkdtemp(prefix='ciadpi_cert_'))
+    certfile, keyfile = directory / 'cert.pem', directory / 'key.pem'
+    result = subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', f'/CN={hostname}',
+        '-addext', f'subjectAltName=DNS:{hostname},IP:127.0.0.1',
+        '-keyout', str(keyfile), '-out', str(certfile)
+    ], capture_output=True)
+    if result.returncode != 0:
+        return None
+    return str(certfile), str(keyfile)
+
+
+class LocalTestServer:
+    """Локальный HTTP/HTTPS-сервер - замена реальным сайтам в офлайн-тестах
+
+    Работает в отдельном потоке со своим циклом asyncio. Пути:
+      /              - короткий ответ 200
+      /bytes/<n>     - n байт данных (?rate=<байт/сек> ограничивает скорость)
+      /status/<код>  - пустой ответ с указанным кодом
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, certfile=None, keyfile=None):
+        self.host = host
+        self.port = port
+        self.ssl_context = None
+        if certfile:
+            self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+
+    @property
+    def scheme(self):
+        return 'https' if self.ssl_context else 'http'
+
+    def url(self, path='/', hostname=None):
+        """URL ресурса на этом сервере"""
+        return f"{self.scheme}://{hostname or self.host}:{self.port}{path}"
+
+    async def handle(self, reader, writer):
+        """Обработка одного HTTP-запроса"""
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            fields = request_line.decode('latin-1').split()
+            if len(fields) < 2:
+                return
+            parts = urlsplit(fields[1])
+            query = parse_qs(parts.query)
+            segments = [segment for segment in parts.path.split('/') if segment]
+
+            status, size = 200, 2
+            if len(segments) == 2 and segments[0] == 'bytes' and segments[1].isdigit():
+                size = int(segments[1])
+            elif len(segments) == 2 and segments[0] == 'status' and segments[1].isdigit():
+                status, size = int(segments[1]), 0
+            elif segments:
+                status, size = 404, 0
+            rate = float(query.get('rate', ['0'])[0])
+
+            writer.write(f"HTTP/1.1 {status} OK\r\nContent-Length: {size}\r\n"
+                         f"Content-Type: application/octet-stream\r\nConnection: close\r\n\r\n".encode())
+            sent = 0
+            while sent < size:
+                block = PAYLOAD_BLOCK[:min(len(PAYLOAD_BLOCK), size - sent)]
+                if rate:
+                    # Ограничение скорости порциями по 1/20 секунды
+                    block = block[:max(1, int(rate / 20))]
+                writer.write(block)
+                await writer.drain()
+                sent += len(block)
+                if rate and sent < size:
+                    await asyncio.sleep(len(block) / rate)
+        except (OSError, ssl.SSLError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Клиент закрыл соединение или сервер останавливается
+            pass
+        finally:
+            writer.close()
+
+    def run(self):
+        """Цикл сервера в фоновом потоке"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, self.host, self.port, ssl=self.ssl_context)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started.set()
+        self.loop.run_forever()
+
+        # Завершаем незаконченные запросы до закрытия цикла
+        self.server.close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def start(self):
+        """Запуск сервера; возвращает порт"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+        return self.port
+
+    def stop(self):
+        """Остановка сервера"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(5)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# Тестирование модуля
+if __name__ == "__main__":
+    from ciadpi_probe import run_probes, run_throughput
+
+    with LocalTestServer() as server:
+        print(run_probes([server.url('/'), server.url('/status/403')]))
+        print(run_throughput(server.url('/bytes/5000000'), max_bytes=5_000_000))
+        print(run_throughput(server.url('/bytes/200000?rate=100000'), max_bytes=200_000))
+
+    cert = make_self_signed_cert()
+    if cert:
+        context = ssl.create_default_context(cafile=cert[0])
+        with LocalTestServer(certfile=cert[0], keyfile=cert[1]) as server:
+            print(run_probes([server.url('/', 'localhost')], ssl_context=context))
+            print(run_throughput(server.url('/bytes/2000000', 'localhost'), max_bytes=2_000_000,
+                                 ssl_context=context))
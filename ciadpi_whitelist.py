@@ -33,7 +33,7 @@ class WhitelistManager:
         }
         
         try:
-            self.config_path.parent.mkdir(exist_ok=True)
+            self.config_path.parent.mkdir(parents=True, exist_ok=True)
             if self.config_path.exists():
                 with open(self.config_path, 'r', encoding='utf-8') as f:
                     whitelist = json.load(f)
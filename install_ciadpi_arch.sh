@@ -279,6 +279,23 @@ main() {
         "ciadpi_autosearch.py"
         "ciadpi_param_generator.py"
         "ciadpi_whitelist.py"
+        "ciadpi_readiness.py"
+        "ciadpi_probe.py"
+        "ciadpi_optimizers.py"
+        "ciadpi_params.py"
+        "ciadpi_history.py"
+        "ciadpi_scoring.py"
+        "ciadpi_testserver.py"
+        "ciadpi_dpi_sim.py"
+        "ciadpi_benchmark.py"
+        "ciadpi_monitor.py"
+        "ciadpi_checkpoint.py"
+        "ciadpi_network.py"
+        "ciadpi_service.py"
+        "ciadpi_cli.py"
+        "ciadpi_space.py"
+        "ciadpi_constraints.py"
+        "ciadpi_features.py"
         "ciadpi_launcher.sh"
         "diagnose_ciadpi.py"
     )
@@ -230,6 +230,23 @@ install_python_scripts() {
         [ -f "ciadpi_autosearch.py" ] && cp "ciadpi_autosearch.py" "$HOME/.local/bin/"
         [ -f "ciadpi_param_generator.py" ] && cp "ciadpi_param_generator.py" "$HOME/.local/bin/"
         [ -f "ciadpi_whitelist.py" ] && cp "ciadpi_whitelist.py" "$HOME/.local/bin/"  # ДОБАВЛЕНО
+        [ -f "ciadpi_features.py" ] && cp "ciadpi_features.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_constraints.py" ] && cp "ciadpi_constraints.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_space.py" ] && cp "ciadpi_space.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_cli.py" ] && cp "ciadpi_cli.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_service.py" ] && cp "ciadpi_service.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_network.py" ] && cp "ciadpi_network.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_checkpoint.py" ] && cp "ciadpi_checkpoint.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_monitor.py" ] && cp "ciadpi_monitor.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_benchmark.py" ] && cp "ciadpi_benchmark.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_dpi_sim.py" ] && cp "ciadpi_dpi_sim.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_testserver.py" ] && cp "ciadpi_testserver.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_scoring.py" ] && cp "ciadpi_scoring.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_history.py" ] && cp "ciadpi_history.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_params.py" ] && cp "ciadpi_params.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_optimizers.py" ] && cp "ciadpi_optimizers.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_probe.py" ] && cp "ciadpi_probe.py" "$HOME/.local/bin/"
+        [ -f "ciadpi_readiness.py" ] && cp "ciadpi_readiness.py" "$HOME/.local/bin/"
         
     else
         # УДАЛЕННАЯ установка - скачиваем с GitHub
@@ -246,6 +263,23 @@ install_python_scripts() {
         wget -q -O "$HOME/.local/bin/ciadpi_autosearch.py" "$BASE_URL/ciadpi_autosearch.py" 2>/dev/null || warn "Autosearch script not available"
         wget -q -O "$HOME/.local/bin/ciadpi_param_generator.py" "$BASE_URL/ciadpi_param_generator.py" 2>/dev/null || warn "Param generator script not available"
         wget -q -O "$HOME/.local/bin/ciadpi_whitelist.py" "$BASE_URL/ciadpi_whitelist.py" 2>/dev/null || warn "Whitelist script not available"  # ДОБАВЛЕНО
+        wget -q -O "$HOME/.local/bin/ciadpi_readiness.py" "$BASE_URL/ciadpi_readiness.py" 2>/dev/null || warn "Readiness module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_probe.py" "$BASE_URL/ciadpi_probe.py" 2>/dev/null || warn "Probe module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_optimizers.py" "$BASE_URL/ciadpi_optimizers.py" 2>/dev/null || warn "Optimizers module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_params.py" "$BASE_URL/ciadpi_params.py" 2>/dev/null || warn "Params module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_history.py" "$BASE_URL/ciadpi_history.py" 2>/dev/null || warn "History module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_scoring.py" "$BASE_URL/ciadpi_scoring.py" 2>/dev/null || warn "Scoring module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_testserver.py" "$BASE_URL/ciadpi_testserver.py" 2>/dev/null || warn "Test server module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_dpi_sim.py" "$BASE_URL/ciadpi_dpi_sim.py" 2>/dev/null || warn "DPI simulator not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_benchmark.py" "$BASE_URL/ciadpi_benchmark.py" 2>/dev/null || warn "Benchmark not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_monitor.py" "$BASE_URL/ciadpi_monitor.py" 2>/dev/null || warn "Health monitor not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_checkpoint.py" "$BASE_URL/ciadpi_checkpoint.py" 2>/dev/null || warn "Checkpoint module not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_network.py" "$BASE_URL/ciadpi_network.py" 2>/dev/null || warn "Network watcher not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_service.py" "$BASE_URL/ciadpi_service.py" 2>/dev/null || warn "Service control not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_cli.py" "$BASE_URL/ciadpi_cli.py" 2>/dev/null || warn "Command line interface not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_space.py" "$BASE_URL/ciadpi_space.py" 2>/dev/null || warn "Parameter space not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_constraints.py" "$BASE_URL/ciadpi_constraints.py" 2>/dev/null || warn "Parameter constraints not available"
+        wget -q -O "$HOME/.local/bin/ciadpi_features.py" "$BASE_URL/ciadpi_features.py" 2>/dev/null || warn "Candidate features not available"
     fi
     
     log "Python scripts installed to ~/.local/bin/"
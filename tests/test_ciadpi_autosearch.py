@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_autosearch import CIAutoSearch, ResultCache
+from ciadpi_benchmark import write_fake_ciadpi
+from ciadpi_checkpoint import SearchCheckpoint
+from ciadpi_features import NUMPY_AVAILABLE
+
+
+def trial_result(params, latencies):
+    """Результат проверки с отдельными проверками сайтов (для confirm_winner)"""
+    targets = [{"url": "https://example.org", "success": True, "total": latency} for latency in latencies]
+    return {"params": params, "success": True, "success_rate": 1.0, "speed": sum(latencies) / len(latencies),
+            "passes": 1, "pass_speeds": [sum(latencies) / len(latencies)], "targets": targets}
+
+
+class SearcherTestCase(unittest.TestCase):
+    """Поисковик с временным HOME: история, кэш и состояние не трогают настоящие файлы"""
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp(prefix='ciadpi_test_')
+        self.old_home = os.environ.get('HOME')
+        os.environ['HOME'] = self.home
+        self.searcher = CIAutoSearch()
+        self.searcher.logger.disabled = True
+
+    def tearDown(self):
+        if self.old_home is None:
+            os.environ.pop('HOME', None)
+        else:
+            os.environ['HOME'] = self.old_home
+        shutil.rmtree(self.home, ignore_errors=True)
+
+
+class ConfirmWinnerTest(SearcherTestCase):
+    """Выбор победителя при истекшем сроке поиска"""
+
+    def setUp(self):
+        super().setUp()
+        self.tested = []
+
+        def evaluate_params(params, *args, **kwargs):
+            self.tested.append(params)
+            # После первой проверки срок поиска истекает
+            self.searcher.candidate_cost = 1000
+            return trial_result(params, [0.1, 0.5])
+
+        self.searcher.evaluate_params = evaluate_params
+        self.searcher.pipeline_depth = 0
+        # Интервалы задержки пересекаются - нужны дополнительные повторы
+        self.results = [trial_result("-o 1", [0.1, 0.3]), trial_result("-o 2", [0.15, 0.35])]
+
+    def test_exhausted_budget_returns_leader(self):
+        self.searcher.is_searching = True
+        self.searcher.begin_budget(100)
+        self.searcher.candidate_cost = 1000
+        best = self.searcher.confirm_winner(self.results, concurrency=1)
+        self.assertEqual(best["params"], "-o 1")
+        self.assertFalse(best["confident"])
+        self.assertEqual(self.tested, [])
+
+    def test_separated_intervals_need_no_retests(self):
+        self.searcher.is_searching = True
+        results = [trial_result("-o 2", [0.50, 0.52, 0.51, 0.50]), trial_result("-o 1", [0.10, 0.11, 0.12, 0.10])]
+        best = self.searcher.confirm_winner(results, concurrency=1)
+        self.assertEqual(best["params"], "-o 1")
+        self.assertTrue(best["confident"])
+        self.assertEqual(self.tested, [])
+
+    def test_pool_stopped_partway_keeps_all_contenders(self):
+        self.searcher.is_searching = True
+        self.searcher.begin_budget(100)
+        best = self.searcher.confirm_winner(self.results, concurrency=1)
+        # Проверен только лидер, второй претендент остался с прежним результатом
+        self.assertEqual(self.tested, ["-o 1"])
+        self.assertIn(best["params"], {"-o 1", "-o 2"})
+        self.assertFalse(best["confident"])
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Кэш результатов: ключ по отпечатку и профилю, срок жизни, запись пачками"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='ciadpi_test_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = Path(self.directory) / 'result_cache.json'
+        self.cache = ResultCache(self.path, ttl=60, batch=3)
+
+    def test_equivalent_params_share_entry(self):
+        self.cache.put("-o1 -T3", {"speed": 0.5})
+        self.assertEqual(self.cache.get("-T 3 -o 1"), {"speed": 0.5})
+        self.assertIsNone(self.cache.get("-o 2"))
+
+    def test_profile_is_part_of_key(self):
+        self.cache.put("-o 1", {"speed": 0.5}, "profile-a")
+        self.assertEqual(self.cache.get("-o 1", "profile-a"), {"speed": 0.5})
+        self.assertIsNone(self.cache.get("-o 1", "profile-b"))
+        self.assertIsNone(self.cache.get("-o 1"))
+
+    def test_expired_entries(self):
+        self.cache.put("-o 1", {"speed": 0.5})
+        self.cache.entries[self.cache.key("-o 1")]["time"] -= 61
+        self.assertIsNone(self.cache.get("-o 1"))
+        # Устаревшие записи удаляются при добавлении новых
+        self.cache.put("-o 2", {"speed": 0.6})
+        self.assertEqual(list(self.cache.entries), [self.cache.key("-o 2")])
+
+    def test_written_in_batches(self):
+        self.cache.put("-o 1", {"speed": 0.5})
+        self.cache.put("-o 2", {"speed": 0.6})
+        self.assertFalse(self.path.exists())
+        self.cache.put("-o 3", {"speed": 0.7})
+        self.assertEqual(len(ResultCache(self.path).entries), 3)
+        self.cache.put("-o 4", {"speed": 0.8})
+        self.cache.flush()
+        self.assertEqual(len(ResultCache(self.path).entries), 4)
+
+
+class CheckpointTest(unittest.TestCase):
+    """Файл состояния: атомарная запись не чаще min_interval"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='ciadpi_test_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.checkpoint = SearchCheckpoint(Path(self.directory) / 'search_state.json', min_interval=60)
+
+    def test_save_load_clear(self):
+        self.assertIsNone(self.checkpoint.load())
+        self.assertTrue(self.checkpoint.save({"strategy": "flat", "completed": 2}))
+        self.assertFalse(self.checkpoint.save({"strategy": "flat", "completed": 3}))
+        self.assertEqual(self.checkpoint.load()["completed"], 2)
+        self.assertTrue(self.checkpoint.save({"strategy": "flat", "completed": 3}, force=True))
+        self.assertIn("проверено: 3", self.checkpoint.describe())
+        self.checkpoint.clear()
+        self.assertFalse(self.checkpoint.exists())
+
+
+class ResumeTest(SearcherTestCase):
+    """Прерванный поиск продолжается без повторных проверок"""
+
+    def setUp(self):
+        super().setUp()
+        self.searcher.pipeline_depth = 0
+        self.tested = []
+        self.stop_after = None
+
+        def evaluate_params(params, *args, **kwargs):
+            if not kwargs.get("label"):
+                self.tested.append(params)
+            if len(self.tested) == self.stop_after:
+                self.searcher.stop_search()
+            return trial_result(params, [0.1 + 0.01 * len(self.tested)] * 4)
+
+        self.searcher.evaluate_params = evaluate_params
+
+    def check_resume(self, strategy, **kwargs):
+        self.stop_after = 3
+        self.searcher.find_optimal_params(8, 5, concurrency=1, strategy=strategy, seed=11, **kwargs)
+        self.assertEqual(len(self.tested), 3)
+        self.assertTrue(self.searcher.checkpoint.exists())
+        interrupted = list(self.tested)
+
+        self.stop_after = None
+        self.searcher.find_optimal_params(8, 5, concurrency=1, strategy=strategy, seed=11, resume=True, **kwargs)
+        self.assertEqual(self.tested[:3], interrupted)
+        self.assertEqual(len(self.tested), 8)
+        self.assertEqual(len(set(self.tested)), 8)
+        self.assertFalse(self.searcher.checkpoint.exists())
+
+    def test_flat(self):
+        self.check_resume('flat')
+
+    def test_space(self):
+        self.check_resume('space')
+
+
+class EvaluateCacheTest(SearcherTestCase):
+    """Кэширование проверок с поддельным ciadpi"""
+
+    def setUp(self):
+        super().setUp()
+        self.searcher.ciadpi_path = write_fake_ciadpi(self.home)
+        # Сайт недоступен - проверка быстро завершается неудачей
+        self.searcher.test_urls = ["http://127.0.0.1:9/"]
+        self.searcher.throughput_bytes = 0
+        self.searcher.trials = 1
+
+    def test_startup_failure_is_not_cached(self):
+        first = self.searcher.evaluate_params("-Y", test_duration=2)
+        self.assertTrue(first["message"].startswith("Не запустился"))
+        second = self.searcher.evaluate_params("-Y", test_duration=2)
+        self.assertFalse(second.get("cached"))
+
+    def test_timeout_is_part_of_profile(self):
+        self.assertFalse(self.searcher.evaluate_params("-o 1", test_duration=2).get("cached"))
+        self.assertTrue(self.searcher.evaluate_params("-o 1", test_duration=2).get("cached"))
+        self.assertFalse(self.searcher.evaluate_params("-o 1", test_duration=1).get("cached"))
+
+
+class PipelineTest(SearcherTestCase):
+    """Конвейер: кэшированные кандидаты не запускаются заранее, остановка не проверяет очередь"""
+
+    def setUp(self):
+        super().setUp()
+        self.searcher.is_searching = True
+        self.tested, self.launched, self.retired = [], [], []
+
+        def prelaunch(params):
+            self.launched.append(params)
+            self.searcher.prelaunched.setdefault(params, []).append({"params": params, "process": None})
+
+        def evaluate_params(params, *args, **kwargs):
+            self.tested.append(params)
+            instance = self.searcher.take_prelaunched(params)
+            if instance:
+                self.retired.append(instance["params"])
+            return trial_result(params, [0.2])
+
+        self.searcher.prelaunch = prelaunch
+        self.searcher.retire_instance = lambda instance: self.retired.append(instance["params"])
+        self.searcher.evaluate_params = evaluate_params
+
+    def test_cached_candidates_are_not_prelaunched(self):
+        task = self.searcher.evaluation_task(5)
+        self.searcher.result_cache.put("-o 2", trial_result("-o 2", [0.2]), self.searcher.cache_profile(5))
+        list(self.searcher.run_pipeline(["-o 1", "-o 2", "-o 3"], task, depth=2))
+        self.assertEqual(self.launched, ["-o 1", "-o 3"])
+        self.assertEqual(self.tested, ["-o 1", "-o 2", "-o 3"])
+
+    def test_stop_retires_upcoming_without_testing(self):
+        task = self.searcher.evaluation_task(5)
+        results = self.searcher.run_pipeline(["-o 1", "-o 2", "-o 3", "-o 4"], task, depth=2)
+        next(results)
+        self.searcher.stop_search()
+        self.assertEqual(list(results), [])
+        self.assertEqual(self.tested, ["-o 1"])
+        self.assertEqual(self.launched, ["-o 1", "-o 2", "-o 3"])
+        self.assertEqual(sorted(self.retired), ["-o 1", "-o 2", "-o 3"])
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "нужен NumPy")
+class BayesPreselectTest(SearcherTestCase):
+    """Предварительный отбор по модели меняет проверяемых кандидатов"""
+
+    @staticmethod
+    def works(params):
+        # Стенд, где обход дает только разрезание -s
+        return ' -s ' in f" {params} "
+
+    def run_search(self, preselect):
+        from ciadpi_param_generator import AdvancedParamGenerator
+
+        history = [{"params": params, "success": self.works(params), "speed": 0.2}
+                   for params in AdvancedParamGenerator(rng=2).generate_comprehensive_params(60)]
+        tested = []
+
+        def evaluate_params(params, *args, **kwargs):
+            tested.append(params)
+            return trial_result(params, [0.2, 0.3]) if self.works(params) else \
+                dict(trial_result(params, [5.0]), success=False, success_rate=0.0, pass_speeds=[])
+
+        self.searcher.get_history = lambda limit=50: history
+        self.searcher.evaluate_params = evaluate_params
+        self.searcher.find_optimal_params_bayes(max_tests=8, test_duration=1, concurrency=4, seed=7,
+                                                preselect=preselect)
+        return tested[:8]
+
+    def test_preselect_changes_tested_candidates(self):
+        plain = self.run_search(False)
+        preselected = self.run_search(True)
+        self.assertNotEqual(plain, preselected)
+        self.assertTrue(all(self.works(params) for params in preselected))
+        self.assertGreaterEqual(sum(map(self.works, preselected)), sum(map(self.works, plain)))
+
+
+if __name__ == "__main__":
+    unittest.main()
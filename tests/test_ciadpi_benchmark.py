@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_benchmark import compare_reports, run_child
+
+
+class EndToEndTest(unittest.TestCase):
+    """Поиск с поддельным ciadpi против офлайн-стенда с симулятором DPI"""
+
+    def run_strategy(self, strategy, fake=None):
+        job = {"strategy": strategy, "max_tests": 8, "concurrency": 2, "test_duration": 4, "fake": fake,
+               "action": "reset", "seed": 5}
+        returncode, run = run_child(job)
+        self.assertEqual(returncode, 0)
+        return run
+
+    def test_split_passes_dpi(self):
+        run = self.run_strategy('flat')
+        self.assertGreater(run["working"], 0)
+        self.assertGreater(run["dpi"]["blocked"], 0)
+        self.assertTrue({'-s', '-d'} & set(run["best_params"].split()))
+
+    def test_without_split_nothing_works(self):
+        run = self.run_strategy('flat', {"split_options": []})
+        self.assertEqual(run["working"], 0)
+        self.assertIsNone(run["best_params"])
+
+
+class CompareReportsTest(unittest.TestCase):
+    """Регрессии относительно прошлого отчета"""
+
+    def report(self, per_minute, first_working):
+        return {"runs": [{"strategy": "flat", "candidates_per_minute": per_minute,
+                          "time_to_first_working": first_working}]}
+
+    def test_regressions(self):
+        baseline = self.report(100, 2.0)
+        self.assertEqual(compare_reports(baseline, self.report(90, 2.2)), [])
+        self.assertEqual(len(compare_reports(baseline, self.report(50, 3.0))), 2)
+
+    def test_failed_runs_are_skipped(self):
+        baseline = self.report(100, 2.0)
+        self.assertEqual(compare_reports(baseline, {"runs": [{"strategy": "flat", "error": "код завершения 1"}]}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ciadpi_network
+import ciadpi_service
+from ciadpi_cli import apply_params, parse_args
+
+
+class ApplyParamsTest(unittest.TestCase):
+    """Параметры ciadpi команды apply передаются без изменения порядка"""
+
+    def test_option_value_pairs_keep_order(self):
+        args = parse_args(['apply', '-s', '1+s', '-T', '3'])
+        self.assertEqual(args.params, ['-s', '1+s', '-T', '3'])
+
+    def test_flags_before_params(self):
+        args = parse_args(['--ciadpi', '/opt/ciadpi', 'apply', '--exact', '--remember', '-o1', '-d', '2'])
+        self.assertTrue(args.exact)
+        self.assertTrue(args.remember)
+        self.assertEqual(args.ciadpi, '/opt/ciadpi')
+        self.assertEqual(args.params, ['-o1', '-d', '2'])
+
+    def test_separator(self):
+        args = parse_args(['apply', '--', '--best', '-T', '3'])
+        self.assertFalse(args.best)
+        self.assertEqual(args.params, ['--best', '-T', '3'])
+
+    def test_best_without_params(self):
+        args = parse_args(['apply', '--best'])
+        self.assertTrue(args.best)
+        self.assertEqual(args.params, [])
+
+    def test_unknown_arguments_of_other_commands(self):
+        with self.assertRaises(SystemExit):
+            parse_args(['history', '-s', '1+s'])
+
+
+class RememberAppliedTest(unittest.TestCase):
+    """Применение найденных параметров сохраняет для сети измеренную скорость"""
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp(prefix='ciadpi_test_')
+        self.addCleanup(shutil.rmtree, self.config_dir, ignore_errors=True)
+        # Настоящий сервис не трогается
+        for target, name, value in [(ciadpi_network, 'CONFIG_DIR', Path(self.config_dir)),
+                                    (ciadpi_service, 'service_params', lambda *args: "-i 127.0.0.1 -p 1081"),
+                                    (ciadpi_service, 'apply_service_params', lambda *args, **kwargs: (True, "ok")),
+                                    (sys.modules['ciadpi_cli'], 'emit', lambda *args, **kwargs: None)]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_speed_is_kept(self):
+        self.assertTrue(apply_params("-o 1", network=("Wi-Fi", "net1"), speed=0.42))
+        saved = ciadpi_network.NetworkParamsCache().get("net1")
+        self.assertEqual(saved["speed"], 0.42)
+        self.assertEqual(saved["params"], "-i 127.0.0.1 -p 1081 -o 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_constraints import CONSTRAINTS, RELEVANT_TAGS, Constraints
+
+
+class PruneTest(unittest.TestCase):
+    """Сокращение набора до минимальной равнозначной формы"""
+
+    def test_irrelevant_options_are_removed(self):
+        self.assertEqual(CONSTRAINTS.prune("-D -i 0.0.0.0 -p 1080 -o1 -f 1+m -t 8 -S"), "-S -f 1+m -o 1 -t 8")
+
+    def test_last_value_wins(self):
+        self.assertEqual(CONSTRAINTS.prune("-o1 -T3 -T5"), "-T 5 -o 1")
+
+    def test_required_options(self):
+        self.assertEqual(CONSTRAINTS.prune("-o1 -t 8"), "-o 1")
+        self.assertEqual(CONSTRAINTS.prune("-L 1 -o1"), "-o 1")
+        self.assertEqual(CONSTRAINTS.prune("-o1 -A torst -t 8 -f 2+m"), "-o 1 -A torst -f 2+m -t 8")
+        # -t в группе -A не видит -f из другой группы
+        self.assertEqual(CONSTRAINTS.prune("-f 2+m -A torst -t 8"), "-f 2+m -A torst")
+
+    def test_equivalent_sets_share_key(self):
+        self.assertEqual(CONSTRAINTS.key("-o1 -T3 -p 1080"), CONSTRAINTS.key("-T 3 -o 1"))
+        self.assertNotEqual(CONSTRAINTS.key("-o1 -T3"), CONSTRAINTS.key("-o1 -T5"))
+
+    def test_minimal_set_is_allowed(self):
+        self.assertTrue(CONSTRAINTS.allows("-T 3 -o 1"))
+        self.assertFalse(CONSTRAINTS.allows("-o1 -T3 -T5"))
+
+    def test_grammar_errors_reject(self):
+        self.assertIsNone(CONSTRAINTS.prune("-o"))
+
+    def test_no_domain_is_kept(self):
+        # -N меняет обработку SOCKS: без доменных имен сайты не открываются
+        self.assertEqual(CONSTRAINTS.prune("-N -o1"), "-N -o 1")
+
+
+class ExclusionsTest(unittest.TestCase):
+    """Несовместимые опции проверяются после сокращения"""
+
+    def test_irrelevant_option_is_pruned_first(self):
+        pruned, violations = CONSTRAINTS.analyze("-U -a 2 -o1")
+        self.assertEqual(pruned, "-a 2 -o 1")
+        self.assertEqual(violations, ["-U не влияет на обход"])
+
+    def test_exclusion_of_remaining_options(self):
+        constraints = Constraints(relevant=RELEVANT_TAGS | {'network'})
+        self.assertIsNone(constraints.prune("-U -a 2 -o1"))
+        self.assertEqual(constraints.prune("-U -o1"), "-U -o 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
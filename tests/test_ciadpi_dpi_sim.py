@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import socket
+import ssl
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_dpi_sim import DPISimulator, inspect_segments, parse_host, parse_sni
+from ciadpi_testserver import LocalTestServer
+
+BLOCKED = 'blocked.example'
+
+
+def client_hello(hostname=BLOCKED):
+    """Настоящий TLS ClientHello с SNI hostname"""
+    incoming, outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+    connection = ssl.create_default_context().wrap_bio(incoming, outgoing, server_hostname=hostname)
+    try:
+        connection.do_handshake()
+    except ssl.SSLWantReadError:
+        pass
+    return outgoing.read()
+
+
+class ParseTest(unittest.TestCase):
+    """Разбор SNI и Host, в том числе неполных данных"""
+
+    def test_full_client_hello(self):
+        self.assertEqual(parse_sni(client_hello()), BLOCKED)
+
+    def test_truncated_record_header_needs_more_data(self):
+        hello = client_hello()
+        for length in range(1, 5):
+            self.assertIsNone(parse_sni(hello[:length]), length)
+        self.assertIsNone(parse_sni(hello[:-1]))
+
+    def test_not_tls(self):
+        self.assertEqual(parse_sni(b''), '')
+        self.assertEqual(parse_sni(b'GET / HTTP/1.1\r\n'), '')
+
+    def test_http_host(self):
+        request = f"GET / HTTP/1.1\r\nHost: {BLOCKED}:8080\r\n\r\n".encode()
+        self.assertEqual(parse_host(request), BLOCKED)
+        self.assertIsNone(parse_host(request[:10]))
+
+
+class SegmentsTest(unittest.TestCase):
+    """Решение DPI по явным сегментам в обоих режимах"""
+
+    def setUp(self):
+        self.hello = client_hello()
+        self.sni_offset = self.hello.index(BLOCKED.encode())
+
+    def check(self, split, simple, reassembling):
+        segments = [self.hello[:split], self.hello[split:]]
+        self.assertEqual(inspect_segments(segments), simple)
+        self.assertEqual(inspect_segments(segments, reassemble=True), reassembling)
+
+    def test_not_split(self):
+        self.assertEqual(inspect_segments([self.hello]), BLOCKED)
+        self.assertEqual(inspect_segments([self.hello], reassemble=True), BLOCKED)
+
+    def test_split_at_1(self):
+        self.check(1, None, BLOCKED)
+
+    def test_split_inside_record_header(self):
+        self.check(3, None, BLOCKED)
+
+    def test_split_inside_sni(self):
+        self.check(self.sni_offset + 3, None, BLOCKED)
+
+    def test_split_http_request(self):
+        request = f"GET / HTTP/1.1\r\nHost: {BLOCKED}\r\n\r\n".encode()
+        segments = [request[:1], request[1:]]
+        self.assertIsNone(inspect_segments(segments))
+        self.assertEqual(inspect_segments(segments, reassemble=True), BLOCKED)
+
+
+class SimulatorTest(unittest.TestCase):
+    """Живой симулятор: ClientHello, разрезанный на первом байте"""
+
+    def run_split(self, reassemble, split):
+        origin = LocalTestServer()
+        origin.start()
+        try:
+            with DPISimulator((origin.host, origin.port), [BLOCKED], reassemble=reassemble) as simulator:
+                hello = client_hello()
+                with socket.create_connection(('127.0.0.1', simulator.port), 5) as sock:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    sock.sendall(hello[:split])
+                    time.sleep(0.05)
+                    sock.sendall(hello[split:])
+                    deadline = time.monotonic() + 5
+                    while not (simulator.stats["blocked"] or simulator.stats["passed"]):
+                        if time.monotonic() > deadline:
+                            self.fail("симулятор не принял решение")
+                        time.sleep(0.01)
+                return dict(simulator.stats)
+        finally:
+            origin.stop()
+
+    def test_simple_dpi_misses_split_at_1(self):
+        stats = self.run_split(False, 1)
+        self.assertEqual((stats["blocked"], stats["passed"], stats["unparsed"]), (0, 1, 1))
+
+    def test_reassembling_dpi_blocks_split_at_1(self):
+        stats = self.run_split(True, 1)
+        self.assertEqual((stats["blocked"], stats["passed"]), (1, 0))
+
+    def test_reassembling_dpi_blocks_split_inside_sni(self):
+        stats = self.run_split(True, client_hello().index(BLOCKED.encode()) + 3)
+        self.assertEqual((stats["blocked"], stats["passed"]), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
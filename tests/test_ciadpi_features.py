@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_constraints import CONSTRAINTS
+from ciadpi_features import NUMPY_AVAILABLE, FeatureEncoder
+
+
+class EncoderTest(unittest.TestCase):
+    """Признаки одного набора (без NumPy)"""
+
+    def setUp(self):
+        self.encoder = FeatureEncoder()
+
+    def features(self, params):
+        return {name: value for name, value in zip(self.encoder.columns, self.encoder.encode(params)) if value}
+
+    def test_offsets_flags_and_values(self):
+        self.assertEqual(self.features("-o1 -o25+s -T3 -At"),
+                         {'-o': 2, '-o:pos': 26, '-o+s': 1, '-T': 1, '-T:value': 3, '-A': 1, '-A=torst': 1})
+
+    def test_minimal_form_is_encoded(self):
+        self.assertEqual(self.encoder.encode("-o1 -t 8"), self.encoder.encode("-o 1"))
+        self.assertIsNone(self.encoder.encode("-s 5+xz"))
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "нужен NumPy")
+class SpaceEncoderTest(unittest.TestCase):
+    """Векторное кодирование пространства совпадает с разбором строк"""
+
+    @classmethod
+    def setUpClass(cls):
+        import random
+
+        import numpy as np
+
+        from ciadpi_features import SpaceEncoder
+        from ciadpi_param_generator import AdvancedParamGenerator
+
+        cls.np = np
+        cls.space = AdvancedParamGenerator(rng=1).param_space()
+        cls.encoder = FeatureEncoder()
+        cls.space_encoder = SpaceEncoder(cls.space, cls.encoder)
+        rng = random.Random(3)
+        cls.indices = np.array([rng.randrange(cls.space.size) for _ in range(500)], dtype=np.int64)
+
+    def test_features_match_strings(self):
+        expected = self.np.array([self.encoder.encode_raw(self.space[int(index)]) for index in self.indices],
+                                 dtype=self.np.float32)
+        self.assertTrue(self.np.allclose(self.space_encoder.encode(self.indices), expected))
+
+    def test_mask_matches_constraints(self):
+        mask = self.encoder.constraint_mask(self.space_encoder.encode(self.indices))
+        expected = [CONSTRAINTS.allows(self.space[int(index)]) for index in self.indices]
+        self.assertEqual(mask.tolist(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
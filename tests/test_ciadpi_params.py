@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_params import (Offset, ParamError, canonical_params, check_params, normalize_params, params_fingerprint,
+                           parse_params, tokenize, with_instance_options)
+
+
+class TokenizeTest(unittest.TestCase):
+    """Формы записи опций"""
+
+    def test_value_forms(self):
+        expected = [('-o', '1'), ('-o', '25+s'), ('-T', '3')]
+        self.assertEqual(tokenize("-o1 -o 25+s -T3"), expected)
+        self.assertEqual(tokenize("--oob=1 --oob 25+s --timeout 3"), expected)
+
+    def test_flag_groups(self):
+        self.assertEqual(tokenize("-NU -p1080"), [('-N', None), ('-U', None), ('-p', '1080')])
+
+    def test_legacy_spelling(self):
+        self.assertEqual(tokenize("-At o--tlsrec 1+s"), [('-A', 't'), ('-r', '1+s')])
+
+
+class LegacyWordsTest(unittest.TestCase):
+    """Устаревшее написание o--tlsrec и слова без опции"""
+
+    def test_legacy_spelling_is_canonical_option(self):
+        self.assertEqual(normalize_params("-o1 -o25+s -T3 -At o--tlsrec 1+s"), "-T 3 -o 1 -o 25+s -A t -r 1+s")
+        self.assertEqual(params_fingerprint("-o1 -o25+s -T3 -At o--tlsrec 1+s"),
+                         params_fingerprint("-T 3 -o 1 -o 25+s -A t --tlsrec 1+s"))
+
+    def test_legacy_spelling_needs_value(self):
+        self.assertFalse(check_params("-o1 -At o--tlsrec")[0])
+        self.assertFalse(check_params("-o1 -At o--tlsrec 1+xz")[0])
+
+    def test_bare_offset_is_rejected(self):
+        valid, message = check_params("-o1 1+s")
+        self.assertFalse(valid)
+        self.assertIn("«1+s»", message)
+        self.assertIsNone(normalize_params("-o1 -At 1+s"))
+        with self.assertRaises(ParamError):
+            parse_params("-o1 2+s")
+
+
+class CanonicalTest(unittest.TestCase):
+    """Каноническая форма: равнозначные записи дают одну строку"""
+
+    def test_order_and_spelling(self):
+        self.assertEqual(canonical_params("-T3 -o25+s -o1"), "-T 3 -o 1 -o 25+s")
+        self.assertEqual(canonical_params("--oob=1 -o 25+s --timeout 3"), "-T 3 -o 1 -o 25+s")
+
+    def test_last_global_value_wins(self):
+        self.assertEqual(canonical_params("-T3 -o1 -T5"), "-T 5 -o 1")
+
+    def test_groups_keep_their_options(self):
+        self.assertEqual(canonical_params("-s1 -A t -d2 -o1"), "-s 1 -A t -d 2 -o 1")
+        self.assertNotEqual(params_fingerprint("-s1 -A t -d2"), params_fingerprint("-d2 -A t -s1"))
+
+    def test_duplicates_in_group_removed(self):
+        self.assertEqual(canonical_params("-o1 -o1 -s2"), "-o 1 -s 2")
+
+    def test_typed_values(self):
+        self.assertEqual(parse_params("-o25+s -T3 -A t,r"),
+                         (('-o', Offset(25, None, None, 's')), ('-T', 3.0), ('-A', ('torst', 'redirect'))))
+
+    def test_errors_are_collected(self):
+        valid, message = check_params("-s 5+xz -p 70000 -K t,x")
+        self.assertFalse(valid)
+        self.assertEqual(message.count('\n'), 3)
+
+    def test_instance_options_from_service(self):
+        self.assertEqual(with_instance_options("-p 2000 -o1", "-i 127.0.0.1 -p 1081 -s 1"),
+                         "-i 127.0.0.1 -p 1081 -o 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
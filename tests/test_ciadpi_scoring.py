@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_scoring import (compare_stats, fitness, make_score, mean_interval, percentile, summarize_trials,
+                            wilson_interval)
+
+
+def targets(latencies, failures=0):
+    """Проверки сайтов: успешные с задержками latencies и failures неудачных"""
+    return [{"success": True, "total": latency} for latency in latencies] + \
+        [{"success": False, "total": 5.0}] * failures
+
+
+class IntervalsTest(unittest.TestCase):
+    """Перцентили и доверительные интервалы"""
+
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2.5)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 95), 4.8)
+        self.assertIsNone(percentile([], 50))
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(10, 10)
+        self.assertEqual(high, 1.0)
+        self.assertAlmostEqual(low, 0.722, places=3)
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+    def test_mean_interval(self):
+        low, high = mean_interval([1.0, 1.0, 1.0])
+        self.assertEqual((low, high), (1.0, 1.0))
+        self.assertEqual(mean_interval([1.0]), (0.0, float('inf')))
+        low, high = mean_interval([0.9, 1.0, 1.1])
+        self.assertLess(low, 1.0)
+        self.assertGreater(high, 1.0)
+
+    def test_summarize_trials(self):
+        stats = summarize_trials(targets([0.1, 0.2, 0.3], failures=1))
+        self.assertEqual(stats["trials"], 4)
+        self.assertEqual(stats["success_rate"], 0.75)
+        self.assertEqual(stats["p50"], 0.2)
+        self.assertIsNone(summarize_trials([])["p50"])
+
+
+class CompareStatsTest(unittest.TestCase):
+    """Ранжирование по интервалам: победитель только при непересекающихся интервалах"""
+
+    def test_success_rate_first(self):
+        reliable = summarize_trials(targets([0.5] * 20))
+        flaky = summarize_trials(targets([0.1] * 5, failures=15))
+        self.assertEqual(compare_stats(reliable, flaky), 1)
+        self.assertEqual(compare_stats(flaky, reliable), -1)
+
+    def test_latency_when_success_overlaps(self):
+        fast = summarize_trials(targets([0.10, 0.11, 0.12, 0.10, 0.11]))
+        slow = summarize_trials(targets([0.50, 0.52, 0.51, 0.50, 0.49]))
+        self.assertEqual(compare_stats(fast, slow), 1)
+        self.assertEqual(compare_stats(slow, fast), -1)
+
+    def test_overlapping_intervals_are_undecided(self):
+        first = summarize_trials(targets([0.1, 0.3]))
+        second = summarize_trials(targets([0.15, 0.35]))
+        self.assertEqual(compare_stats(first, second), 0)
+        self.assertEqual(compare_stats(first, summarize_trials([])), 0)
+
+
+class ScoreTest(unittest.TestCase):
+    """Оценки кандидатов"""
+
+    def test_fitness(self):
+        self.assertEqual(fitness({"success": False, "speed": 0.1}), 0.0)
+        self.assertGreater(fitness({"success": True, "speed": 0.1}), fitness({"success": True, "speed": 0.5}))
+        self.assertGreater(fitness({"success_rate": 0.5, "speed": 5.0}), 0.0)
+
+    def test_throughput_weight(self):
+        score = make_score(latency_weight=0.3, throughput_weight=0.7)
+        slow_download = {"success": True, "speed": 0.2, "throughput": 200_000}
+        fast_download = {"success": True, "speed": 0.6, "throughput": 5_000_000}
+        self.assertGreater(score(fast_download), score(slow_download))
+        self.assertEqual(score(dict(fast_download, success=False)), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ciadpi_space import Chain, Combinations, IndexPermutation, ParamSpace, parse_shard
+
+
+class PermutationTest(unittest.TestCase):
+    """Перестановка Фейстеля: взаимно однозначна и задается seed"""
+
+    def test_bijection(self):
+        for size in [1, 2, 3, 7, 16, 17, 1000, 4097]:
+            permutation = IndexPermutation(size, seed=5)
+            self.assertEqual(sorted(permutation[index] for index in range(size)), list(range(size)), size)
+
+    def test_seed_defines_order(self):
+        first = [IndexPermutation(1000, seed=1)[index] for index in range(20)]
+        self.assertEqual(first, [IndexPermutation(1000, seed=1)[index] for index in range(20)])
+        self.assertNotEqual(first, [IndexPermutation(1000, seed=2)[index] for index in range(20)])
+
+    def test_out_of_range(self):
+        with self.assertRaises(IndexError):
+            IndexPermutation(10, seed=1)[10]
+
+
+class SpaceTest(unittest.TestCase):
+    """Номер кандидата <-> кандидат, выборка и деление пространства"""
+
+    def setUp(self):
+        self.space = ParamSpace([("split", ["", "-s 1", "-s 2+s"]), ("oob", ["", "-o 1"]),
+                                 ("timeout", ["", "-T 3", "-T 5", "-T 7"])])
+
+    def test_index_round_trip(self):
+        seen = set()
+        for index in range(len(self.space)):
+            digits = self.space.digits(index)
+            rebuilt = sum(digit * base for digit, base in zip(digits, [1, 3, 6]))
+            self.assertEqual(rebuilt, index)
+            seen.add(self.space[index])
+        self.assertEqual(len(seen), len(self.space))
+        self.assertEqual(self.space[0], "")
+        self.assertEqual(self.space.describe(len(self.space) - 1),
+                         {"split": "-s 2+s", "oob": "-o 1", "timeout": "-T 7"})
+
+    def test_shards_cover_sample_without_repeats(self):
+        candidates = []
+        for worker in range(3):
+            start, stop = self.space.shard(worker, 3)
+            candidates.extend(params for _, params in self.space.sample(9, start, stop))
+        self.assertEqual(sorted(candidates), sorted(self.space))
+
+    def test_sample_resumes_from_position(self):
+        full = list(self.space.sample(4))
+        position = full[9][0]
+        self.assertEqual(full[10:], list(self.space.sample(4, position + 1)))
+
+    def test_accept_skips_without_shifting(self):
+        space = ParamSpace(list(zip(self.space.names, self.space.dimensions)), accept=lambda params: "-o" in params)
+        self.assertEqual([position for position, _ in space.sample(4)],
+                         [position for position, params in self.space.sample(4) if "-o" in params])
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/8"), (1, 8))
+        with self.assertRaises(ValueError):
+            parse_shard("9/8")
+
+
+class SequencesTest(unittest.TestCase):
+    """Варианты измерений без хранения списка"""
+
+    def test_combinations(self):
+        combinations = Combinations(["-o 1", "-o 2", "-o 3"], 2)
+        self.assertEqual([combinations[index] for index in range(len(combinations))],
+                         ["-o 1 -o 2", "-o 1 -o 3", "-o 2 -o 3"])
+
+    def test_chain(self):
+        chain = Chain([["a", "b"], ["c"]])
+        self.assertEqual([chain[index] for index in range(len(chain))], ["a", "b", "c"])
+        with self.assertRaises(IndexError):
+            chain[3]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -133,6 +133,23 @@ BINARIES=(
     "$HOME/.local/bin/ciadpi_autosearch.py"
     "$HOME/.local/bin/ciadpi_param_generator.py"
     "$HOME/.local/bin/ciadpi_whitelist.py"
+    "$HOME/.local/bin/ciadpi_readiness.py"
+    "$HOME/.local/bin/ciadpi_probe.py"
+    "$HOME/.local/bin/ciadpi_optimizers.py"
+    "$HOME/.local/bin/ciadpi_params.py"
+    "$HOME/.local/bin/ciadpi_history.py"
+    "$HOME/.local/bin/ciadpi_scoring.py"
+    "$HOME/.local/bin/ciadpi_testserver.py"
+    "$HOME/.local/bin/ciadpi_dpi_sim.py"
+    "$HOME/.local/bin/ciadpi_benchmark.py"
+    "$HOME/.local/bin/ciadpi_monitor.py"
+    "$HOME/.local/bin/ciadpi_checkpoint.py"
+    "$HOME/.local/bin/ciadpi_network.py"
+    "$HOME/.local/bin/ciadpi_service.py"
+    "$HOME/.local/bin/ciadpi_cli.py"
+    "$HOME/.local/bin/ciadpi_space.py"
+    "$HOME/.local/bin/ciadpi_constraints.py"
+    "$HOME/.local/bin/ciadpi_features.py"
     "$HOME/.local/bin/ciadpi_launcher.sh"
     "$HOME/.local/bin/diagnose_ciadpi.py"
     "$HOME/.local/bin/ciadpi-diagnose"